@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+
+DIRECTORY_SUFFIX = '.dir'
+COPY_SUFFIX = '.copy'
+COPY_MANIFEST = 'manifest.json'
+REPOSITORY_INDEX_SUFFIX = '.idx'
+
+
+def is_directory_artifact(path: str) -> bool:
+    return os.path.isdir(path) and (Path(path) / 'toc.dat').exists()
+
+
+def is_copy_artifact(path: str) -> bool:
+    return os.path.isdir(path) and (Path(path) / COPY_MANIFEST).exists()
+
+
+def is_repository_index(path: str) -> bool:
+    return os.path.isfile(path) and path.endswith(REPOSITORY_INDEX_SUFFIX)
+
+
+def get_artifact_format(path: str) -> str:
+    name = Path(path).name
+    if name.endswith(DIRECTORY_SUFFIX):
+        return 'directory'
+    if name.endswith(COPY_SUFFIX):
+        return 'copy'
+    return 'custom' if '.dump' in name else 'plain'
+
+
+def iter_artifact_files(path: str):
+    if not os.path.isdir(path):
+        yield path
+        return
+    
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+def get_artifact_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in iter_artifact_files(path))
\ No newline at end of file
@@ -1,19 +1,40 @@
 import os
-import gzip
 import subprocess
 import shutil
 import schedule
 import signal
 import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from .logger import get_logger, Logger
 from .config import Config
 from .connection import ConnectionManager
-from .checksum import ChecksumManager
+from .checksum import MERKLE_SUFFIX, ChecksumManager
+from .compression import (
+    COMPRESSION_CHUNK_SIZE, Codec, detect_codec, get_codec
+)
+from .planner import BackupPlanner
+from .history import BackupHistory
+from .copy_engine import CopyEngine
+from .repository import ChunkRepository
+from .catalog import BackupCatalog
+from .retention import RetentionManager
+from .toc import TOC_SUFFIX, TocManager
+from .stats import STATS_SUFFIX, StatisticsManager
+from .verification import BackupVerifier
+from .process import StderrMonitor, run_monitored
+from .progress import ProgressTracker, get_progress_registry
+from .artifact import (
+    COPY_SUFFIX, DIRECTORY_SUFFIX, REPOSITORY_INDEX_SUFFIX, get_artifact_size,
+    is_copy_artifact, is_directory_artifact, is_repository_index, iter_artifact_files
+)
+
+
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 
 class BackupManager:
@@ -21,41 +42,85 @@ class BackupManager:
         self.config = config or Config()
         self.logger = get_logger()
         self.conn = ConnectionManager(self.config)
-        self.checksum = ChecksumManager()
+        self.checksum = ChecksumManager(self.config)
+        self.copy_engine = CopyEngine(self.config, self.conn, self.checksum)
+        self.history = BackupHistory(self.config)
+        self.repository = ChunkRepository(self.config)
+        self.catalog = BackupCatalog(self.config)
+        self.retention = RetentionManager(self.config, self.catalog, self.copy_engine)
+        self.toc = TocManager(self.config, self.conn, self.repository)
+        self.stats = StatisticsManager(self.config, self.conn)
+        self.verifier = BackupVerifier(
+            self.config, self.conn, self.checksum, self.repository, self.copy_engine, self.toc
+        )
+        self.progress = get_progress_registry(self.config)
         self.shutdown_event = threading.Event()
+        self.pg_dump_version = None
+    
+    def get_native_compress_args(self, database: str = None) -> list:
+        if self.pg_dump_version is None:
+            self.pg_dump_version = self.conn.get_pg_dump_version() or (0, 0)
+        
+        codec, level = self.get_codec(database)
+        
+        if self.pg_dump_version[0] >= 16:
+            spec = 'none' if codec.name == 'gzip' and level == 0 else f'{codec.name}:{level}'
+            return [f'--compress={spec}']
+        
+        if codec.name != 'gzip':
+            self.logger.warning(
+                f"pg_dump {self.pg_dump_version[0]} 不支持 {codec.name} 内置压缩，改用 zlib"
+            )
+        return ['-Z', str(level if 0 <= level <= 9 else 6)]
+    
+    def get_codec(self, database: str = None) -> Tuple[Codec, int]:
+        codec_name, level = self.config.get_compression(database)
+        codec = get_codec(codec_name)
+        return codec, codec.get_level(level)
+    
+    def create_compressor(self, database: str = None):
+        codec, level = self.get_codec(database)
+        return codec.create_compressor(level=level, threads=self.config.COMPRESSION_THREADS)
     
-    def compress_file(self, file_path: str, show_progress: bool = False) -> str:
+    def compress_file(self, file_path: str, database: str = None) -> str:
         try:
             if not os.path.exists(file_path):
                 self.logger.error(f"文件不存在: {file_path}")
                 return file_path
             
             file_size = os.path.getsize(file_path)
-            gz_path = f'{file_path}.gz'
+            codec, level = self.get_codec(database)
+            gz_path = f'{file_path}{codec.extension}'
             
-            if show_progress and file_size > 10 * 1024 * 1024:
-                self.logger.info(f"压缩大文件 ({file_size / (1024*1024):.2f} MB)")
+            self.logger.info(
+                f"压缩文件 ({file_size / (1024*1024):.2f} MB，{codec.name}:{level}，"
+                f"线程数: {self.config.COMPRESSION_THREADS})"
+            )
             
-            with open(file_path, 'rb') as f_in:
-                with gzip.open(gz_path, 'wb') as f_out:
-                    if show_progress and file_size > 50 * 1024 * 1024:
-                        copied = 0
-                        chunk_size = 8192
-                        while True:
-                            chunk = f_in.read(chunk_size)
-                            if not chunk:
-                                break
-                            f_out.write(chunk)
-                            copied += len(chunk)
-                            if copied % (10 * 1024 * 1024) == 0:
-                                progress = (copied / file_size) * 100
-                                self.logger.info(f"压缩进度: {progress:.1f}%")
-                    else:
-                        shutil.copyfileobj(f_in, f_out)
+            start_time = time.monotonic()
+            compressor = self.create_compressor(database)
+            
+            tracker = ProgressTracker('compress', f'压缩 {Path(file_path).name}', file_size)
+            try:
+                with open(file_path, 'rb') as f_in, open(gz_path, 'wb') as f_out:
+                    for chunk in iter(lambda: f_in.read(COMPRESSION_CHUNK_SIZE), b''):
+                        f_out.write(compressor.compress(chunk))
+                        tracker.update(len(chunk))
+                    f_out.write(compressor.flush())
+            finally:
+                tracker.finish()
+                compressor.close()
+            
+            elapsed = max(time.monotonic() - start_time, 1e-6)
             
             if os.path.exists(gz_path) and os.path.getsize(gz_path) > 0:
+                gz_size = os.path.getsize(gz_path)
                 os.remove(file_path)
                 self.logger.success(f"压缩完成: {gz_path}")
+                self.logger.info(
+                    f"压缩吞吐: {file_size / (1024*1024) / elapsed:.2f} MB/s "
+                    f"(耗时 {elapsed:.2f}s，压缩率 {gz_size / max(file_size, 1) * 100:.1f}%)"
+                )
                 self.checksum.calculate(gz_path)
                 return gz_path
             
@@ -66,6 +131,268 @@ class BackupManager:
             self.logger.error(f"压缩异常: {e}")
             return file_path
     
+    def run_pg_dump(self, cmd: list, output_file: str, label: str, env: dict,
+                    database: str = None, compress: bool = None) -> Optional[dict]:
+        if compress is None:
+            compress = self.config.ENABLE_COMPRESSION
+        
+        if self.config.ENABLE_STREAMING or self.config.BACKUP_REPOSITORY:
+            return self.dump_streaming(
+                cmd, output_file, label, env, database=database, compress=compress
+            )
+        
+        monitor = run_monitored(
+            cmd + ['-f', output_file], f'{label} 备份', env=env, timeout=self.config.BACKUP_TIMEOUT,
+            max_lines=self.config.STDERR_TAIL_LINES, stage='dump', watch_file=output_file,
+            total=self.conn.get_database_size_bytes(database) if database else None
+        )
+        
+        if monitor.returncode != 0:
+            self.logger.error(f"{label} 备份失败: {monitor.describe()}")
+            return None
+        
+        file_size = os.path.getsize(output_file)
+        self.logger.success(f"{label} 备份成功: {file_size} bytes")
+        
+        if compress:
+            output_file = self.compress_file(output_file, database=database)
+        else:
+            self.checksum.calculate(output_file)
+        
+        return {'path': output_file, 'size': file_size}
+    
+    def run_pg_dump_directory(self, cmd: list, output_dir: str, env: dict) -> Optional[dict]:
+        try:
+            monitor = run_monitored(
+                cmd + ['-f', output_dir], 'directory 备份', env=env, timeout=self.config.BACKUP_TIMEOUT,
+                max_lines=self.config.STDERR_TAIL_LINES, stage='dump'
+            )
+        except subprocess.TimeoutExpired:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            raise
+        
+        if monitor.returncode != 0:
+            self.logger.error(f"directory 备份失败: {monitor.describe()}")
+            if os.path.isdir(output_dir):
+                shutil.rmtree(output_dir, ignore_errors=True)
+            return None
+        
+        dir_size = get_artifact_size(output_dir)
+        self.logger.success(f"directory 备份成功: {dir_size} bytes")
+        self.checksum.calculate_directory(output_dir)
+        
+        return {'path': output_dir, 'size': dir_size}
+    
+    def derive_sql_from_dump(self, dump_path: str, sql_file: str, env: dict,
+                             database: str = None) -> Optional[dict]:
+        cmd = ['pg_restore', '-f', '-']
+        
+        codec = detect_codec(dump_path)
+        if is_repository_index(dump_path):
+            decompress_proc = self.repository.open_stream(dump_path)
+        elif codec is None:
+            return self.dump_streaming(cmd + [dump_path], sql_file, 'SQL', env, database=database)
+        else:
+            decompress_proc = subprocess.Popen(
+                codec.decompress_cmd + [dump_path], stdout=subprocess.PIPE
+            )
+        try:
+            return self.dump_streaming(
+                cmd, sql_file, 'SQL', env, stdin=decompress_proc.stdout, database=database
+            )
+        finally:
+            decompress_proc.stdout.close()
+            decompress_proc.wait()
+    
+    def dump_streaming(self, cmd: list, output_file: str, label: str, env: dict,
+                       stdin=None, database: str = None, compress: bool = None) -> Optional[dict]:
+        if compress is None:
+            compress = self.config.ENABLE_COMPRESSION
+        
+        codec, level = self.get_codec(database)
+        chunk_writer = None
+        if self.config.BACKUP_REPOSITORY:
+            chunk_writer = self.repository.open_writer(
+                codec if compress else None, level, self.config.COMPRESSION_THREADS
+            )
+            final_path = f'{output_file}{REPOSITORY_INDEX_SUFFIX}'
+            compress = False
+        else:
+            final_path = f'{output_file}{codec.extension}' if compress else output_file
+        part_path = f'{final_path}.part'
+        
+        compressor = self.create_compressor(database) if compress else None
+        
+        self.logger.info(
+            f"流式备份: {Path(cmd[0]).name} | {f'{codec.name}:{level} | ' if compressor else ''}"
+            f"{f'分块去重 > {self.repository.root} | ' if chunk_writer else ''}"
+            f"sha256 > {Path(final_path).name}"
+        )
+        
+        proc = subprocess.Popen(
+            cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+        )
+        
+        tracker = ProgressTracker(
+            'dump', f'{label} 备份' + (f' {database}' if database else ''),
+            self.conn.get_database_size_bytes(database) if database and stdin is None else None
+        )
+        monitor = StderrMonitor(
+            proc, f'{label} 备份', max_lines=self.config.STDERR_TAIL_LINES, tracker=tracker
+        ).start()
+        
+        timed_out = threading.Event()
+        
+        def on_timeout():
+            timed_out.set()
+            proc.kill()
+        
+        timer = threading.Timer(self.config.BACKUP_TIMEOUT, on_timeout)
+        timer.start()
+        
+        raw_size = 0
+        try:
+            with open(part_path, 'wb') as f_out:
+                writer = self.checksum.create_writer(f_out)
+                for chunk in iter(lambda: proc.stdout.read(STREAM_CHUNK_SIZE), b''):
+                    raw_size += len(chunk)
+                    tracker.update(len(chunk))
+                    if chunk_writer:
+                        chunk_writer.write(chunk)
+                    else:
+                        writer.write(compressor.compress(chunk) if compressor else chunk)
+                if compressor:
+                    writer.write(compressor.flush())
+                if chunk_writer:
+                    writer.write(chunk_writer.finish(database))
+            
+            monitor.wait()
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        finally:
+            timer.cancel()
+            tracker.finish()
+            if compressor:
+                compressor.close()
+            if chunk_writer:
+                chunk_writer.close()
+        
+        if timed_out.is_set():
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise subprocess.TimeoutExpired(cmd, self.config.BACKUP_TIMEOUT)
+        
+        if proc.returncode != 0:
+            self.logger.error(f"{label} 备份失败: {monitor.describe()}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return None
+        
+        os.replace(part_path, final_path)
+        
+        self.logger.success(
+            f"{label} 备份成功: {raw_size} bytes"
+            + (f" (压缩后 {writer.size} bytes)" if compressor else "")
+            + (
+                f" (新增 {chunk_writer.new_chunks}/{len(chunk_writer.chunks)} 个数据块, "
+                f"写入 {chunk_writer.stored_size} bytes)" if chunk_writer else ""
+            )
+        )
+        self.checksum.write_stream_checksums(final_path, writer)
+        
+        return {'path': final_path, 'size': raw_size}
+    
+    def get_backup_signature(self, database: str) -> str:
+        codec, level = self.get_codec(database)
+        return (
+            f"{self.config.BACKUP_FORMAT}|{self.config.ENABLE_COMPRESSION}|"
+            f"{self.config.DUMP_NATIVE_COMPRESSION}|{codec.name}:{level}|{self.config.BACKUP_REPOSITORY}"
+        )
+    
+    def _link_artifact(self, old_path: str, new_path: str):
+        if os.path.isdir(old_path):
+            for file_path in iter_artifact_files(old_path):
+                target = Path(new_path) / os.path.relpath(file_path, old_path)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.link(file_path, target)
+            for sidecar in ('.sha256', TOC_SUFFIX, STATS_SUFFIX):
+                if os.path.exists(f'{old_path}{sidecar}'):
+                    os.link(f'{old_path}{sidecar}', f'{new_path}{sidecar}')
+            return
+        
+        os.link(old_path, new_path)
+        checksum_file = f'{old_path}.sha256'
+        if os.path.exists(checksum_file):
+            with open(checksum_file, 'r') as f:
+                checksum = f.read().split()[0]
+            self.checksum.write_checksum_file(new_path, checksum)
+        for sidecar in (MERKLE_SUFFIX, TOC_SUFFIX, STATS_SUFFIX):
+            if os.path.exists(f'{old_path}{sidecar}'):
+                os.link(f'{old_path}{sidecar}', f'{new_path}{sidecar}')
+    
+    def link_unchanged_backup(self, database: str, backup_dir: str, timestamp: str,
+                              marker: str) -> Optional[list]:
+        record = self.history.get(database)
+        previous_files = record.get('files') or []
+        
+        if (record.get('marker') != marker
+                or record.get('signature') != self.get_backup_signature(database)
+                or not previous_files
+                or not all(os.path.exists(p) for p in previous_files)):
+            return None
+        
+        old_prefix = f"{database}_{record['timestamp']}"
+        new_prefix = f"{database}_{timestamp}"
+        linked = []
+        
+        try:
+            for old_path in previous_files:
+                suffix = Path(old_path).name[len(old_prefix):]
+                new_path = str(Path(backup_dir) / f'{new_prefix}{suffix}')
+                self._link_artifact(old_path, new_path)
+                linked.append(new_path)
+        except OSError as e:
+            self.logger.warning(f"硬链接上次备份失败，改为完整备份: {e}")
+            for path in linked:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+                for sidecar in (f'{path}{suffix}' for suffix in ('.sha256', MERKLE_SUFFIX, TOC_SUFFIX, STATS_SUFFIX)):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+            return None
+        
+        return linked
+    
+    def get_incremental_base(self, database: str) -> Optional[str]:
+        record = self.history.get(database)
+        base_dir = record.get('copy_artifact')
+        full_time = record.get('copy_full_time')
+        
+        if not base_dir or not full_time or not is_copy_artifact(base_dir):
+            self.logger.info("无可用基准备份，执行完整备份")
+            return None
+        
+        age_days = (datetime.now() - datetime.fromisoformat(full_time)).total_seconds() / 86400
+        if age_days >= self.config.INCREMENTAL_FULL_DAYS:
+            self.logger.info(
+                f"距上次完整备份已 {age_days:.1f} 天 (周期 {self.config.INCREMENTAL_FULL_DAYS} 天)，执行完整备份"
+            )
+            return None
+        
+        return base_dir
+    
+    def record_copy_backup(self, database: str, output: dict):
+        fields = {'copy_artifact': output['path']}
+        if output.get('type') == 'full':
+            fields['copy_full_time'] = datetime.now().isoformat(timespec='seconds')
+        self.history.update(database, **fields)
+    
     def backup_single_database(self, database: str, backup_dir: str, 
                                  timestamp: str, pg_dump_path: str) -> dict:
         result = {
@@ -73,8 +400,12 @@ class BackupManager:
             'success': False,
             'files': [],
             'size': 0,
+            'db_size': None,
+            'duration': 0,
+            'skipped': False,
             'error': None
         }
+        start_time = time.monotonic()
         
         self.logger.task(f"备份数据库: {database}")
         
@@ -82,199 +413,231 @@ class BackupManager:
             result['error'] = '连接失败'
             return result
         
-        self.conn.get_database_size(database)
+        result['db_size'] = self.conn.get_database_size_bytes(database)
+        
+        marker = self.conn.get_change_marker(database) if self.config.SKIP_UNCHANGED else None
+        if marker:
+            linked = self.link_unchanged_backup(database, backup_dir, timestamp, marker)
+            if linked:
+                result.update(success=True, skipped=True, files=linked)
+                result['duration'] = time.monotonic() - start_time
+                self.logger.success(f"数据库 {database} 自上次备份后无写入，已硬链接上次备份")
+                return result
         
         env = self.config.get_pg_env()
+        snapshot_holder, snapshot = self.open_stats_snapshot(database)
+        snapshot_args = [f'--snapshot={snapshot}'] if snapshot else []
         
         try:
+            dump_output = None
+            
             if self.config.BACKUP_FORMAT in ['both', 'dump']:
                 dump_file = Path(backup_dir) / f'{database}_{timestamp}.dump'
-                self.logger.subtask(f"创建 dump 备份")
+                self.logger.subtask("创建 dump 备份")
                 
                 cmd = [
                     pg_dump_path, '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
                     '-U', self.config.PG_USER, '-d', database,
-                    '-F', 'c', '-b', '-v', '-f', str(dump_file)
-                ]
+                    '-F', 'c', '-b', '-v'
+                ] + snapshot_args
                 
-                dump_result = subprocess.run(
-                    cmd, env=env, capture_output=True, text=True, 
-                    timeout=self.config.BACKUP_TIMEOUT
-                )
+                compress = self.config.ENABLE_COMPRESSION
+                if self.config.BACKUP_REPOSITORY:
+                    cmd.extend(['-Z', '0'])
+                elif compress and self.config.DUMP_NATIVE_COMPRESSION:
+                    native_args = self.get_native_compress_args(database)
+                    cmd.extend(native_args)
+                    compress = False
+                    self.logger.info(f"使用 pg_dump 内置压缩: {' '.join(native_args)}")
                 
-                if dump_result.returncode == 0:
-                    file_size = os.path.getsize(dump_file)
-                    result['size'] += file_size
-                    self.logger.success(f"dump 备份成功: {file_size} bytes")
-                    
-                    if self.config.ENABLE_COMPRESSION:
-                        dump_file = self.compress_file(str(dump_file), show_progress=True)
-                    else:
-                        self.checksum.calculate(str(dump_file))
-                    
-                    result['files'].append(dump_file)
-                else:
-                    self.logger.error(f"dump 备份失败: {dump_result.stderr}")
+                dump_output = self.run_pg_dump(
+                    cmd, str(dump_file), 'dump', env, database, compress
+                )
+                if dump_output:
+                    result['size'] += dump_output['size']
+                    result['files'].append(dump_output['path'])
+                    if self.config.BACKUP_TOC:
+                        self.toc.write_toc(dump_output['path'], database)
             
-            if self.config.BACKUP_FORMAT in ['both', 'sql']:
-                sql_file = Path(backup_dir) / f'{database}_{timestamp}.sql'
-                self.logger.subtask(f"创建 SQL 备份")
+            if self.config.BACKUP_FORMAT == 'directory':
+                dump_dir = Path(backup_dir) / f'{database}_{timestamp}{DIRECTORY_SUFFIX}'
+                jobs = max(1, self.config.BACKUP_DUMP_JOBS)
+                self.logger.subtask(f"创建 directory 备份 (pg_dump 并发: {jobs})")
                 
                 cmd = [
                     pg_dump_path, '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
                     '-U', self.config.PG_USER, '-d', database,
-                    '-b', '-v', '-f', str(sql_file)
-                ]
+                    '-F', 'd', '-j', str(jobs), '-b', '-v'
+                ] + snapshot_args
+                if not self.config.ENABLE_COMPRESSION:
+                    cmd.extend(['-Z', '0'])
+                elif self.config.DUMP_NATIVE_COMPRESSION:
+                    cmd.extend(self.get_native_compress_args(database))
                 
-                sql_result = subprocess.run(
-                    cmd, env=env, capture_output=True, text=True,
-                    timeout=self.config.BACKUP_TIMEOUT
+                output = self.run_pg_dump_directory(cmd, str(dump_dir), env)
+                if output:
+                    result['size'] += output['size']
+                    result['files'].append(output['path'])
+                    if self.config.BACKUP_TOC:
+                        self.toc.write_toc(output['path'], database)
+            
+            if self.config.BACKUP_FORMAT == 'copy':
+                copy_dir = Path(backup_dir) / f'{database}_{timestamp}{COPY_SUFFIX}'
+                self.logger.subtask(f"创建 COPY 并行备份 (并发: {self.config.COPY_WORKERS})")
+                
+                codec, level = self.get_codec(database) if self.config.ENABLE_COMPRESSION else (None, 0)
+                base_dir = self.get_incremental_base(database) if self.config.BACKUP_INCREMENTAL else None
+                output = self.copy_engine.backup(
+                    database, str(copy_dir), pg_dump_path, codec, level, base_dir
                 )
+                if output:
+                    result['size'] += output['size']
+                    result['files'].append(output['path'])
+                    self.record_copy_backup(database, output)
+            
+            if self.config.BACKUP_FORMAT in ['both', 'sql']:
+                sql_file = Path(backup_dir) / f'{database}_{timestamp}.sql'
+                output = None
                 
-                if sql_result.returncode == 0:
-                    file_size = os.path.getsize(sql_file)
-                    result['size'] += file_size
-                    self.logger.success(f"SQL 备份成功: {file_size} bytes")
+                if dump_output and self.config.SQL_FROM_DUMP:
+                    self.logger.subtask("从 dump 生成 SQL 备份")
+                    output = self.derive_sql_from_dump(
+                        dump_output['path'], str(sql_file), env, database
+                    )
+                    if not output:
+                        self.logger.warning("从 dump 生成 SQL 失败，改用 pg_dump 导出")
+                
+                if output is None:
+                    self.logger.subtask("创建 SQL 备份")
                     
-                    if self.config.ENABLE_COMPRESSION:
-                        sql_file = self.compress_file(str(sql_file), show_progress=True)
-                    else:
-                        self.checksum.calculate(str(sql_file))
+                    cmd = [
+                        pg_dump_path, '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
+                        '-U', self.config.PG_USER, '-d', database,
+                        '-b', '-v'
+                    ] + snapshot_args
                     
-                    result['files'].append(sql_file)
-                else:
-                    self.logger.error(f"SQL 备份失败: {sql_result.stderr}")
+                    output = self.run_pg_dump(cmd, str(sql_file), 'SQL', env, database)
+                
+                if output:
+                    result['size'] += output['size']
+                    result['files'].append(output['path'])
+            
+            if snapshot:
+                self.write_stats(database, result['files'], snapshot)
             
             result['success'] = True
             self.logger.success(f"数据库 {database} 备份完成")
             
+            expected_files = 2 if self.config.BACKUP_FORMAT == 'both' else 1
+            if marker and len(result['files']) == expected_files:
+                self.history.update(
+                    database, marker=marker, signature=self.get_backup_signature(database),
+                    timestamp=timestamp, files=[str(f) for f in result['files']]
+                )
+            
         except subprocess.TimeoutExpired:
             result['error'] = '备份超时'
             self.logger.error(f"备份超时: {database}")
         except Exception as e:
             result['error'] = str(e)
             self.logger.error(f"备份异常: {database} - {e}")
+        finally:
+            if snapshot_holder:
+                snapshot_holder.close()
         
+        result['duration'] = time.monotonic() - start_time
         return result
     
-    def verify_backup(self, backup_file: str, database: str) -> bool:
+    def open_stats_snapshot(self, database: str) -> tuple:
+        if not self.config.BACKUP_STATS or self.config.BACKUP_FORMAT == 'copy':
+            return None, None
         try:
-            self.logger.task(f"验证备份文件")
-            self.logger.subtask(f"文件: {backup_file}")
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            verify_db = f'_verify_{timestamp}'
-            
-            if not self.conn.create_database(verify_db):
-                self.logger.error("创建验证数据库失败")
-                return False
-            
-            env = self.config.get_pg_env()
-            
-            actual_file = backup_file
-            if backup_file.endswith('.gz'):
-                subprocess.run(['gzip', '-d', '-k', backup_file], capture_output=True)
-                actual_file = backup_file[:-3]
-            
-            try:
-                if actual_file.endswith('.dump') or '.dump' in actual_file:
-                    cmd = [
-                        'pg_restore', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                        '-U', self.config.PG_USER, '-d', verify_db,
-                        '--verbose', '--no-owner', '--no-acl', actual_file
-                    ]
-                else:
-                    cmd = [
-                        'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                        '-U', self.config.PG_USER, '-d', verify_db, '-f', actual_file
-                    ]
-                
-                result = subprocess.run(
-                    cmd, env=env, capture_output=True, text=True, timeout=1800
-                )
-                
-                if backup_file.endswith('.gz') and os.path.exists(actual_file):
-                    os.remove(actual_file)
-                
-                has_fatal_error = False
-                if result.returncode != 0:
-                    for line in result.stderr.split('\n'):
-                        if 'ERROR:' in line and 'already exists' not in line.lower():
-                            has_fatal_error = True
-                            break
-                
-                if not has_fatal_error:
-                    self.logger.success("备份验证成功")
-                    
-                    cmd_count = [
-                        'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                        '-U', self.config.PG_USER, '-d', verify_db, '-t', '-c',
-                        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'public';"
-                    ]
-                    count_result = subprocess.run(
-                        cmd_count, env=env, capture_output=True, text=True, timeout=30
-                    )
-                    table_count = count_result.stdout.strip() if count_result.returncode == 0 else '未知'
-                    self.logger.info(f"验证数据库表数量: {table_count}")
-                    return True
-                
-                self.logger.error(f"备份验证失败: {result.stderr}")
-                return False
-                
-            finally:
-                cmd_drop = [
-                    'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                    '-U', self.config.PG_USER, '-d', 'postgres', '-c',
-                    f'DROP DATABASE IF EXISTS "{verify_db}";'
-                ]
-                subprocess.run(cmd_drop, env=env, capture_output=True, text=True)
-                self.logger.info(f"清理验证数据库: {verify_db}")
-                
+            return self.stats.export_snapshot(database)
         except Exception as e:
-            self.logger.error(f"验证异常: {e}")
-            return False
+            self.logger.warning(f"导出快照失败，跳过统计清单: {e}")
+            return None, None
+    
+    def write_stats(self, database: str, files: list, snapshot: str):
+        try:
+            manifest = self.stats.collect(database, snapshot)
+        except Exception as e:
+            self.logger.warning(f"生成统计清单失败: {database} - {e}")
+            return
+        for path in files:
+            self.stats.write_manifest(path, manifest)
+    
+    def verify_backup(self, backup_file: str, database: str = None, level: str = None,
+                      verify_checksum: bool = True) -> bool:
+        return self.verifier.verify(backup_file, level, verify_checksum)
     
-    def cleanup_old_files(self, retention_days: int):
-        self.logger.task("清理过期文件")
+    def verify_result(self, result: dict, level: str) -> dict:
+        outcome = {'database': result['database'], 'passed': 0, 'total': 0,
+                   'start': time.monotonic(), 'end': None}
+        checksums = self.checksum.verify_many(result['files']) if level == 'full' else {}
         
-        cutoff_time = time.time() - (retention_days * 86400)
+        for backup_file in result['files']:
+            outcome['total'] += 1
+            if level != 'full':
+                passed = self.verify_backup(backup_file, level=level)
+            elif not checksums.get(backup_file):
+                passed = False
+            elif '.dump' in backup_file or is_directory_artifact(backup_file) or is_copy_artifact(backup_file):
+                passed = self.verify_backup(backup_file, level=level, verify_checksum=False)
+            else:
+                passed = True
+            if passed:
+                outcome['passed'] += 1
         
-        for subdir in ['data', 'logs']:
-            dir_path = Path(self.config.BACKUP_DIR) / subdir
-            if not dir_path.exists():
+        outcome['end'] = time.monotonic()
+        return outcome
+    
+    def cleanup_logs(self, cutoff_date: str):
+        logs_dir = Path(self.config.BACKUP_DIR) / 'logs'
+        if not logs_dir.exists():
+            return
+        
+        current_log_dir = os.path.normpath(self.logger.log_dir) if self.logger.log_dir else None
+        for date_dir in logs_dir.iterdir():
+            if not date_dir.is_dir() or not date_dir.name.isdigit() or date_dir.name >= cutoff_date:
                 continue
-            
-            deleted_count = 0
-            deleted_size = 0
-            
-            for file_path in dir_path.rglob('*'):
-                if file_path.is_file():
-                    try:
-                        if file_path.stat().st_mtime < cutoff_time:
-                            file_size = file_path.stat().st_size
-                            file_path.unlink()
-                            deleted_count += 1
-                            deleted_size += file_size
-                            self.logger.subtask(f"删除: {file_path.name}")
-                    except Exception as e:
-                        self.logger.warning(f"删除失败: {file_path} - {e}")
-            
-            for dir_path in dir_path.rglob('*'):
-                if dir_path.is_dir() and not any(dir_path.iterdir()):
-                    try:
-                        dir_path.rmdir()
-                        self.logger.info(f"删除空目录: {dir_path.name}")
-                    except:
-                        pass
-            
-            if deleted_count > 0:
-                self.logger.success(
-                    f"清理完成: 删除 {deleted_count} 个文件，释放 {deleted_size} bytes"
-                )
-            else:
-                self.logger.info("无过期文件")
+            if os.path.normpath(str(date_dir)) == current_log_dir:
+                continue
+            try:
+                shutil.rmtree(date_dir)
+                self.logger.subtask(f"删除日志目录: {date_dir.name}")
+            except Exception as e:
+                self.logger.warning(f"删除失败: {date_dir} - {e}")
+    
+    def cleanup_old_files(self, dry_run: bool = None) -> dict:
+        if dry_run is None:
+            dry_run = self.config.RETENTION_DRY_RUN
+        
+        self.logger.task("清理过期备份" + (" (dry-run)" if dry_run else ""))
+        self.catalog.ensure()
+        
+        outcome = self.retention.apply(dry_run)
+        if dry_run:
+            return outcome
+        
+        cutoff_time = datetime.now() - timedelta(days=self.config.BACKUP_RETENTION_DAYS)
+        self.cleanup_logs(cutoff_time.strftime('%Y%m%d'))
+        
+        if self.repository.chunk_dir.exists():
+            indexes, _ = self.catalog.list_artifacts()
+            self.repository.collect_garbage(
+                artifact['path'] for artifact in indexes
+                if artifact['path'].endswith(REPOSITORY_INDEX_SUFFIX)
+            )
+        
+        return outcome
     
-    def run_backup(self, verify: bool = False, parallel: bool = False) -> bool:
+    def run_backup(self, verify: bool = False, parallel: bool = False, verify_level: str = None) -> bool:
+        try:
+            return self.perform_backup(verify, parallel, verify_level)
+        finally:
+            self.conn.pool.close_all()
+    
+    def perform_backup(self, verify: bool = False, parallel: bool = False, verify_level: str = None) -> bool:
         start_time = datetime.now()
         
         self.logger.header("备份任务开始")
@@ -285,6 +648,7 @@ class BackupManager:
         paths = self.config.ensure_dirs()
         backup_dir = str(paths['backup_data'])
         timestamp = self.config.get_timestamp()
+        self.catalog.ensure()
         
         pg_dump_path = self.conn.get_pg_dump_path()
         if not pg_dump_path:
@@ -304,44 +668,88 @@ class BackupManager:
         total_size = 0
         
         enable_parallel = parallel or self.config.ENABLE_PARALLEL
+        planner = BackupPlanner(self.config, self.conn, self.history)
+        predicted_makespan = None
         
-        if enable_parallel and len(databases) > 1:
-            self.logger.task(f"启用并发备份 (并发数: {self.config.BACKUP_PARALLEL_WORKERS})")
-            
-            with ThreadPoolExecutor(max_workers=self.config.BACKUP_PARALLEL_WORKERS) as executor:
-                futures = {
-                    executor.submit(
-                        self.backup_single_database, db, backup_dir, timestamp, pg_dump_path
-                    ): db for db in databases
-                }
+        verify_level = self.verifier.resolve_level(verify_level) if verify else None
+        verify_pool = None
+        verify_futures = {}
+        if verify_level:
+            self.logger.task(f"启用流水线验证 (级别: {verify_level}, 并发数: {self.config.VERIFY_WORKERS})")
+            verify_pool = ThreadPoolExecutor(
+                max_workers=self.config.VERIFY_WORKERS, thread_name_prefix='verify'
+            )
+        
+        def collect(result: dict):
+            nonlocal success_count, total_size
+            results.append(result)
+            if result['success']:
+                success_count += 1
+                total_size += result['size']
+                backup_files.extend(result['files'])
+                if verify_pool and not result.get('skipped') and result['files']:
+                    future = verify_pool.submit(self.verify_result, result, verify_level)
+                    verify_futures[future] = result['database']
+        
+        backup_start = time.monotonic()
+        
+        try:
+            if enable_parallel and len(databases) > 1:
+                self.logger.task(f"启用并发备份 (并发数: {self.config.BACKUP_PARALLEL_WORKERS})")
                 
-                for future in as_completed(futures):
-                    db = futures[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
-                        if result['success']:
-                            success_count += 1
-                            total_size += result['size']
-                            backup_files.extend(result['files'])
-                    except Exception as e:
-                        self.logger.error(f"并发备份异常: {db} - {e}")
-                        results.append({'database': db, 'success': False, 'error': str(e)})
-        else:
-            for database in databases:
-                result = self.backup_single_database(
-                    database, backup_dir, timestamp, pg_dump_path
-                )
-                results.append(result)
-                if result['success']:
-                    success_count += 1
-                    total_size += result['size']
-                    backup_files.extend(result['files'])
+                if self.config.ENABLE_SIZE_SCHEDULING:
+                    databases, _, predicted_makespan = planner.plan(
+                        databases, self.config.BACKUP_PARALLEL_WORKERS
+                    )
+                
+                with ThreadPoolExecutor(max_workers=self.config.BACKUP_PARALLEL_WORKERS) as executor:
+                    futures = {
+                        executor.submit(
+                            self.backup_single_database, db, backup_dir, timestamp, pg_dump_path
+                        ): db for db in databases
+                    }
+                    
+                    for future in as_completed(futures):
+                        db = futures[future]
+                        try:
+                            collect(future.result())
+                        except Exception as e:
+                            self.logger.error(f"并发备份异常: {db} - {e}")
+                            results.append({'database': db, 'success': False, 'error': str(e)})
+            else:
+                for database in databases:
+                    collect(self.backup_single_database(
+                        database, backup_dir, timestamp, pg_dump_path
+                    ))
+            
+            backup_end = time.monotonic()
+            actual_makespan = backup_end - backup_start
+            planner.record(results)
+            
+            verify_outcomes = []
+            for future in as_completed(verify_futures):
+                try:
+                    verify_outcomes.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"验证异常: {verify_futures[future]} - {e}")
+        finally:
+            if verify_pool:
+                verify_pool.shutdown(wait=True)
+        
+        skipped = [r['database'] for r in results if r.get('skipped')]
         
-        if verify and backup_files:
-            for backup_file in backup_files:
-                if '.dump' in backup_file:
-                    self.verify_backup(backup_file, databases[0])
+        verify_passed = sum(o['passed'] for o in verify_outcomes)
+        verify_total = sum(o['total'] for o in verify_outcomes)
+        verify_stage = '未验证'
+        if verify_outcomes:
+            verify_start = min(o['start'] for o in verify_outcomes)
+            verify_end = max(o['end'] for o in verify_outcomes)
+            verify_busy = sum(o['end'] - o['start'] for o in verify_outcomes)
+            overlap = max(0.0, min(backup_end, verify_end) - verify_start)
+            verify_stage = (
+                f"{verify_end - verify_start:.1f}s (累计 {verify_busy:.1f}s, "
+                f"与备份重叠 {overlap:.1f}s, 备份后追加 {max(0.0, verify_end - backup_end):.1f}s)"
+            )
         
         end_time = datetime.now()
         duration = end_time - start_time
@@ -351,14 +759,26 @@ class BackupManager:
             '结束时间': end_time.strftime('%Y-%m-%d %H:%M:%S'),
             '耗时': str(duration),
             '并发模式': '启用' if enable_parallel else '禁用',
+            '备份阶段耗时': (
+                f"{actual_makespan:.1f}s (预计 {predicted_makespan:.1f}s)"
+                if predicted_makespan is not None else f"{actual_makespan:.1f}s"
+            ),
             '成功数量': f"{success_count}/{len(databases)}",
+            '验证阶段耗时': verify_stage,
+            '验证结果': (
+                f"{verify_passed}/{verify_total} 通过 ({verify_level})" if verify_level else '未验证'
+            ),
+            '跳过数量 (无变更)': len(skipped),
             '文件数量': len(backup_files),
             '总大小': f"{total_size} bytes",
         })
         
         if backup_files:
             self.logger.print_list("备份文件列表", backup_files, 
-                lambda i, f: f"    {i}. {Path(f).name} ({os.path.getsize(f)} bytes)")
+                lambda i, f: f"    {i}. {Path(f).name} ({get_artifact_size(f)} bytes)")
+        
+        if skipped:
+            self.logger.print_list("无变更跳过的数据库", skipped)
         
         for result in results:
             if not result['success']:
@@ -366,11 +786,13 @@ class BackupManager:
                     f"数据库 {result['database']} 备份失败: {result.get('error', '未知')}"
                 )
         
+        self.catalog.record_run(timestamp, start_time, end_time, results)
+        
         if success_count == 0:
             self.logger.error("没有成功完成任何备份")
             return False
         
-        self.cleanup_old_files(self.config.BACKUP_RETENTION_DAYS)
+        self.cleanup_old_files()
         
         return True
     
@@ -0,0 +1,302 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .logger import get_logger
+from .config import Config
+from .compression import strip_codec_extension
+from .artifact import (
+    COPY_SUFFIX, DIRECTORY_SUFFIX, REPOSITORY_INDEX_SUFFIX,
+    get_artifact_format, get_artifact_size, is_copy_artifact, is_directory_artifact
+)
+
+
+CATALOG_FILE = 'catalog.db'
+ARTIFACT_NAME_PATTERN = re.compile(r'^(?P<database>.+)_(?P<timestamp>\d{8}_\d{6})\.')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    duration REAL,
+    status TEXT NOT NULL,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    total_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER REFERENCES runs(id) ON DELETE SET NULL,
+    database TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    size INTEGER,
+    db_size INTEGER,
+    duration REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    backup_id INTEGER NOT NULL REFERENCES backups(id) ON DELETE CASCADE,
+    path TEXT NOT NULL UNIQUE,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_backups_database_created ON backups(database, created_at);
+CREATE INDEX IF NOT EXISTS idx_backups_created ON backups(created_at);
+CREATE INDEX IF NOT EXISTS idx_artifacts_backup ON artifacts(backup_id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_format ON artifacts(format);
+"""
+
+ARTIFACT_QUERY = """
+    SELECT a.path, a.format, a.size, a.checksum, b.database, b.created_at, b.status, b.duration
+    FROM artifacts a JOIN backups b ON b.id = a.backup_id
+"""
+
+
+def read_checksum(path: str) -> Optional[str]:
+    checksum_file = f'{path.rstrip(os.sep)}.sha256'
+    if not os.path.exists(checksum_file):
+        return None
+    
+    if os.path.isdir(path):
+        with open(checksum_file, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    
+    with open(checksum_file, 'r') as f:
+        parts = f.read().split()
+    return parts[0] if parts else None
+
+
+class BackupCatalog:
+    def __init__(self, config: Config = None, backup_dir: str = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.backup_dir = Path(backup_dir or self.config.BACKUP_DIR)
+        self.path = self.backup_dir / CATALOG_FILE
+        self.lock = threading.Lock()
+    
+    def exists(self) -> bool:
+        return self.path.exists()
+    
+    @contextmanager
+    def connect(self):
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            try:
+                conn.execute('PRAGMA foreign_keys = ON')
+                conn.execute('PRAGMA journal_mode = WAL')
+                conn.executescript(SCHEMA)
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+    
+    def _insert_backup(self, conn, run_id: Optional[int], database: str, created_at: str,
+                       status: str, files: list, size: int = None, db_size: int = None,
+                       duration: float = None, error: str = None):
+        cursor = conn.execute(
+            "INSERT INTO backups (run_id, database, created_at, status, size, db_size, duration, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, database, created_at, status, size, db_size, duration, error)
+        )
+        backup_id = cursor.lastrowid
+        
+        conn.executemany(
+            "INSERT OR REPLACE INTO artifacts (backup_id, path, format, size, checksum) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (backup_id, str(path), get_artifact_format(str(path)),
+                 get_artifact_size(str(path)), read_checksum(str(path)))
+                for path in files if os.path.exists(path)
+            ]
+        )
+    
+    def record_run(self, timestamp: str, start_time: datetime, end_time: datetime,
+                   results: list):
+        created_at = datetime.strptime(timestamp, '%Y%m%d_%H%M%S').isoformat(sep=' ')
+        success_count = sum(1 for r in results if r.get('success'))
+        status = 'success' if success_count == len(results) else (
+            'partial' if success_count else 'failed'
+        )
+        
+        try:
+            with self.connect() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (timestamp, started_at, finished_at, duration, status, "
+                    "success_count, total_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (timestamp, start_time.isoformat(sep=' ', timespec='seconds'),
+                     end_time.isoformat(sep=' ', timespec='seconds'),
+                     (end_time - start_time).total_seconds(), status, success_count, len(results))
+                )
+                run_id = cursor.lastrowid
+                
+                for result in results:
+                    if result.get('skipped'):
+                        backup_status = 'skipped'
+                    else:
+                        backup_status = 'success' if result.get('success') else 'failed'
+                    self._insert_backup(
+                        conn, run_id, result['database'], created_at, backup_status,
+                        result.get('files', []), result.get('size'), result.get('db_size'),
+                        result.get('duration'), result.get('error')
+                    )
+            
+            self.logger.info(f"备份索引库已更新: {self.path}")
+        except Exception as e:
+            self.logger.warning(f"写入备份索引库失败: {e}")
+    
+    def scan(self) -> List[dict]:
+        data_dir = self.backup_dir / 'data'
+        if not data_dir.exists():
+            return []
+        
+        artifacts = []
+        for root, dirs, files in os.walk(data_dir):
+            candidates = []
+            for dir_name in list(dirs):
+                dir_path = os.path.join(root, dir_name)
+                if ((dir_name.endswith(DIRECTORY_SUFFIX) and is_directory_artifact(dir_path))
+                        or (dir_name.endswith(COPY_SUFFIX) and is_copy_artifact(dir_path))):
+                    dirs.remove(dir_name)
+                    candidates.append(dir_path)
+            
+            for file in files:
+                if (file.endswith(REPOSITORY_INDEX_SUFFIX)
+                        or strip_codec_extension(file).endswith(('.dump', '.sql'))):
+                    candidates.append(os.path.join(root, file))
+            
+            for path in candidates:
+                match = ARTIFACT_NAME_PATTERN.match(Path(path).name)
+                if match:
+                    database = match.group('database')
+                    created_at = datetime.strptime(match.group('timestamp'), '%Y%m%d_%H%M%S')
+                else:
+                    database = Path(path).name.split('.')[0]
+                    created_at = datetime.fromtimestamp(os.stat(path).st_mtime).replace(microsecond=0)
+                artifacts.append({
+                    'path': path,
+                    'database': database,
+                    'created_at': created_at.isoformat(sep=' '),
+                })
+        
+        return artifacts
+    
+    def reindex(self) -> int:
+        self.logger.task(f"重建备份索引库: {self.path}")
+        artifacts = self.scan()
+        
+        groups = {}
+        for artifact in artifacts:
+            groups.setdefault((artifact['database'], artifact['created_at']), []).append(
+                artifact['path']
+            )
+        
+        with self.connect() as conn:
+            conn.execute("DELETE FROM artifacts")
+            conn.execute("DELETE FROM backups")
+            for (database, created_at), files in sorted(groups.items()):
+                self._insert_backup(
+                    conn, None, database, created_at, 'success', files,
+                    sum(get_artifact_size(path) for path in files)
+                )
+        
+        self.logger.success(f"备份索引库重建完成: {len(groups)} 个备份, {len(artifacts)} 个文件")
+        return len(artifacts)
+    
+    def ensure(self):
+        if not self.exists():
+            self.reindex()
+    
+    def list_artifacts(self, database: str = None, since: str = None, until: str = None,
+                       fmt: str = None, limit: int = None, offset: int = 0) -> Tuple[List[dict], int]:
+        conditions, params = [], []
+        if database:
+            conditions.append("b.database = ?")
+            params.append(database)
+        if since:
+            conditions.append("b.created_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("b.created_at < ?")
+            params.append(until)
+        if fmt:
+            conditions.append("a.format = ?")
+            params.append(fmt)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with self.connect() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM artifacts a JOIN backups b ON b.id = a.backup_id{where}", params
+            ).fetchone()[0]
+            
+            query = f"{ARTIFACT_QUERY}{where} ORDER BY b.created_at DESC, a.path"
+            if limit:
+                query += " LIMIT ? OFFSET ?"
+                params = params + [limit, offset]
+            rows = conn.execute(query, params).fetchall()
+        
+        return [
+            {
+                'path': path,
+                'name': Path(path).name + ('/' if fmt_name in ('directory', 'copy') else ''),
+                'format': fmt_name,
+                'type': fmt_name,
+                'size': size,
+                'checksum': checksum,
+                'database': database,
+                'date': datetime.fromisoformat(created_at),
+                'status': status,
+                'duration': duration,
+            }
+            for path, fmt_name, size, checksum, database, created_at, status, duration in rows
+        ], total
+    
+    def find_latest(self, database: str, fmt: str = None) -> Optional[str]:
+        artifacts, _ = self.list_artifacts(database=database, fmt=fmt, limit=1)
+        return artifacts[0]['path'] if artifacts else None
+    
+    def list_backup_sets(self) -> List[dict]:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT b.id, b.database, b.created_at, a.path, a.size "
+                "FROM backups b JOIN artifacts a ON a.backup_id = b.id "
+                "ORDER BY b.database, b.created_at DESC, b.id DESC, a.path"
+            ).fetchall()
+        
+        backup_sets = {}
+        for backup_id, database, created_at, path, size in rows:
+            backup_set = backup_sets.setdefault(backup_id, {
+                'id': backup_id,
+                'database': database,
+                'date': datetime.fromisoformat(created_at),
+                'paths': [],
+                'size': 0,
+            })
+            backup_set['paths'].append(path)
+            backup_set['size'] += size
+        
+        return list(backup_sets.values())
+    
+    def remove_paths(self, paths: list):
+        if not paths:
+            return
+        with self.connect() as conn:
+            conn.executemany("DELETE FROM artifacts WHERE path = ?", [(str(p),) for p in paths])
+            conn.execute(
+                "DELETE FROM backups WHERE status != 'failed' "
+                "AND NOT EXISTS (SELECT 1 FROM artifacts a WHERE a.backup_id = backups.id)"
+            )
+
+
+def get_backup_catalog(config: Config = None, backup_dir: str = None) -> BackupCatalog:
+    return BackupCatalog(config, backup_dir)
\ No newline at end of file
@@ -1,14 +1,245 @@
 import os
 import hashlib
+import json
+import mmap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Dict, Iterable, Tuple, Optional
 
 from .logger import get_logger
+from .config import Config
+from .artifact import iter_artifact_files
+from .progress import FileOffsetProbe, ProgressTracker
+
+
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+MERKLE_SUFFIX = '.merkle'
+
+
+class HashingWriter:
+    def __init__(self, f_out, chunk_size: int = 0):
+        self.f_out = f_out
+        self.sha256_hash = hashlib.sha256()
+        self.size = 0
+        self.chunk_size = chunk_size
+        self.chunk_hash = hashlib.sha256()
+        self.chunk_fill = 0
+        self.chunk_digests = []
+    
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.sha256_hash.update(data)
+        if self.f_out is not None:
+            self.f_out.write(data)
+        self.size += len(data)
+        if self.chunk_size:
+            self._update_chunks(memoryview(data))
+    
+    def _update_chunks(self, view: memoryview):
+        offset = 0
+        while offset < len(view):
+            take = min(self.chunk_size - self.chunk_fill, len(view) - offset)
+            self.chunk_hash.update(view[offset:offset + take])
+            self.chunk_fill += take
+            offset += take
+            if self.chunk_fill == self.chunk_size:
+                self.chunk_digests.append(self.chunk_hash.hexdigest())
+                self.chunk_hash = hashlib.sha256()
+                self.chunk_fill = 0
+    
+    def hexdigest(self) -> str:
+        return self.sha256_hash.hexdigest()
+    
+    def chunk_hexdigests(self) -> list:
+        if self.chunk_fill:
+            return self.chunk_digests + [self.chunk_hash.hexdigest()]
+        return list(self.chunk_digests)
+
+
+# 恢复时单次读取备份文件：边计算 checksum 边送入解压/恢复进程；最后一块在校验通过前扣留，
+# 校验失败时先终止下游进程，恢复端的单事务因连接中断而回滚
+class ChecksumTee:
+    def __init__(self, file_path: str, sink, expected: Optional[str] = None, manifest: dict = None,
+                 tracker: ProgressTracker = None):
+        self.file_path = file_path
+        self.sink = sink
+        self.tracker = tracker
+        self.expected = expected
+        self.manifest = manifest
+        self.writer = HashingWriter(None, manifest['chunk_size'] if manifest else 0)
+        self.checked = 0
+        self.processes = []
+        self.verified = None
+        self.error = None
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+    
+    def start(self, processes: list):
+        self.processes = processes
+        self.thread.start()
+    
+    def _check_chunks(self) -> bool:
+        if not self.manifest:
+            return True
+        chunks = self.manifest['chunks']
+        for index in range(self.checked, len(self.writer.chunk_digests)):
+            if index >= len(chunks) or self.writer.chunk_digests[index] != chunks[index]:
+                chunk_size = self.manifest['chunk_size']
+                self.error = (
+                    f"Checksum 验证失败: 块 {index}，字节 {index * chunk_size}-{(index + 1) * chunk_size - 1}"
+                )
+                return False
+        self.checked = len(self.writer.chunk_digests)
+        return True
+    
+    def _abort(self, error: str = None):
+        self.verified = False
+        self.error = error or self.error
+        for proc in self.processes:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+    
+    def _feed(self):
+        pending = b''
+        try:
+            with open(self.file_path, 'rb') as f_in, self.sink:
+                for data in iter(lambda: f_in.read(HASH_BUFFER_SIZE), b''):
+                    self.writer.write(data)
+                    if self.tracker:
+                        self.tracker.update(len(data))
+                    if not self._check_chunks():
+                        self._abort()
+                        return
+                    if pending:
+                        self.sink.write(pending)
+                    pending = data
+                
+                if self.manifest and self.writer.chunk_hexdigests() != self.manifest['chunks']:
+                    self._abort(f"Checksum 验证失败: 分块清单不一致 ({self.writer.size} bytes)")
+                    return
+                if self.expected and self.writer.hexdigest() != self.expected:
+                    self._abort(
+                        f"Checksum 验证失败: 期望 {self.expected}，实际 {self.writer.hexdigest()}"
+                    )
+                    return
+                
+                self.verified = True
+                if pending:
+                    self.sink.write(pending)
+        except BrokenPipeError:
+            if not self.verified:
+                self.verified = False
+                self.error = "恢复进程提前退出，Checksum 未完成验证"
+        except Exception as e:
+            self._abort(f"读取备份文件失败: {e}")
+    
+    def wait(self, timeout: float = None) -> bool:
+        self.thread.join(timeout)
+        return bool(self.verified)
 
 
 class ChecksumManager:
-    def __init__(self):
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
         self.logger = get_logger()
+        self.workers = max(1, self.config.CHECKSUM_WORKERS)
+        self.use_mmap = self.config.CHECKSUM_MMAP
+        self.chunk_size = max(0, self.config.CHECKSUM_CHUNK_SIZE)
+    
+    def create_writer(self, f_out) -> HashingWriter:
+        return HashingWriter(f_out, self.chunk_size)
+    
+    def _digest_file(self, f, file_size: int, tracker: ProgressTracker = None):
+        if self.use_mmap and file_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                sha256_hash = hashlib.sha256()
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, file_size, HASH_BUFFER_SIZE):
+                        sha256_hash.update(view[offset:offset + HASH_BUFFER_SIZE])
+                        if tracker:
+                            tracker.update(min(HASH_BUFFER_SIZE, file_size - offset))
+                finally:
+                    view.release()
+                return sha256_hash
+        
+        if hasattr(hashlib, 'file_digest'):
+            probe = FileOffsetProbe(tracker, os.getpid(), f.name).start() if tracker else None
+            try:
+                return hashlib.file_digest(f, 'sha256')
+            finally:
+                if probe:
+                    probe.stop()
+                    tracker.advance_to(file_size)
+        
+        sha256_hash = hashlib.sha256()
+        buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        for size in iter(lambda: f.readinto(buffer), 0):
+            sha256_hash.update(view[:size])
+            if tracker:
+                tracker.update(size)
+        return sha256_hash
+    
+    def hash_file(self, file_path: str) -> str:
+        with open(file_path, 'rb') as f:
+            return self._digest_file(f, os.fstat(f.fileno()).st_size).hexdigest()
+    
+    def hash_file_timed(self, file_path: str, tracker: ProgressTracker = None) -> Tuple[str, int, float]:
+        start = time.monotonic()
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            checksum = self._digest_file(f, file_size, tracker).hexdigest()
+        return checksum, file_size, time.monotonic() - start
+    
+    def hash_bytes(self, data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+    
+    def hash_file_chunked(self, file_path: str, tracker: ProgressTracker = None) -> HashingWriter:
+        writer = HashingWriter(None, self.chunk_size)
+        buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        with open(file_path, 'rb') as f:
+            for size in iter(lambda: f.readinto(buffer), 0):
+                writer.write(view[:size])
+                if tracker:
+                    tracker.update(size)
+        return writer
+    
+    def hash_range(self, file_path: str, offset: int, length: int) -> str:
+        sha256_hash = hashlib.sha256()
+        end = offset + length
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            while offset < end:
+                data = os.pread(fd, min(HASH_BUFFER_SIZE, end - offset), offset)
+                if not data:
+                    break
+                sha256_hash.update(data)
+                offset += len(data)
+        finally:
+            os.close(fd)
+        return sha256_hash.hexdigest()
+    
+    def merkle_root(self, chunk_digests: list) -> str:
+        return hashlib.sha256(b''.join(bytes.fromhex(d) for d in chunk_digests)).hexdigest()
+    
+    def hash_files(self, file_paths: Iterable[str]) -> Dict[str, str]:
+        file_paths = list(file_paths)
+        if len(file_paths) <= 1 or self.workers == 1:
+            return {path: self.hash_file(path) for path in file_paths}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(file_paths))) as executor:
+            return dict(zip(file_paths, executor.map(self.hash_file, file_paths)))
+    
+    def format_throughput(self, size: int, elapsed: float) -> str:
+        rate = size / elapsed / (1024 * 1024) if elapsed > 0 else 0
+        return f"{size / (1024*1024):.2f} MB, {elapsed:.2f}s, {rate:.1f} MB/s"
     
     def calculate(self, file_path: str) -> Tuple[str, str]:
         try:
@@ -17,116 +248,234 @@ class ChecksumManager:
                 return None, None
             
             self.logger.info(f"计算 checksum: {file_path}")
+            file_size = os.path.getsize(file_path)
+            
+            if self.chunk_size and file_size > self.chunk_size:
+                start = time.monotonic()
+                with ProgressTracker('hash', f'Checksum {Path(file_path).name}', file_size) as tracker:
+                    writer = self.hash_file_chunked(file_path, tracker)
+                self.logger.info(
+                    f"Checksum 计算完成 ({self.format_throughput(writer.size, time.monotonic() - start)})"
+                )
+                checksum_file = self.write_stream_checksums(file_path, writer)
+                return writer.hexdigest(), checksum_file
+            
+            with ProgressTracker('hash', f'Checksum {Path(file_path).name}', file_size) as tracker:
+                checksum, file_size, elapsed = self.hash_file_timed(file_path, tracker)
+            self.logger.info(f"Checksum 计算完成 ({self.format_throughput(file_size, elapsed)})")
+            checksum_file = self.write_checksum_file(file_path, checksum)
+            
+            return checksum, checksum_file
             
-            sha256_hash = hashlib.sha256()
+        except Exception as e:
+            self.logger.error(f"Checksum 计算失败: {e}")
+            return None, None
+    
+    def write_checksum_file(self, file_path: str, checksum: str) -> str:
+        checksum_file = f'{file_path}.sha256'
+        
+        with open(checksum_file, 'w') as f:
+            f.write(f'{checksum}  {Path(file_path).name}\n')
+        
+        self.logger.success(f"Checksum: {checksum}")
+        self.logger.info(f"Checksum 文件: {checksum_file}")
+        
+        return checksum_file
+    
+    def write_merkle_manifest(self, file_path: str, size: int, chunk_digests: list) -> Optional[str]:
+        if len(chunk_digests) < 2:
+            return None
+        
+        manifest_file = f'{file_path}{MERKLE_SUFFIX}'
+        manifest = {
+            'algorithm': 'sha256',
+            'chunk_size': self.chunk_size,
+            'size': size,
+            'root': self.merkle_root(chunk_digests),
+            'chunks': chunk_digests,
+        }
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        
+        self.logger.info(f"分块 checksum: {len(chunk_digests)} 块, root {manifest['root']}")
+        return manifest_file
+    
+    def write_stream_checksums(self, file_path: str, writer: HashingWriter) -> str:
+        checksum_file = self.write_checksum_file(file_path, writer.hexdigest())
+        if writer.chunk_size:
+            self.write_merkle_manifest(file_path, writer.size, writer.chunk_hexdigests())
+        return checksum_file
+    
+    def verify_chunked(self, file_path: str) -> bool:
+        try:
+            with open(f'{file_path}{MERKLE_SUFFIX}', 'r') as f:
+                manifest = json.load(f)
+            
+            chunk_size = manifest['chunk_size']
+            chunks = manifest['chunks']
             file_size = os.path.getsize(file_path)
             
-            with open(file_path, 'rb') as f:
-                chunk_size = 8192
-                if file_size > 100 * 1024 * 1024:
-                    self.logger.info(f"大文件 ({file_size / (1024*1024):.2f} MB)，计算中...")
-                    processed = 0
-                    while True:
-                        chunk = f.read(chunk_size)
-                        if not chunk:
-                            break
-                        sha256_hash.update(chunk)
-                        processed += len(chunk)
-                        if processed % (50 * 1024 * 1024) == 0:
-                            progress = (processed / file_size) * 100
-                            self.logger.info(f"Checksum 进度: {progress:.1f}%")
-                else:
-                    while True:
-                        chunk = f.read(chunk_size)
-                        if not chunk:
-                            break
-                        sha256_hash.update(chunk)
-            
-            checksum = sha256_hash.hexdigest()
-            checksum_file = f'{file_path}.sha256'
+            self.logger.info(
+                f"分块验证 checksum: {file_path} ({len(chunks)} 块, 线程: {self.workers})"
+            )
+            
+            if self.merkle_root(chunks) != manifest['root']:
+                self.logger.error(f"分块清单 root 不一致，清单可能已损坏: {file_path}{MERKLE_SUFFIX}")
+                return False
             
-            with open(checksum_file, 'w') as f:
-                f.write(f'{checksum}  {Path(file_path).name}\n')
+            if file_size != manifest['size']:
+                self.logger.error(f"Checksum 验证失败: 文件大小 {file_size} 与清单 {manifest['size']} 不一致")
+                return False
             
-            self.logger.success(f"Checksum: {checksum}")
-            self.logger.info(f"Checksum 文件: {checksum_file}")
+            failed = threading.Event()
             
-            return checksum, checksum_file
+            def check_chunk(index: int) -> Optional[bool]:
+                if failed.is_set():
+                    return None
+                offset = index * chunk_size
+                ok = self.hash_range(file_path, offset, min(chunk_size, file_size - offset)) == chunks[index]
+                if not ok:
+                    failed.set()
+                return ok
+            
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+                results = list(executor.map(check_chunk, range(len(chunks))))
+            elapsed = time.monotonic() - start
+            
+            bad_chunks = [index for index, ok in enumerate(results) if ok is False]
+            if bad_chunks:
+                self.logger.error(f"Checksum 验证失败: {Path(file_path).name}")
+                for index in bad_chunks:
+                    offset = index * chunk_size
+                    end = min(offset + chunk_size, file_size) - 1
+                    self.logger.error(f"损坏区间: 块 {index}，字节 {offset}-{end}")
+                skipped = sum(1 for ok in results if ok is None)
+                if skipped:
+                    self.logger.info(f"发现损坏后停止验证，跳过 {skipped} 块")
+                return False
+            
+            self.logger.success(
+                f"Checksum 验证通过: {Path(file_path).name} "
+                f"({len(chunks)} 块, {self.format_throughput(file_size, elapsed)})"
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Checksum 验证异常: {e}")
+            return False
+    
+    def calculate_directory(self, dir_path: str) -> Tuple[str, str]:
+        try:
+            if not os.path.isdir(dir_path):
+                self.logger.error(f"目录不存在: {dir_path}")
+                return None, None
+            
+            self.logger.info(f"计算目录 checksum: {dir_path}")
+            
+            start = time.monotonic()
+            hashes = self.hash_files(iter_artifact_files(dir_path))
+            total_size = sum(os.path.getsize(path) for path in hashes)
+            self.logger.info(
+                f"目录 Checksum 计算完成 ({self.format_throughput(total_size, time.monotonic() - start)})"
+            )
+            
+            checksums = {os.path.relpath(path, dir_path): digest for path, digest in hashes.items()}
+            return self.write_directory_checksum(dir_path, checksums)
             
         except Exception as e:
             self.logger.error(f"Checksum 计算失败: {e}")
             return None, None
     
-    def verify(self, file_path: str) -> bool:
+    def write_directory_checksum(self, dir_path: str, checksums: dict) -> Tuple[str, str]:
+        lines = [f'{checksums[rel_path]}  {rel_path}\n' for rel_path in sorted(checksums)]
+        manifest_hash = hashlib.sha256(''.join(lines).encode('utf-8')).hexdigest()
+        checksum_file = f'{dir_path.rstrip(os.sep)}.sha256'
+        
+        with open(checksum_file, 'w') as f:
+            f.writelines(lines)
+        
+        self.logger.success(f"Checksum: {manifest_hash} ({len(lines)} 个文件)")
+        self.logger.info(f"Checksum 文件: {checksum_file}")
+        
+        return manifest_hash, checksum_file
+    
+    def verify_directory(self, dir_path: str) -> bool:
         try:
-            checksum_file = f'{file_path}.sha256'
+            checksum_file = f'{dir_path.rstrip(os.sep)}.sha256'
             
             if not os.path.exists(checksum_file):
                 self.logger.warning(f"Checksum 文件不存在: {checksum_file}")
                 return True
             
-            if not os.path.exists(file_path):
-                self.logger.error(f"备份文件不存在: {file_path}")
-                return False
-            
-            self.logger.info(f"验证 checksum: {file_path}")
+            self.logger.info(f"验证目录 checksum: {dir_path}")
             
             with open(checksum_file, 'r') as f:
-                content = f.read().strip()
-                expected = content.split()[0]
+                entries = [line.strip().split(None, 1) for line in f if line.strip()]
             
-            sha256_hash = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    sha256_hash.update(chunk)
+            expected_files = {rel_path for _, rel_path in entries}
+            actual_files = {os.path.relpath(p, dir_path) for p in iter_artifact_files(dir_path)}
             
-            actual = sha256_hash.hexdigest()
+            missing = expected_files - actual_files
+            if missing:
+                self.logger.error(f"Checksum 验证失败，缺少文件: {', '.join(sorted(missing))}")
+                return False
             
-            if actual == expected:
-                self.logger.success("Checksum 验证通过")
-                return True
+            start = time.monotonic()
+            actual_hashes = self.hash_files(os.path.join(dir_path, rel_path) for _, rel_path in entries)
+            elapsed = time.monotonic() - start
             
-            self.logger.error("Checksum 验证失败")
-            self.logger.error(f"期望: {expected}")
-            self.logger.error(f"实际: {actual}")
-            return False
+            for expected, rel_path in entries:
+                actual = actual_hashes[os.path.join(dir_path, rel_path)]
+                if actual != expected:
+                    self.logger.error(f"Checksum 验证失败: {rel_path}")
+                    self.logger.error(f"期望: {expected}")
+                    self.logger.error(f"实际: {actual}")
+                    return False
+            
+            total_size = sum(os.path.getsize(path) for path in actual_hashes)
+            self.logger.success(
+                f"Checksum 验证通过 ({len(entries)} 个文件, {self.format_throughput(total_size, elapsed)})"
+            )
+            return True
             
         except Exception as e:
             self.logger.error(f"Checksum 验证异常: {e}")
             return False
     
-    def verify_gz_streaming(self, gz_file_path: str) -> bool:
-        import gzip
+    def verify(self, file_path: str) -> bool:
+        if os.path.isdir(file_path):
+            return self.verify_directory(file_path)
+        
+        if os.path.exists(f'{file_path}{MERKLE_SUFFIX}') and os.path.exists(file_path):
+            return self.verify_chunked(file_path)
         
         try:
-            checksum_file = f'{gz_file_path}.sha256'
+            checksum_file = f'{file_path}.sha256'
             
             if not os.path.exists(checksum_file):
                 self.logger.warning(f"Checksum 文件不存在: {checksum_file}")
                 return True
             
-            if not os.path.exists(gz_file_path):
-                self.logger.error(f"压缩文件不存在: {gz_file_path}")
+            if not os.path.exists(file_path):
+                self.logger.error(f"备份文件不存在: {file_path}")
                 return False
             
-            self.logger.info(f"验证 checksum: {gz_file_path}")
+            self.logger.info(f"验证 checksum: {file_path}")
             
             with open(checksum_file, 'r') as f:
                 content = f.read().strip()
                 expected = content.split()[0]
             
-            sha256_hash = hashlib.sha256()
-            with open(gz_file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    sha256_hash.update(chunk)
-            
-            actual = sha256_hash.hexdigest()
+            actual, file_size, elapsed = self.hash_file_timed(file_path)
             
             if actual == expected:
-                self.logger.success("Checksum 验证通过")
+                self.logger.success(
+                    f"Checksum 验证通过: {Path(file_path).name} ({self.format_throughput(file_size, elapsed)})"
+                )
                 return True
             
-            self.logger.error("Checksum 验证失败")
+            self.logger.error(f"Checksum 验证失败: {Path(file_path).name}")
             self.logger.error(f"期望: {expected}")
             self.logger.error(f"实际: {actual}")
             return False
@@ -134,7 +483,56 @@ class ChecksumManager:
         except Exception as e:
             self.logger.error(f"Checksum 验证异常: {e}")
             return False
+    
+    def create_tee(self, file_path: str, sink, tracker: ProgressTracker = None) -> ChecksumTee:
+        checksum_file = f'{file_path}.sha256'
+        expected = None
+        if os.path.exists(checksum_file):
+            with open(checksum_file, 'r') as f:
+                expected = f.read().split()[0]
+        
+        manifest = None
+        if os.path.exists(f'{file_path}{MERKLE_SUFFIX}'):
+            with open(f'{file_path}{MERKLE_SUFFIX}', 'r') as f:
+                manifest = json.load(f)
+        
+        if not expected and not manifest:
+            self.logger.warning(f"Checksum 文件不存在: {checksum_file}")
+        
+        return ChecksumTee(file_path, sink, expected, manifest, tracker)
+    
+    def verify_gz_streaming(self, gz_file_path: str) -> bool:
+        return self.verify(gz_file_path)
+    
+    def verify_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        
+        self.logger.task(f"并行验证 checksum: {len(file_paths)} 个备份 (线程: {self.workers})")
+        start = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(file_paths))) as executor:
+            results = dict(zip(file_paths, executor.map(self.verify, file_paths)))
+        
+        elapsed = time.monotonic() - start
+        total_size = sum(
+            os.path.getsize(path) for file_path in file_paths
+            for path in iter_artifact_files(file_path) if os.path.exists(path)
+        )
+        failed = [path for path, ok in results.items() if not ok]
+        
+        if failed:
+            self.logger.error(f"Checksum 验证失败 {len(failed)}/{len(file_paths)} 个备份")
+            for path in failed:
+                self.logger.subtask(path)
+        else:
+            self.logger.success(
+                f"Checksum 全部通过: {len(file_paths)} 个备份 ({self.format_throughput(total_size, elapsed)})"
+            )
+        
+        return results
 
 
-def get_checksum_manager() -> ChecksumManager:
-    return ChecksumManager()
\ No newline at end of file
+def get_checksum_manager(config: Config = None) -> ChecksumManager:
+    return ChecksumManager(config)
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+import gzip
+import shutil
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+COMPRESSION_CHUNK_SIZE = 1024 * 1024
+GZIP_BLOCK_SIZE = 1024 * 1024
+GZIP_DICT_SIZE = 32 * 1024
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+
+# pigz 风格：按块切分输入，以前一块末尾 32 KB 为预置字典在线程池中独立压缩，
+# 按顺序拼接成单个标准 gzip 成员；接口与 zlib.compressobj 的 compress/flush 一致
+class ParallelGzipCompressor:
+    def __init__(self, level: int = 9, threads: int = 1, block_size: int = GZIP_BLOCK_SIZE):
+        self.level = level
+        self.threads = max(1, threads)
+        self.block_size = block_size
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.dictionary = b''
+        self.crc = 0
+        self.size = 0
+        self.header_written = False
+    
+    def _compress_block(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        if dictionary:
+            compressor = zlib.compressobj(
+                self.level, zlib.DEFLATED, -zlib.MAX_WBITS, 8, zlib.Z_DEFAULT_STRATEGY, dictionary
+            )
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, 8)
+        return compressor.compress(block) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+    
+    def _submit(self, block: bytes, last: bool = False):
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        self.pending.append(
+            self.executor.submit(self._compress_block, block, self.dictionary, last)
+        )
+        self.dictionary = bytes(block[-GZIP_DICT_SIZE:]) if block else self.dictionary
+    
+    def _collect(self, wait_all: bool = False) -> bytes:
+        output = []
+        if not self.header_written:
+            output.append(GZIP_HEADER)
+            self.header_written = True
+        
+        while self.pending:
+            if not wait_all and len(self.pending) <= self.threads * 2 and not self.pending[0].done():
+                break
+            output.append(self.pending.popleft().result())
+        
+        return b''.join(output)
+    
+    def compress(self, data: bytes) -> bytes:
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return self._collect()
+    
+    def flush(self) -> bytes:
+        try:
+            self._submit(bytes(self.buffer), last=True)
+            self.buffer = bytearray()
+            trailer = struct.pack('<II', self.crc & 0xffffffff, self.size & 0xffffffff)
+            return self._collect(wait_all=True) + trailer
+        finally:
+            self.close()
+    
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class StreamCompressor:
+    def __init__(self, compressobj, header: bytes = b''):
+        self.compressobj = compressobj
+        self.header = header
+    
+    def compress(self, data: bytes) -> bytes:
+        header, self.header = self.header, b''
+        return header + self.compressobj.compress(data)
+    
+    def flush(self) -> bytes:
+        header, self.header = self.header, b''
+        return header + self.compressobj.flush()
+    
+    def close(self):
+        pass
+
+
+class Codec(ABC):
+    name = ''
+    extension = ''
+    magic = b''
+    default_level = 0
+    decompress_cmd = []
+    
+    @abstractmethod
+    def create_compressor(self, level: int = None, threads: int = 1):
+        pass
+    
+    @abstractmethod
+    def open_reader(self, file_path: str):
+        pass
+    
+    @abstractmethod
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        pass
+    
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+    
+    def get_level(self, level: int = None) -> int:
+        return self.default_level if level is None else level
+    
+    def get_decompress_cmd(self, threads: int = 1) -> list:
+        return list(self.decompress_cmd)
+
+
+class GzipCodec(Codec):
+    name = 'gzip'
+    extension = '.gz'
+    magic = b'\x1f\x8b'
+    default_level = 6
+    decompress_cmd = ['gzip', '-d', '-c']
+    
+    def create_compressor(self, level: int = None, threads: int = 1):
+        return ParallelGzipCompressor(level=self.get_level(level), threads=threads)
+    
+    def open_reader(self, file_path: str):
+        return gzip.open(file_path, 'rb')
+    
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        return gzip.compress(data, compresslevel=self.get_level(level), mtime=0)
+    
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+    
+    def get_decompress_cmd(self, threads: int = 1) -> list:
+        if threads > 1 and shutil.which('pigz'):
+            return ['pigz', '-d', '-c', '-p', str(threads)]
+        return list(self.decompress_cmd)
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    extension = '.zst'
+    magic = b'\x28\xb5\x2f\xfd'
+    default_level = 3
+    decompress_cmd = ['zstd', '-d', '-c', '-q']
+    
+    def create_compressor(self, level: int = None, threads: int = 1):
+        import zstandard
+        compressor = zstandard.ZstdCompressor(
+            level=self.get_level(level), threads=threads if threads > 1 else 0
+        )
+        return StreamCompressor(compressor.compressobj())
+    
+    def open_reader(self, file_path: str):
+        import zstandard
+        return zstandard.open(file_path, 'rb')
+    
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        import zstandard
+        return zstandard.ZstdCompressor(level=self.get_level(level)).compress(data)
+    
+    def decompress(self, data: bytes) -> bytes:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+class Lz4Codec(Codec):
+    name = 'lz4'
+    extension = '.lz4'
+    magic = b'\x04\x22\x4d\x18'
+    default_level = 0
+    decompress_cmd = ['lz4', '-d', '-c', '-q']
+    
+    def create_compressor(self, level: int = None, threads: int = 1):
+        import lz4.frame
+        compressor = lz4.frame.LZ4FrameCompressor(
+            compression_level=self.get_level(level)
+        )
+        return StreamCompressor(compressor, header=compressor.begin())
+    
+    def open_reader(self, file_path: str):
+        import lz4.frame
+        return lz4.frame.open(file_path, 'rb')
+    
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        import lz4.frame
+        return lz4.frame.compress(data, compression_level=self.get_level(level))
+    
+    def decompress(self, data: bytes) -> bytes:
+        import lz4.frame
+        return lz4.frame.decompress(data)
+
+
+CODECS = {codec.name: codec for codec in (GzipCodec(), ZstdCodec(), Lz4Codec())}
+
+COMPRESSED_EXTENSIONS = tuple(codec.extension for codec in CODECS.values())
+
+
+def get_codec(name: str) -> Codec:
+    codec = CODECS.get(name.lower())
+    if codec is None:
+        raise ValueError(f"不支持的压缩算法: {name} (可选: {', '.join(CODECS)})")
+    return codec
+
+
+def detect_codec(file_path: str):
+    if not os.path.isfile(file_path):
+        return None
+    
+    with open(file_path, 'rb') as f:
+        header = f.read(4)
+    
+    return detect_codec_bytes(header)
+
+
+def detect_codec_bytes(header: bytes):
+    for codec in CODECS.values():
+        if header.startswith(codec.magic):
+            return codec
+    return None
+
+
+def strip_codec_extension(file_path: str) -> str:
+    for extension in COMPRESSED_EXTENSIONS:
+        if file_path.endswith(extension):
+            return file_path[:-len(extension)]
+    return file_path
\ No newline at end of file
@@ -1,6 +1,6 @@
 import os
 import multiprocessing
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
 
 
@@ -15,19 +15,62 @@ class Config:
     BACKUP_TIME: str = '03:00'
     BACKUP_INTERVAL: str = 'daily'
     BACKUP_RETENTION_DAYS: int = 7
+    RETENTION_DAILY: int = 0
+    RETENTION_WEEKLY: int = 0
+    RETENTION_MONTHLY: int = 0
+    RETENTION_DRY_RUN: bool = False
     BACKUP_FORMAT: str = 'both'
     BACKUP_PARALLEL_WORKERS: int = 0
+    BACKUP_DUMP_JOBS: int = 4
+    COPY_WORKERS: int = 4
     
     ENABLE_COMPRESSION: bool = True
+    COMPRESSION_CODEC: str = 'zstd'
+    COMPRESSION_LEVEL: Optional[int] = None
+    COMPRESSION_OVERRIDES: str = ''
+    COMPRESSION_THREADS: int = 0
+    DUMP_NATIVE_COMPRESSION: bool = True
+    ENABLE_STREAMING: bool = True
+    SQL_FROM_DUMP: bool = True
     ENABLE_VERIFY: bool = True
+    VERIFY_LEVEL: str = 'full'
+    VERIFY_SAMPLE_ROWS: int = 1000
+    VERIFY_WORKERS: int = 2
     ENABLE_PARALLEL: bool = True
+    ENABLE_SIZE_SCHEDULING: bool = True
+    SKIP_UNCHANGED: bool = False
+    BACKUP_INCREMENTAL: bool = False
+    INCREMENTAL_FULL_DAYS: int = 7
+    BACKUP_REPOSITORY: bool = False
+    REPOSITORY_DIR: str = ''
+    REPOSITORY_CHUNK_SIZE: int = 1024 * 1024
+    
+    CHECKSUM_WORKERS: int = 0
+    CHECKSUM_MMAP: bool = False
+    CHECKSUM_CHUNK_SIZE: int = 64 * 1024 * 1024
+    BACKUP_TOC: bool = True
+    BACKUP_STATS: bool = False
+    STATS_HASH: bool = False
+    STATS_WORKERS: int = 4
     
     RESTORE_VERIFY_CHECKSUM: bool = True
     RESTORE_VERIFY_DATA: bool = False
+    RESTORE_VERIFY_STREAM: bool = False
+    RESTORE_JOBS: int = 4
+    RESTORE_SCRATCH_DIR: str = ''
+    RESTORE_FAST: bool = False
+    RESTORE_FAIL_FAST: bool = True
+    STDERR_TAIL_LINES: int = 200
+    PROGRESS_INTERVAL: int = 10
+    METRICS_FILE: str = ''
+    RESTORE_MAINTENANCE_WORK_MEM: str = '1GB'
+    RESTORE_PARALLEL_MAINTENANCE_WORKERS: int = 2
     
     CONNECTION_RETRIES: int = 5
     CONNECTION_RETRY_DELAY: int = 5
     STARTUP_MAX_WAIT: int = 180
+    POOL_MAX_CONNECTIONS: int = 4
+    POOL_HEALTH_CHECK_INTERVAL: int = 30
     
     BACKUP_TIMEOUT: int = 3600
     RESTORE_TIMEOUT: int = 7200
@@ -46,6 +89,10 @@ class Config:
         self.BACKUP_TIME = os.environ.get('BACKUP_TIME', self.BACKUP_TIME)
         self.BACKUP_INTERVAL = os.environ.get('BACKUP_INTERVAL', self.BACKUP_INTERVAL)
         self.BACKUP_RETENTION_DAYS = int(os.environ.get('BACKUP_RETENTION_DAYS', str(self.BACKUP_RETENTION_DAYS)))
+        self.RETENTION_DAILY = int(os.environ.get('RETENTION_DAILY', str(self.RETENTION_DAILY)))
+        self.RETENTION_WEEKLY = int(os.environ.get('RETENTION_WEEKLY', str(self.RETENTION_WEEKLY)))
+        self.RETENTION_MONTHLY = int(os.environ.get('RETENTION_MONTHLY', str(self.RETENTION_MONTHLY)))
+        self.RETENTION_DRY_RUN = os.environ.get('RETENTION_DRY_RUN', 'false').lower() == 'true'
         self.BACKUP_FORMAT = os.environ.get('BACKUP_FORMAT', self.BACKUP_FORMAT)
         
         env_workers = os.environ.get('BACKUP_PARALLEL_WORKERS')
@@ -54,16 +101,74 @@ class Config:
         elif self.BACKUP_PARALLEL_WORKERS == 0:
             self.BACKUP_PARALLEL_WORKERS = multiprocessing.cpu_count()
         
+        self.BACKUP_DUMP_JOBS = int(os.environ.get('BACKUP_DUMP_JOBS', str(self.BACKUP_DUMP_JOBS)))
+        self.COPY_WORKERS = int(os.environ.get('COPY_WORKERS', str(self.COPY_WORKERS)))
+        
         self.ENABLE_COMPRESSION = os.environ.get('ENABLE_COMPRESSION', 'true').lower() == 'true'
+        self.COMPRESSION_CODEC = os.environ.get('COMPRESSION_CODEC', self.COMPRESSION_CODEC).lower()
+        env_compress_level = os.environ.get('COMPRESSION_LEVEL', '').strip()
+        if env_compress_level:
+            self.COMPRESSION_LEVEL = int(env_compress_level)
+        self.COMPRESSION_OVERRIDES = os.environ.get('COMPRESSION_OVERRIDES', self.COMPRESSION_OVERRIDES)
+        
+        env_compress_threads = os.environ.get('COMPRESSION_THREADS')
+        if env_compress_threads:
+            self.COMPRESSION_THREADS = int(env_compress_threads)
+        elif self.COMPRESSION_THREADS == 0:
+            self.COMPRESSION_THREADS = multiprocessing.cpu_count()
+        
+        self.DUMP_NATIVE_COMPRESSION = os.environ.get('DUMP_NATIVE_COMPRESSION', 'true').lower() == 'true'
+        self.ENABLE_STREAMING = os.environ.get('ENABLE_STREAMING', 'true').lower() == 'true'
+        self.SQL_FROM_DUMP = os.environ.get('SQL_FROM_DUMP', 'true').lower() == 'true'
         self.ENABLE_VERIFY = os.environ.get('ENABLE_VERIFY', 'true').lower() == 'true'
+        self.VERIFY_LEVEL = os.environ.get('VERIFY_LEVEL', self.VERIFY_LEVEL).lower()
+        self.VERIFY_SAMPLE_ROWS = int(os.environ.get('VERIFY_SAMPLE_ROWS', str(self.VERIFY_SAMPLE_ROWS)))
+        self.VERIFY_WORKERS = max(1, int(os.environ.get('VERIFY_WORKERS', str(self.VERIFY_WORKERS))))
         self.ENABLE_PARALLEL = os.environ.get('ENABLE_PARALLEL', 'true').lower() == 'true'
+        self.ENABLE_SIZE_SCHEDULING = os.environ.get('ENABLE_SIZE_SCHEDULING', 'true').lower() == 'true'
+        self.SKIP_UNCHANGED = os.environ.get('SKIP_UNCHANGED', 'false').lower() == 'true'
+        self.BACKUP_INCREMENTAL = os.environ.get('BACKUP_INCREMENTAL', 'false').lower() == 'true'
+        self.INCREMENTAL_FULL_DAYS = int(os.environ.get('INCREMENTAL_FULL_DAYS', str(self.INCREMENTAL_FULL_DAYS)))
+        self.BACKUP_REPOSITORY = os.environ.get('BACKUP_REPOSITORY', 'false').lower() == 'true'
+        self.REPOSITORY_DIR = os.environ.get('REPOSITORY_DIR', self.REPOSITORY_DIR)
+        self.REPOSITORY_CHUNK_SIZE = int(os.environ.get('REPOSITORY_CHUNK_SIZE', str(self.REPOSITORY_CHUNK_SIZE)))
+        
+        env_checksum_workers = os.environ.get('CHECKSUM_WORKERS')
+        if env_checksum_workers:
+            self.CHECKSUM_WORKERS = int(env_checksum_workers)
+        elif self.CHECKSUM_WORKERS == 0:
+            self.CHECKSUM_WORKERS = min(4, multiprocessing.cpu_count())
+        self.CHECKSUM_MMAP = os.environ.get('CHECKSUM_MMAP', 'false').lower() == 'true'
+        self.CHECKSUM_CHUNK_SIZE = int(os.environ.get('CHECKSUM_CHUNK_SIZE', str(self.CHECKSUM_CHUNK_SIZE)))
+        self.BACKUP_TOC = os.environ.get('BACKUP_TOC', 'true').lower() == 'true'
+        self.BACKUP_STATS = os.environ.get('BACKUP_STATS', 'false').lower() == 'true'
+        self.STATS_HASH = os.environ.get('STATS_HASH', 'false').lower() == 'true'
+        self.STATS_WORKERS = max(1, int(os.environ.get('STATS_WORKERS', str(self.STATS_WORKERS))))
         
         self.RESTORE_VERIFY_CHECKSUM = os.environ.get('RESTORE_VERIFY_CHECKSUM', 'true').lower() == 'true'
         self.RESTORE_VERIFY_DATA = os.environ.get('RESTORE_VERIFY_DATA', 'false').lower() == 'true'
+        self.RESTORE_VERIFY_STREAM = os.environ.get('RESTORE_VERIFY_STREAM', 'false').lower() == 'true'
+        self.RESTORE_JOBS = int(os.environ.get('RESTORE_JOBS', str(self.RESTORE_JOBS)))
+        self.RESTORE_SCRATCH_DIR = os.environ.get('RESTORE_SCRATCH_DIR', self.RESTORE_SCRATCH_DIR)
+        self.RESTORE_FAST = os.environ.get('RESTORE_FAST', 'false').lower() == 'true'
+        self.RESTORE_FAIL_FAST = os.environ.get('RESTORE_FAIL_FAST', 'true').lower() == 'true'
+        self.STDERR_TAIL_LINES = max(1, int(os.environ.get('STDERR_TAIL_LINES', str(self.STDERR_TAIL_LINES))))
+        self.PROGRESS_INTERVAL = max(1, int(os.environ.get('PROGRESS_INTERVAL', str(self.PROGRESS_INTERVAL))))
+        self.METRICS_FILE = os.environ.get('METRICS_FILE', self.METRICS_FILE)
+        self.RESTORE_MAINTENANCE_WORK_MEM = os.environ.get(
+            'RESTORE_MAINTENANCE_WORK_MEM', self.RESTORE_MAINTENANCE_WORK_MEM
+        )
+        self.RESTORE_PARALLEL_MAINTENANCE_WORKERS = int(
+            os.environ.get('RESTORE_PARALLEL_MAINTENANCE_WORKERS', str(self.RESTORE_PARALLEL_MAINTENANCE_WORKERS))
+        )
         
         self.CONNECTION_RETRIES = int(os.environ.get('CONNECTION_RETRIES', str(self.CONNECTION_RETRIES)))
         self.CONNECTION_RETRY_DELAY = int(os.environ.get('CONNECTION_RETRY_DELAY', str(self.CONNECTION_RETRY_DELAY)))
         self.STARTUP_MAX_WAIT = int(os.environ.get('STARTUP_MAX_WAIT', str(self.STARTUP_MAX_WAIT)))
+        self.POOL_MAX_CONNECTIONS = int(os.environ.get('POOL_MAX_CONNECTIONS', str(self.POOL_MAX_CONNECTIONS)))
+        self.POOL_HEALTH_CHECK_INTERVAL = int(
+            os.environ.get('POOL_HEALTH_CHECK_INTERVAL', str(self.POOL_HEALTH_CHECK_INTERVAL))
+        )
         
         self.BACKUP_TIMEOUT = int(os.environ.get('BACKUP_TIMEOUT', str(self.BACKUP_TIMEOUT)))
         self.RESTORE_TIMEOUT = int(os.environ.get('RESTORE_TIMEOUT', str(self.RESTORE_TIMEOUT)))
@@ -71,6 +176,25 @@ class Config:
     def get_databases(self) -> List[str]:
         return [db.strip() for db in self.PG_DATABASE.split(',') if db.strip()]
     
+    def get_compression(self, database: str = None) -> Tuple[str, Optional[int]]:
+        codec, level = self.COMPRESSION_CODEC, self.COMPRESSION_LEVEL
+        
+        for item in self.COMPRESSION_OVERRIDES.split(','):
+            if '=' not in item:
+                continue
+            name, setting = (part.strip() for part in item.split('=', 1))
+            if name != database:
+                continue
+            if ':' in setting:
+                codec_name, level_str = setting.split(':', 1)
+                codec, level = codec_name.strip().lower(), int(level_str)
+            elif setting.isdigit():
+                level = int(setting)
+            else:
+                codec = setting.lower()
+        
+        return codec, level
+    
     def get_pg_env(self) -> dict:
         env = os.environ.copy()
         env['PGPASSWORD'] = self.PG_PASSWORD
@@ -105,11 +229,42 @@ class Config:
             '目标数据库': self.PG_DATABASE,
             '备份目录': self.BACKUP_DIR,
             '备份格式': self.BACKUP_FORMAT,
+            'pg_dump 并发': self.BACKUP_DUMP_JOBS if self.BACKUP_FORMAT == 'directory' else '-',
+            'COPY 并发': self.COPY_WORKERS if self.BACKUP_FORMAT == 'copy' else '-',
             '压缩': '启用' if self.ENABLE_COMPRESSION else '禁用',
+            '压缩算法': f"{self.COMPRESSION_CODEC}:{'默认' if self.COMPRESSION_LEVEL is None else self.COMPRESSION_LEVEL}",
+            '压缩线程': self.COMPRESSION_THREADS,
+            'dump 内置压缩': '启用' if self.DUMP_NATIVE_COMPRESSION else '禁用',
+            '流式备份': '启用' if self.ENABLE_STREAMING else '禁用',
             '并行备份': '启用' if self.ENABLE_PARALLEL else '禁用',
             '并发数': f"{self.BACKUP_PARALLEL_WORKERS} (CPU核心)",
             '备份验证': '启用' if self.ENABLE_VERIFY else '禁用',
+            '验证级别': (
+                f"{self.VERIFY_LEVEL} (每表 {self.VERIFY_SAMPLE_ROWS} 行)"
+                if self.VERIFY_LEVEL == 'sample' else self.VERIFY_LEVEL
+            ),
+            '验证并发数': self.VERIFY_WORKERS,
+            'Checksum 线程': f"{self.CHECKSUM_WORKERS}{' (mmap)' if self.CHECKSUM_MMAP else ''}",
+            'Checksum 分块': f"{self.CHECKSUM_CHUNK_SIZE} bytes" if self.CHECKSUM_CHUNK_SIZE else '禁用',
+            '恢复校验': '边读边校验 (单事务)' if self.RESTORE_VERIFY_STREAM else '恢复前校验',
+            'pg_restore 并发': self.RESTORE_JOBS,
+            '快速恢复': f"启用 (maintenance_work_mem={self.RESTORE_MAINTENANCE_WORK_MEM})" if self.RESTORE_FAST else '禁用',
+            '恢复遇错即停': '启用' if self.RESTORE_FAIL_FAST else '禁用',
+            '进度输出间隔': f"{self.PROGRESS_INTERVAL}s",
+            '指标文件': self.METRICS_FILE or '禁用',
+            'TOC 缓存': '启用' if self.BACKUP_TOC else '禁用',
+            '统计清单': (
+                f"启用{' (含内容哈希)' if self.STATS_HASH else ''}, 并发 {self.STATS_WORKERS}"
+                if self.BACKUP_STATS else '禁用'
+            ),
+            '跳过无变更库': '启用' if self.SKIP_UNCHANGED else '禁用',
+            '去重仓库': f"启用 ({self.REPOSITORY_DIR or Path(self.BACKUP_DIR) / 'repository'})" if self.BACKUP_REPOSITORY else '禁用',
+            '表级增量': f"启用 (每 {self.INCREMENTAL_FULL_DAYS} 天完整备份)" if self.BACKUP_INCREMENTAL else '禁用',
             '保留天数': self.BACKUP_RETENTION_DAYS,
+            '保留策略': (
+                f"GFS 每日 {self.RETENTION_DAILY} / 每周 {self.RETENTION_WEEKLY} / 每月 {self.RETENTION_MONTHLY}"
+                if self.RETENTION_DAILY or self.RETENTION_WEEKLY or self.RETENTION_MONTHLY else '按天数'
+            ) + (' (dry-run)' if self.RETENTION_DRY_RUN else ''),
             '备份时间': self.BACKUP_TIME,
             '备份间隔': self.BACKUP_INTERVAL,
             '连接重试': self.CONNECTION_RETRIES,
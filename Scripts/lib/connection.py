@@ -1,47 +1,102 @@
 import os
 import subprocess
+import tempfile
 import time
 import re
 from typing import Tuple, Optional
 from pathlib import Path
 
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+
 from .logger import get_logger
 from .config import Config
+from .pool import PoolTimeout, get_connection_pool
+from .process import run_monitored
+
+
+STATS_FLUSH_SECONDS = 60
+TOC_ENTRY_HEADER = re.compile(r'^-- (?:Data for )?Name: ', re.MULTILINE)
+
+ACTIVE_SESSION_QUERY = """
+    SELECT count(*)
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND pid <> pg_backend_pid()
+      AND backend_type = 'client backend'
+      AND application_name <> 'pg_backup'
+      AND (state IS DISTINCT FROM 'idle' OR state_change > now() - make_interval(secs => %s))
+"""
+
+CHANGE_MARKER_QUERY = """
+    SELECT pg_postmaster_start_time()::text,
+           COALESCE(d.stats_reset::text, ''),
+           d.tup_inserted, d.tup_updated, d.tup_deleted,
+           (
+               SELECT md5(COALESCE(string_agg(
+                   concat_ws(',', relid, n_tup_ins, n_tup_upd, n_tup_del), ';' ORDER BY relid
+               ), ''))
+               FROM pg_stat_user_tables
+           ),
+           (
+               SELECT md5(COALESCE(string_agg(concat_ws(
+                   ',', c.oid, c.relfilenode, c.relkind, c.xmin,
+                   CASE WHEN c.relkind = 'S' THEN pg_sequence_last_value(c.oid) END
+               ), ';' ORDER BY c.oid), ''))
+               FROM pg_class c
+               JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+                 AND n.nspname !~ '^pg_(toast|temp)'
+           ),
+           (
+               SELECT md5(string_agg(catalog || '=' || signature, ';' ORDER BY catalog))
+               FROM (
+                   SELECT 'pg_namespace' AS catalog, concat_ws(',', count(*), sum(xmin::text::bigint)) AS signature
+                   FROM pg_namespace
+                   UNION ALL SELECT 'pg_attribute', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_attribute
+                   UNION ALL SELECT 'pg_attrdef', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_attrdef
+                   UNION ALL SELECT 'pg_constraint', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_constraint
+                   UNION ALL SELECT 'pg_index', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_index
+                   UNION ALL SELECT 'pg_proc', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_proc
+                   UNION ALL SELECT 'pg_type', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_type
+                   UNION ALL SELECT 'pg_trigger', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_trigger
+                   UNION ALL SELECT 'pg_rewrite', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_rewrite
+                   UNION ALL SELECT 'pg_extension', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_extension
+                   UNION ALL SELECT 'pg_description', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_description
+                   UNION ALL SELECT 'pg_largeobject_metadata', concat_ws(',', count(*), sum(xmin::text::bigint)) FROM pg_largeobject_metadata
+               ) catalogs
+           )
+    FROM pg_stat_database d
+    WHERE d.datname = current_database()
+"""
 
 
 class ConnectionManager:
     def __init__(self, config: Config = None):
         self.config = config or Config()
         self.logger = get_logger()
+        self.pool = get_connection_pool(self.config)
     
     def test_connection(self, database: str, retries: int = None, retry_delay: int = None) -> bool:
         retries = retries or self.config.CONNECTION_RETRIES
         retry_delay = retry_delay or self.config.CONNECTION_RETRY_DELAY
         
-        env = self.config.get_pg_env()
-        cmd = [
-            'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-            '-U', self.config.PG_USER, '-d', database, '-c', 'SELECT 1;'
-        ]
-        
         for attempt in range(1, retries + 1):
             try:
-                result = subprocess.run(
-                    cmd, env=env, capture_output=True, text=True, timeout=30
-                )
-                
-                if result.returncode == 0:
-                    self.logger.success(f"数据库 {database} 连接成功")
-                    return True
+                self.pool.fetch_value(database, 'SELECT 1', connect_timeout=30)
+                self.logger.success(f"数据库 {database} 连接成功")
+                return True
                 
+            except psycopg2.OperationalError as e:
                 self.logger.warning(
-                    f"数据库 {database} 连接失败 (尝试 {attempt}/{retries})"
+                    f"数据库 {database} 连接失败 (尝试 {attempt}/{retries}): {str(e).strip()}"
                 )
                 if attempt < retries:
                     self.logger.info(f"等待 {retry_delay} 秒后重试...")
                     time.sleep(retry_delay)
                     
-            except subprocess.TimeoutExpired:
+            except PoolTimeout:
                 self.logger.warning(
                     f"数据库 {database} 连接超时 (尝试 {attempt}/{retries})"
                 )
@@ -64,12 +119,6 @@ class ConnectionManager:
         
         self.logger.info(f"等待数据库 {database} 就绪，最长等待 {max_wait} 秒...")
         
-        env = self.config.get_pg_env()
-        cmd = [
-            'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-            '-U', self.config.PG_USER, '-d', database, '-c', 'SELECT 1;'
-        ]
-        
         start_time = time.time()
         attempt = 0
         
@@ -78,15 +127,12 @@ class ConnectionManager:
             elapsed = int(time.time() - start_time)
             
             try:
-                result = subprocess.run(
-                    cmd, env=env, capture_output=True, text=True, timeout=10
-                )
-                if result.returncode == 0:
-                    self.logger.success(f"数据库 {database} 已就绪 (等待 {elapsed} 秒，尝试 {attempt} 次)")
-                    return True
-                else:
-                    self.logger.subtask(f"连接尝试 {attempt} 失败，继续等待... ({elapsed}s/{max_wait}s)")
-            except subprocess.TimeoutExpired:
+                self.pool.fetch_value(database, 'SELECT 1', connect_timeout=10)
+                self.logger.success(f"数据库 {database} 已就绪 (等待 {elapsed} 秒，尝试 {attempt} 次)")
+                return True
+            except psycopg2.OperationalError:
+                self.logger.subtask(f"连接尝试 {attempt} 失败，继续等待... ({elapsed}s/{max_wait}s)")
+            except PoolTimeout:
                 self.logger.subtask(f"连接尝试 {attempt} 超时，继续等待... ({elapsed}s/{max_wait}s)")
             except Exception as e:
                 self.logger.subtask(f"连接尝试 {attempt} 异常: {e}，继续等待... ({elapsed}s/{max_wait}s)")
@@ -98,24 +144,13 @@ class ConnectionManager:
     
     def get_server_version(self, database: str) -> Optional[Tuple[int, int]]:
         try:
-            env = self.config.get_pg_env()
-            cmd = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', database, '-t', '-c',
-                'SHOW server_version;'
-            ]
-            result = subprocess.run(
-                cmd, env=env, capture_output=True, text=True, timeout=30
-            )
-            
-            if result.returncode == 0:
-                version_str = result.stdout.strip()
-                match = re.search(r'(\d+)\.(\d+)', version_str)
-                if match:
-                    major = int(match.group(1))
-                    minor = int(match.group(2))
-                    self.logger.info(f"PostgreSQL 服务器版本: {major}.{minor}")
-                    return major, minor
+            version_str = self.pool.fetch_value(database, 'SHOW server_version') or ''
+            match = re.search(r'(\d+)\.(\d+)', version_str)
+            if match:
+                major = int(match.group(1))
+                minor = int(match.group(2))
+                self.logger.info(f"PostgreSQL 服务器版本: {major}.{minor}")
+                return major, minor
             return None
         except Exception as e:
             self.logger.warning(f"获取服务器版本失败: {e}")
@@ -177,18 +212,10 @@ class ConnectionManager:
     
     def get_database_size(self, database: str) -> str:
         try:
-            env = self.config.get_pg_env()
-            cmd = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', database, '-t', '-c',
-                "SELECT pg_size_pretty(pg_database_size(current_database()));"
-            ]
-            result = subprocess.run(
-                cmd, env=env, capture_output=True, text=True, timeout=30
+            size = self.pool.fetch_value(
+                database, "SELECT pg_size_pretty(pg_database_size(current_database()))"
             )
-            
-            if result.returncode == 0:
-                size = result.stdout.strip()
+            if size:
                 self.logger.info(f"数据库 {database} 大小: {size}")
                 return size
             return "未知"
@@ -196,29 +223,93 @@ class ConnectionManager:
             self.logger.warning(f"获取数据库大小失败: {e}")
             return "未知"
     
-    def create_database(self, database: str) -> bool:
+    def get_database_size_bytes(self, database: str) -> Optional[int]:
         try:
-            env = self.config.get_pg_env()
-            cmd = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', 'postgres', '-c',
-                f'CREATE DATABASE "{database}";'
-            ]
-            result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                self.logger.success(f"数据库 {database} 创建成功")
-                return True
-            elif 'already exists' in result.stderr:
-                self.logger.info(f"数据库 {database} 已存在")
-                return True
+            size = self.pool.fetch_value(
+                database, "SELECT pg_database_size(current_database())"
+            )
+            if size is not None:
+                self.logger.info(f"数据库 {database} 大小: {size / (1024*1024):.2f} MB")
+                return size
+            return None
+        except Exception as e:
+            self.logger.warning(f"获取数据库大小失败: {e}")
+            return None
+    
+    def get_change_marker(self, database: str) -> Optional[str]:
+        try:
+            busy = self.pool.fetch_value(database, ACTIVE_SESSION_QUERY, (STATS_FLUSH_SECONDS,))
+            if busy:
+                self.logger.info(f"数据库 {database} 有 {busy} 个会话近期活跃，统计计数可能尚未刷新，执行完整备份")
+                return None
             
-            self.logger.error(f"创建数据库失败: {result.stderr}")
+            row = self.pool.execute(database, CHANGE_MARKER_QUERY)
+            if row and all(value is not None for value in row[0]):
+                return ':'.join(str(value) for value in row[0])
+            return None
+        except Exception as e:
+            self.logger.warning(f"获取数据库变更标记失败: {e}")
+            return None
+    
+    def create_database(self, database: str) -> bool:
+        try:
+            self.pool.execute(
+                'postgres', sql.SQL('CREATE DATABASE {}').format(sql.Identifier(database))
+            )
+            self.logger.success(f"数据库 {database} 创建成功")
+            return True
+        except psycopg2.errors.DuplicateDatabase:
+            self.logger.info(f"数据库 {database} 已存在")
+            return True
+        except psycopg2.Error as e:
+            self.logger.error(f"创建数据库失败: {str(e).strip()}")
             return False
         except Exception as e:
             self.logger.error(f"创建数据库异常: {e}")
             return False
     
+    def drop_database(self, database: str) -> bool:
+        try:
+            self.pool.close_database(database)
+            self.pool.execute(
+                'postgres', sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(database))
+            )
+            return True
+        except Exception as e:
+            self.logger.warning(f"删除数据库失败: {database} - {e}")
+            return False
+    
+    def drop_archive_objects(self, database: str, archive: str, list_file: str = None) -> bool:
+        cmd = ['pg_restore', '--clean', '--if-exists', '--schema-only', '-f', '-']
+        if list_file:
+            cmd.extend(['-L', list_file])
+        result = subprocess.run(
+            cmd + [archive], capture_output=True, timeout=self.config.RESTORE_TIMEOUT
+        )
+        if result.returncode != 0:
+            self.logger.error(f"生成清理脚本失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+            return False
+        
+        script = result.stdout.decode('utf-8', errors='ignore')
+        header = TOC_ENTRY_HEADER.search(script)
+        if header:
+            script = script[:header.start()]
+        
+        with tempfile.TemporaryFile() as f_script:
+            f_script.write(script.encode('utf-8'))
+            f_script.seek(0)
+            monitor = run_monitored(
+                ['psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT, '-U', self.config.PG_USER,
+                 '-d', database, '-q', '-f', '-', '--single-transaction', '-v', 'ON_ERROR_STOP=1'],
+                '清理已有对象', env=self.config.get_pg_env(), timeout=self.config.RESTORE_TIMEOUT,
+                stdin=f_script, max_lines=self.config.STDERR_TAIL_LINES, stage='restore'
+            )
+        
+        if monitor.returncode != 0:
+            self.logger.error(f"清理已有对象失败: {monitor.describe()}")
+            return False
+        return True
+    
     def get_pg_dump_path(self) -> Optional[str]:
         import shutil
         path = shutil.which('pg_dump')
@@ -0,0 +1,417 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from .logger import get_logger
+from .config import Config
+from .connection import ConnectionManager
+from .checksum import ChecksumManager, HashingWriter
+from .compression import COMPRESSION_CHUNK_SIZE, Codec, detect_codec
+from .artifact import COPY_MANIFEST
+
+
+TABLE_QUERY = """
+    SELECT n.nspname, c.relname, pg_relation_size(c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r'
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND n.nspname !~ '^pg_(toast|temp)'
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_depend d
+          WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid AND d.deptype = 'e'
+      )
+    ORDER BY pg_relation_size(c.oid) DESC
+"""
+
+SEQUENCE_QUERY = """
+    SELECT schemaname, sequencename, last_value
+    FROM pg_sequences
+    WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+"""
+
+
+TABLE_MARKER_QUERY = """
+    SELECT s.schemaname, s.relname,
+           concat_ws(':', s.n_tup_ins, s.n_tup_upd, s.n_tup_del, c.relfilenode, (
+               SELECT md5(string_agg(
+                   a.attname || ' ' || format_type(a.atttypid, a.atttypmod), ',' ORDER BY a.attnum
+               ))
+               FROM pg_attribute a
+               WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+           ))
+    FROM pg_stat_user_tables s
+    JOIN pg_class c ON c.oid = s.relid
+"""
+
+STATS_RESET_QUERY = """
+    SELECT COALESCE(stats_reset::text, '')
+    FROM pg_stat_database
+    WHERE datname = current_database()
+"""
+
+
+class CopyOutWriter:
+    def __init__(self, f_out, compressor=None):
+        self.writer = HashingWriter(f_out)
+        self.compressor = compressor
+        self.raw_size = 0
+    
+    def write(self, data):
+        self.raw_size += len(data)
+        self.writer.write(self.compressor.compress(data) if self.compressor else data)
+    
+    def finish(self):
+        if self.compressor:
+            self.writer.write(self.compressor.flush())
+
+
+class CopyEngine:
+    def __init__(self, config: Config = None, conn: ConnectionManager = None,
+                 checksum: ChecksumManager = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.conn = conn or ConnectionManager(self.config)
+        self.checksum = checksum or ChecksumManager(self.config)
+    
+    def _open_snapshot_connections(self, database: str, snapshot: str, count: int) -> list:
+        conns = []
+        for _ in range(count):
+            worker = self.conn.pool.connect(database, autocommit=False)
+            worker.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with worker.cursor() as cur:
+                cur.execute('SET TRANSACTION SNAPSHOT %s', (snapshot,))
+            conns.append(worker)
+        return conns
+    
+    def _export_table(self, conn_queue: queue.Queue, index: int, schema: str, table: str,
+                      tables_dir: Path, codec: Optional[Codec], level: int) -> dict:
+        file_name = f'{index:05d}.bin{codec.extension if codec else ""}'
+        compressor = codec.create_compressor(level=level, threads=1) if codec else None
+        worker = conn_queue.get()
+        
+        try:
+            with open(tables_dir / file_name, 'wb') as f_out:
+                writer = CopyOutWriter(f_out, compressor)
+                with worker.cursor() as cur:
+                    statement = sql.SQL('COPY {} TO STDOUT (FORMAT binary)').format(
+                        sql.Identifier(schema, table)
+                    )
+                    cur.copy_expert(statement.as_string(worker), writer, size=COMPRESSION_CHUNK_SIZE)
+                    rows = cur.rowcount
+                writer.finish()
+        finally:
+            if compressor:
+                compressor.close()
+            conn_queue.put(worker)
+        
+        return {
+            'schema': schema,
+            'name': table,
+            'file': f'tables/{file_name}',
+            'rows': rows,
+            'raw_size': writer.raw_size,
+            'size': writer.writer.size,
+            'sha256': writer.writer.hexdigest(),
+        }
+    
+    def get_table_markers(self, database: str) -> Tuple[str, Dict[Tuple[str, str], str]]:
+        stats_reset = self.conn.pool.fetch_value(database, STATS_RESET_QUERY) or ''
+        rows = self.conn.pool.execute(database, TABLE_MARKER_QUERY)
+        return stats_reset, {(schema, name): marker for schema, name, marker in rows}
+    
+    def load_manifest(self, artifact_dir: str) -> dict:
+        with open(Path(artifact_dir) / COPY_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def resolve_source(self, artifact_dir: str, entry: dict) -> str:
+        return os.path.normpath(os.path.join(artifact_dir, entry.get('source', '.')))
+    
+    def get_chain_sources(self, artifact_dir: str) -> List[str]:
+        manifest = self.load_manifest(artifact_dir)
+        own = os.path.normpath(artifact_dir)
+        sources = {self.resolve_source(artifact_dir, entry) for entry in manifest['tables']}
+        return sorted(source for source in sources if source != own)
+    
+    def _load_base_entries(self, base_dir: str, stats_reset: str) -> dict:
+        try:
+            manifest = self.load_manifest(base_dir)
+        except Exception as e:
+            self.logger.warning(f"读取增量基准清单失败，改为完整备份: {e}")
+            return {}
+        
+        if manifest.get('stats_reset') != stats_reset:
+            self.logger.warning("统计信息已被重置，无法比较变更计数，改为完整备份")
+            return {}
+        
+        missing = [s for s in self.get_chain_sources(base_dir) if not os.path.isdir(s)]
+        if missing:
+            self.logger.warning(f"增量链缺失: {', '.join(missing)}，改为完整备份")
+            return {}
+        
+        return {
+            (entry['schema'], entry['name']): (entry, self.resolve_source(base_dir, entry))
+            for entry in manifest['tables'] if entry.get('marker')
+        }
+    
+    def backup(self, database: str, output_dir: str, pg_dump_path: str,
+               codec: Optional[Codec] = None, level: int = None,
+               base_dir: str = None) -> Optional[dict]:
+        workers = max(1, self.config.COPY_WORKERS)
+        output_path = Path(output_dir)
+        tables_dir = output_path / 'tables'
+        tables_dir.mkdir(parents=True, exist_ok=True)
+        
+        start_time = time.monotonic()
+        stats_reset, markers = self.get_table_markers(database)
+        base_entries = self._load_base_entries(base_dir, stats_reset) if base_dir else {}
+        backup_type = 'incremental' if base_entries else 'full'
+        
+        coordinator = self.conn.pool.connect(database, autocommit=False)
+        worker_conns = []
+        schema_proc = None
+        
+        try:
+            coordinator.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with coordinator.cursor() as cur:
+                cur.execute('SELECT pg_export_snapshot()')
+                snapshot = cur.fetchone()[0]
+                cur.execute(TABLE_QUERY)
+                tables = cur.fetchall()
+                if tables:
+                    cur.execute(sql.SQL('LOCK TABLE {} IN ACCESS SHARE MODE').format(
+                        sql.SQL(', ').join(sql.Identifier(schema, name) for schema, name, _ in tables)
+                    ))
+                cur.execute(SEQUENCE_QUERY)
+                sequences = cur.fetchall()
+            
+            self.logger.info(f"导出快照: {snapshot} ({len(tables)} 张表，并发: {workers})")
+            
+            schema_cmd = [
+                pg_dump_path, '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
+                '-U', self.config.PG_USER, '-d', database,
+                '-F', 'c', '--schema-only', f'--snapshot={snapshot}',
+                '-f', str(output_path / 'schema.dump')
+            ]
+            schema_proc = subprocess.Popen(
+                schema_cmd, env=self.config.get_pg_env(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            
+            worker_conns = self._open_snapshot_connections(database, snapshot, workers)
+            conn_queue = queue.Queue()
+            for worker in worker_conns:
+                conn_queue.put(worker)
+            
+            entries = []
+            referenced = []
+            changed = []
+            for index, (schema, name, _) in enumerate(tables, 1):
+                marker = markers.get((schema, name))
+                base = base_entries.get((schema, name))
+                if marker and base and base[0]['marker'] == marker:
+                    entry = dict(base[0])
+                    entry['source'] = os.path.relpath(base[1], output_path)
+                    referenced.append(entry)
+                else:
+                    changed.append((index, schema, name, marker))
+            
+            if backup_type == 'incremental':
+                self.logger.info(
+                    f"增量备份: {len(changed)} 张表有变更，{len(referenced)} 张表引用基准备份"
+                )
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        self._export_table, conn_queue, index, schema, name, tables_dir, codec, level
+                    ): (f'{schema}.{name}', marker)
+                    for index, schema, name, marker in changed
+                }
+                for future in as_completed(futures):
+                    label, marker = futures[future]
+                    entry = future.result()
+                    entry['marker'] = marker
+                    entries.append(entry)
+                    self.logger.subtask(
+                        f"{label}: {entry['rows']} 行, {entry['raw_size']} bytes"
+                    )
+            
+            _, schema_stderr = schema_proc.communicate(timeout=self.config.BACKUP_TIMEOUT)
+            if schema_proc.returncode != 0:
+                raise RuntimeError(
+                    f"schema 导出失败: {schema_stderr.decode('utf-8', errors='ignore')}"
+                )
+            
+            manifest = {
+                'format': 'copy',
+                'version': 1,
+                'type': backup_type,
+                'base': os.path.relpath(base_dir, output_path) if base_entries else None,
+                'database': database,
+                'snapshot': snapshot,
+                'stats_reset': stats_reset,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'codec': codec.name if codec else None,
+                'schema': 'schema.dump',
+                'tables': sorted(entries + referenced, key=lambda e: (e['schema'], e['name'])),
+                'sequences': [
+                    {'schema': schema, 'name': name, 'last_value': last_value}
+                    for schema, name, last_value in sequences
+                ],
+            }
+            manifest_bytes = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+            with open(output_path / COPY_MANIFEST, 'wb') as f:
+                f.write(manifest_bytes)
+        
+        except BaseException:
+            if schema_proc and schema_proc.poll() is None:
+                schema_proc.kill()
+            shutil.rmtree(output_path, ignore_errors=True)
+            raise
+        finally:
+            for worker in worker_conns:
+                worker.close()
+            coordinator.close()
+        
+        checksums = {entry['file']: entry['sha256'] for entry in entries}
+        checksums['schema.dump'] = self.checksum.hash_file(str(output_path / 'schema.dump'))
+        checksums[COPY_MANIFEST] = self.checksum.hash_bytes(manifest_bytes)
+        self.checksum.write_directory_checksum(output_dir, checksums)
+        
+        raw_size = sum(entry['raw_size'] for entry in entries)
+        elapsed = max(time.monotonic() - start_time, 1e-6)
+        self.logger.success(
+            f"COPY {'增量' if backup_type == 'incremental' else '完整'}备份成功: "
+            f"导出 {len(entries)} 张表, {raw_size} bytes "
+            f"({raw_size / (1024*1024) / elapsed:.2f} MB/s)"
+        )
+        if referenced:
+            self.logger.info(
+                f"引用未变更表: {len(referenced)} 张, "
+                f"节省 {sum(entry['raw_size'] for entry in referenced)} bytes"
+            )
+        
+        return {'path': output_dir, 'size': raw_size, 'type': backup_type}
+    
+    def _run_pg_restore(self, args: list, label: str) -> bool:
+        cmd = [
+            'pg_restore', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
+            '-U', self.config.PG_USER
+        ] + args
+        result = subprocess.run(
+            cmd, env=self.config.get_pg_env(), capture_output=True, text=True,
+            timeout=self.config.RESTORE_TIMEOUT
+        )
+        
+        if result.returncode == 0:
+            return True
+        
+        for line in result.stderr.split('\n'):
+            if 'ERROR:' in line and 'already exists' not in line.lower():
+                self.logger.error(f"{label} 恢复失败: {result.stderr}")
+                return False
+        return True
+    
+    def _load_table(self, conn_queue: queue.Queue, artifact_dir: Path, entry: dict) -> dict:
+        file_path = Path(self.resolve_source(str(artifact_dir), entry)) / entry['file']
+        codec = detect_codec(str(file_path))
+        worker = conn_queue.get()
+        
+        try:
+            with (codec.open_reader(str(file_path)) if codec else open(file_path, 'rb')) as f_in:
+                with worker.cursor() as cur:
+                    statement = sql.SQL('COPY {} FROM STDIN (FORMAT binary)').format(
+                        sql.Identifier(entry['schema'], entry['name'])
+                    )
+                    cur.copy_expert(statement.as_string(worker), f_in, size=COMPRESSION_CHUNK_SIZE)
+                    rows = cur.rowcount
+            worker.commit()
+        except Exception:
+            worker.rollback()
+            raise
+        finally:
+            conn_queue.put(worker)
+        
+        return {'table': f"{entry['schema']}.{entry['name']}", 'rows': rows}
+    
+    def restore(self, artifact_dir: str, database: str, clean: bool = False,
+                data_only: bool = False, schema_only: bool = False) -> bool:
+        artifact_path = Path(artifact_dir)
+        manifest = self.load_manifest(artifact_dir)
+        
+        sources = self.get_chain_sources(artifact_dir)
+        if sources:
+            self.logger.task(f"增量链: {len(sources)} 个基准备份")
+            for source in sources:
+                self.logger.subtask(source)
+            missing = [source for source in sources if not os.path.isdir(source)]
+            if missing:
+                self.logger.error(f"增量链不完整，缺少: {', '.join(missing)}")
+                return False
+        
+        schema_file = str(artifact_path / manifest['schema'])
+        workers = max(1, self.config.COPY_WORKERS)
+        
+        if not data_only:
+            if clean:
+                self.logger.task("清理已有对象")
+                if not self.conn.drop_archive_objects(database, schema_file):
+                    return False
+            self.logger.task("恢复表结构 (pre-data)")
+            if not self._run_pg_restore(['-d', database, '--section=pre-data', schema_file], 'pre-data'):
+                return False
+        
+        if not schema_only:
+            self.logger.task(f"并行加载表数据 ({len(manifest['tables'])} 张表，并发: {workers})")
+            start_time = time.monotonic()
+            
+            conn_queue = queue.Queue()
+            worker_conns = [
+                self.conn.pool.connect(database, autocommit=False) for _ in range(workers)
+            ]
+            for worker in worker_conns:
+                conn_queue.put(worker)
+            
+            try:
+                entries = sorted(manifest['tables'], key=lambda e: e['size'], reverse=True)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(self._load_table, conn_queue, artifact_path, entry)
+                        for entry in entries
+                    ]
+                    for future in as_completed(futures):
+                        loaded = future.result()
+                        self.logger.subtask(f"{loaded['table']}: {loaded['rows']} 行")
+                
+                with worker_conns[0].cursor() as cur:
+                    for seq in manifest['sequences']:
+                        if seq['last_value'] is None:
+                            continue
+                        cur.execute(
+                            'SELECT setval(%s::regclass, %s, true)',
+                            (sql.Identifier(seq['schema'], seq['name']).as_string(cur), seq['last_value'])
+                        )
+                worker_conns[0].commit()
+            finally:
+                for worker in worker_conns:
+                    worker.close()
+            
+            self.logger.info(f"数据加载耗时: {time.monotonic() - start_time:.1f}s")
+        
+        if not data_only:
+            self.logger.task("恢复索引与约束 (post-data)")
+            if not self._run_pg_restore(['-d', database, '--section=post-data', schema_file], 'post-data'):
+                return False
+        
+        self.logger.success("COPY 恢复成功")
+        return True
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from .logger import get_logger
+from .config import Config
+
+
+class BackupHistory:
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.path = Path(self.config.BACKUP_DIR) / 'history.json'
+        self.lock = threading.Lock()
+        self.records = self._load()
+    
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取备份历史失败: {e}")
+            return {}
+    
+    def get(self, database: str) -> dict:
+        with self.lock:
+            return dict(self.records.get(database, {}))
+    
+    def update(self, database: str, **fields):
+        with self.lock:
+            self.records.setdefault(database, {}).update(fields)
+    
+    def save(self):
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = f'{self.path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.records, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                self.logger.warning(f"保存备份历史失败: {e}")
\ No newline at end of file
@@ -0,0 +1,70 @@
+import heapq
+from typing import Dict, List, Tuple
+
+from .logger import get_logger
+from .config import Config
+from .connection import ConnectionManager
+from .history import BackupHistory
+
+
+DEFAULT_THROUGHPUT = 50 * 1024 * 1024
+
+
+class BackupPlanner:
+    def __init__(self, config: Config = None, conn: ConnectionManager = None,
+                 history: BackupHistory = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.conn = conn or ConnectionManager(self.config)
+        self.history = history or BackupHistory(self.config)
+        self.sizes: Dict[str, int] = {}
+    
+    def estimate(self, database: str) -> float:
+        size = self.sizes.get(database)
+        record = self.history.get(database)
+        duration = record.get('duration')
+        last_size = record.get('db_size')
+        
+        if size and duration and last_size:
+            return size / (last_size / duration)
+        if duration:
+            return duration
+        if size:
+            return size / DEFAULT_THROUGHPUT
+        return 0.0
+    
+    @staticmethod
+    def predict_makespan(durations: List[float], workers: int) -> float:
+        loads = [0.0] * max(1, workers)
+        for duration in durations:
+            heapq.heapreplace(loads, loads[0] + duration)
+        return max(loads)
+    
+    def plan(self, databases: List[str], workers: int) -> Tuple[List[str], Dict[str, float], float]:
+        for database in databases:
+            self.sizes[database] = self.conn.get_database_size_bytes(database)
+        
+        estimates = {database: self.estimate(database) for database in databases}
+        ordered = sorted(databases, key=lambda db: estimates[db], reverse=True)
+        makespan = self.predict_makespan([estimates[db] for db in ordered], workers)
+        
+        self.logger.print_list(
+            "备份调度 (最长任务优先)", ordered,
+            lambda i, db: f"    {i}. {db} (大小: {self.sizes.get(db) or '未知'} bytes, "
+                          f"预计耗时: {estimates[db]:.1f}s)"
+        )
+        self.logger.info(f"预计总耗时 (makespan): {makespan:.1f}s")
+        
+        return ordered, estimates, makespan
+    
+    def record(self, results: List[dict]):
+        for result in results:
+            if not result.get('success') or result.get('skipped') or not result.get('duration'):
+                continue
+            database = result['database']
+            fields = {'duration': result['duration']}
+            db_size = result.get('db_size') or self.sizes.get(database)
+            if db_size:
+                fields['db_size'] = db_size
+            self.history.update(database, **fields)
+        self.history.save()
\ No newline at end of file
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, List, Optional
+
+import psycopg2
+
+from .logger import get_logger
+from .config import Config
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.max_size = max(1, self.config.POOL_MAX_CONNECTIONS)
+        self.health_check_interval = self.config.POOL_HEALTH_CHECK_INTERVAL
+        self.condition = threading.Condition()
+        self.idle = defaultdict(list)
+        self.in_use = defaultdict(int)
+    
+    def connect(self, database: str, connect_timeout: int = 10, autocommit: bool = True):
+        conn = psycopg2.connect(
+            host=self.config.PG_HOST,
+            port=self.config.PG_PORT,
+            user=self.config.PG_USER,
+            password=self.config.PG_PASSWORD,
+            dbname=database,
+            connect_timeout=connect_timeout,
+            application_name='pg_backup',
+        )
+        conn.autocommit = autocommit
+        return conn
+    
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def acquire(self, database: str, timeout: float = 30, connect_timeout: int = 10):
+        deadline = time.monotonic() + timeout
+        
+        with self.condition:
+            while not self.idle[database] and self.in_use[database] >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"等待数据库 {database} 连接超时")
+                self.condition.wait(remaining)
+            self.in_use[database] += 1
+            candidate = self.idle[database].pop() if self.idle[database] else None
+        
+        try:
+            while candidate:
+                conn, last_used = candidate
+                if self._is_healthy(conn, last_used):
+                    return conn
+                self._close_quietly(conn)
+                with self.condition:
+                    candidate = self.idle[database].pop() if self.idle[database] else None
+            return self.connect(database, connect_timeout)
+        except Exception:
+            with self.condition:
+                self.in_use[database] -= 1
+                self.condition.notify()
+            raise
+    
+    def release(self, database: str, conn, discard: bool = False):
+        with self.condition:
+            self.in_use[database] -= 1
+            if discard or conn.closed:
+                self._close_quietly(conn)
+            else:
+                self.idle[database].append((conn, time.monotonic()))
+            self.condition.notify()
+    
+    @contextmanager
+    def connection(self, database: str, timeout: float = 30, connect_timeout: int = 10):
+        conn = self.acquire(database, timeout, connect_timeout)
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.release(database, conn, discard)
+    
+    def execute(self, database: str, sql: str, params: tuple = None,
+                connect_timeout: int = 10) -> List[tuple]:
+        with self.connection(database, connect_timeout=connect_timeout) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall() if cur.description else []
+    
+    def fetch_value(self, database: str, sql: str, params: tuple = None,
+                    connect_timeout: int = 10) -> Optional[Any]:
+        rows = self.execute(database, sql, params, connect_timeout)
+        return rows[0][0] if rows else None
+    
+    def close_database(self, database: str):
+        with self.condition:
+            for conn, _ in self.idle.pop(database, []):
+                self._close_quietly(conn)
+    
+    def close_all(self):
+        with self.condition:
+            for database in list(self.idle):
+                for conn, _ in self.idle.pop(database):
+                    self._close_quietly(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool(config: Config = None) -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(config)
+        return _pool
\ No newline at end of file
@@ -0,0 +1,129 @@
+import re
+import subprocess
+import threading
+from collections import deque
+from typing import Optional
+
+from .logger import get_logger
+from .progress import FileOffsetProbe, ProgressTracker
+
+
+STDERR_TAIL_LINES = 200
+ERROR_MARKERS = ('ERROR:', 'FATAL:', 'PANIC:', ': error:')
+PROGRESS_PATTERNS = (
+    re.compile(r'dumping contents of table "?(?P<name>[^"]+)"?'),
+    re.compile(r'processing data for table "?(?P<name>[^"]+)"?'),
+    re.compile(r'finished item \d+ (?P<name>.+)$'),
+    re.compile(r'creating (?P<name>[A-Z][A-Z ]+ "[^"]+")'),
+)
+
+
+class StderrMonitor:
+    def __init__(self, proc: subprocess.Popen, label: str, ignored: tuple = (),
+                 fail_fast: bool = False, max_lines: int = STDERR_TAIL_LINES, total: int = None,
+                 stage: str = 'process', tracker: ProgressTracker = None):
+        self.proc = proc
+        self.label = label
+        self.logger = get_logger()
+        self.ignored = ignored
+        self.fail_fast = fail_fast
+        self.tail = deque(maxlen=max(1, max_lines))
+        self.errors = deque(maxlen=max(1, max_lines))
+        self.fatal = None
+        self.fatal_count = 0
+        self.ignored_count = 0
+        self.objects = 0
+        self.current = None
+        self.aborted = False
+        self.owns_tracker = tracker is None
+        self.tracker = tracker or ProgressTracker(stage, label, total, unit='objects')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self) -> 'StderrMonitor':
+        self.thread.start()
+        return self
+    
+    def classify(self, line: str) -> Optional[str]:
+        if any(marker in line for marker in ERROR_MARKERS):
+            if any(pattern in line.lower() for pattern in self.ignored):
+                return 'ignored'
+            return 'fatal'
+        for pattern in PROGRESS_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                self.current = match.group('name')
+                return 'progress'
+        return None
+    
+    def _run(self):
+        for raw in iter(self.proc.stderr.readline, b''):
+            line = raw.decode('utf-8', errors='ignore').rstrip()
+            self.tail.append(line)
+            kind = self.classify(line)
+            
+            if kind == 'progress':
+                self.objects += 1
+                self.tracker.update(1 if self.tracker.unit == 'objects' else 0, self.current)
+            elif kind == 'ignored':
+                self.ignored_count += 1
+            elif kind == 'fatal':
+                self.fatal_count += 1
+                self.errors.append(line)
+                if self.fatal is None:
+                    self.fatal = line
+                    if self.fail_fast and self.proc.poll() is None:
+                        self.logger.error(f"{self.label} 出现致命错误，立即中止: {line}")
+                        self.aborted = True
+                        self.proc.terminate()
+        self.proc.stderr.close()
+    
+    def wait(self, timeout: float = None) -> int:
+        try:
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+            raise
+        finally:
+            self.thread.join()
+            if self.owns_tracker:
+                self.tracker.finish()
+        return self.proc.returncode
+    
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.proc.returncode
+    
+    @property
+    def failed(self) -> bool:
+        return self.fatal is not None
+    
+    def text(self) -> str:
+        return '\n'.join(self.tail)
+    
+    def describe(self) -> str:
+        if not self.errors:
+            return self.text()
+        more = f"\n... 共 {self.fatal_count} 个错误" if self.fatal_count > len(self.errors) else ''
+        return '\n'.join(self.errors) + more
+
+
+def run_monitored(cmd: list, label: str, env: dict = None, timeout: float = None, stdin=None,
+                  ignored: tuple = (), fail_fast: bool = False, max_lines: int = STDERR_TAIL_LINES,
+                  total: int = None, stage: str = 'process', watch_file: str = None) -> StderrMonitor:
+    proc = subprocess.Popen(
+        cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env
+    )
+    if not watch_file:
+        monitor = StderrMonitor(proc, label, ignored, fail_fast, max_lines, total, stage).start()
+        monitor.wait(timeout)
+        return monitor
+    
+    with ProgressTracker(stage, label, total) as tracker:
+        monitor = StderrMonitor(proc, label, ignored, fail_fast, max_lines, tracker=tracker).start()
+        probe = FileOffsetProbe(tracker, proc.pid, watch_file).start()
+        try:
+            monitor.wait(timeout)
+        finally:
+            probe.stop()
+    return monitor
\ No newline at end of file
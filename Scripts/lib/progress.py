@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from .logger import get_logger
+from .config import Config
+
+
+RATE_SAMPLE_INTERVAL = 1.0
+RATE_SMOOTHING = 0.3
+METRICS_PREFIX = 'pg_backup_stage'
+
+
+def format_amount(amount: float, unit: str) -> str:
+    if unit == 'bytes':
+        return f"{amount / (1024*1024):.1f} MB"
+    return f"{int(amount)} 个"
+
+
+def format_rate(rate: Optional[float], unit: str) -> str:
+    if rate is None:
+        return '-'
+    if unit == 'bytes':
+        return f"{rate / (1024*1024):.1f} MB/s"
+    return f"{rate:.1f} 个/s"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressRegistry:
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.interval = max(1, self.config.PROGRESS_INTERVAL)
+        self.metrics_file = self.config.METRICS_FILE
+        self.lock = threading.Lock()
+        self.trackers = set()
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.last_export = 0.0
+    
+    def register(self, tracker: 'ProgressTracker'):
+        with self.lock:
+            self.trackers.add(tracker)
+            self.counters[tracker.stage]['started'] += 1
+    
+    def add(self, stage: str, unit: str, amount: float):
+        with self.lock:
+            self.counters[stage][unit] += amount
+    
+    def unregister(self, tracker: 'ProgressTracker', elapsed: float):
+        with self.lock:
+            self.trackers.discard(tracker)
+            self.counters[tracker.stage]['seconds'] += elapsed
+            self.counters[tracker.stage]['finished'] += 1
+        self.export(force=True)
+    
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {
+                stage: {
+                    'bytes': int(values['bytes']),
+                    'objects': int(values['objects']),
+                    'seconds': values['seconds'],
+                    'started': int(values['started']),
+                    'finished': int(values['finished']),
+                    'active': 0,
+                    'rate': 0.0,
+                }
+                for stage, values in self.counters.items()
+            }
+            for tracker in self.trackers:
+                stage = stages[tracker.stage]
+                stage['active'] += 1
+                if tracker.unit == 'bytes':
+                    stage['rate'] += tracker.rate or 0.0
+        return stages
+    
+    def render(self) -> str:
+        metrics = (
+            ('bytes_total', 'counter', 'bytes'),
+            ('objects_total', 'counter', 'objects'),
+            ('seconds_total', 'counter', 'seconds'),
+            ('active', 'gauge', 'active'),
+            ('rate_bytes_per_second', 'gauge', 'rate'),
+        )
+        stages = self.snapshot()
+        lines = []
+        for name, kind, key in metrics:
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+            for stage in sorted(stages):
+                lines.append(f'{METRICS_PREFIX}_{name}{{stage="{stage}"}} {stages[stage][key]}')
+        return '\n'.join(lines) + '\n'
+    
+    def export(self, force: bool = False):
+        if not self.metrics_file:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_export < self.interval:
+            return
+        self.last_export = now
+        temp_file = f'{self.metrics_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                f.write(self.render())
+            os.replace(temp_file, self.metrics_file)
+        except OSError as e:
+            self.logger.warning(f"写入指标文件失败: {self.metrics_file} - {e}")
+
+
+class ProgressTracker:
+    def __init__(self, stage: str, label: str, total: int = None, unit: str = 'bytes',
+                 registry: ProgressRegistry = None):
+        self.stage = stage
+        self.label = label
+        self.total = total if total and total > 0 else None
+        self.unit = unit
+        self.registry = registry or get_progress_registry()
+        self.logger = get_logger()
+        self.done = 0
+        self.detail = None
+        self.rate = None
+        self.start = time.monotonic()
+        self.last_sample = self.start
+        self.last_sample_done = 0
+        self.last_report = self.start
+        self.reported = 0
+        self.finished = False
+        self.registry.register(self)
+    
+    def __enter__(self) -> 'ProgressTracker':
+        return self
+    
+    def __exit__(self, *exc):
+        self.finish()
+    
+    def update(self, amount: int = 0, detail: str = None):
+        self.done += amount
+        if detail:
+            self.detail = detail
+        if amount:
+            self.registry.add(self.stage, self.unit, amount)
+        
+        now = time.monotonic()
+        if now - self.last_sample >= RATE_SAMPLE_INTERVAL:
+            instant = (self.done - self.last_sample_done) / (now - self.last_sample)
+            self.rate = instant if self.rate is None else (
+                RATE_SMOOTHING * instant + (1 - RATE_SMOOTHING) * self.rate
+            )
+            self.last_sample = now
+            self.last_sample_done = self.done
+        
+        if now - self.last_report >= self.registry.interval:
+            self.last_report = now
+            self.report()
+            self.registry.export()
+    
+    def advance_to(self, position: int, detail: str = None):
+        if position > self.done:
+            self.update(position - self.done, detail)
+    
+    def eta(self) -> Optional[float]:
+        if not self.total or not self.rate or self.done >= self.total:
+            return None
+        return (self.total - self.done) / self.rate
+    
+    def report(self):
+        self.reported = self.done
+        done = format_amount(self.done, self.unit)
+        if self.total:
+            done += f" / {format_amount(self.total, self.unit)} ({min(self.done / self.total, 1) * 100:.1f}%)"
+        eta = self.eta()
+        self.logger.info(
+            f"{self.label} 进度: {done} | {format_rate(self.rate, self.unit)}"
+            f"{f' | 预计剩余 {format_duration(eta)}' if eta is not None else ''}"
+            f"{f' | 当前: {self.detail}' if self.detail else ''}"
+        )
+    
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.last_report > self.start and self.reported != self.done:
+            self.report()
+        self.registry.unregister(self, time.monotonic() - self.start)
+
+
+class FileOffsetProbe:
+    def __init__(self, tracker: ProgressTracker, pid: int, path: str):
+        self.tracker = tracker
+        self.pid = pid
+        self.path = os.path.realpath(path)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self) -> 'FileOffsetProbe':
+        if os.path.isdir(f'/proc/{self.pid}/fd'):
+            self.thread.start()
+        return self
+    
+    def read_offset(self) -> Optional[int]:
+        fd_dir = f'/proc/{self.pid}/fd'
+        for fd in os.listdir(fd_dir):
+            if os.path.realpath(os.path.join(fd_dir, fd)) != self.path:
+                continue
+            with open(f'/proc/{self.pid}/fdinfo/{fd}', 'r') as f:
+                for line in f:
+                    if line.startswith('pos:'):
+                        return int(line.split()[1])
+        return None
+    
+    def _run(self):
+        while not self.stopped.wait(RATE_SAMPLE_INTERVAL):
+            try:
+                offset = self.read_offset()
+            except OSError:
+                return
+            if offset is not None:
+                self.tracker.advance_to(offset)
+    
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_progress_registry(config: Config = None) -> ProgressRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProgressRegistry(config)
+        return _registry
\ No newline at end of file
@@ -0,0 +1,313 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .logger import get_logger
+from .config import Config
+from .compression import Codec, detect_codec_bytes
+
+
+CHUNK_HASH_SEED = 0x9e3779b9
+INDEX_VERSION = 1
+LOCK_FILE = 'lock'
+CHUNK_GRACE_SECONDS = 24 * 3600
+
+
+# 以行为锚点的内容定义分块：每行按 crc32 与行长成比例地决定是否在行尾切分，
+# 切分点只取决于内容本身，插入/删除只影响附近的块；超长无换行数据按最大块强制切分
+class ContentDefinedChunker:
+    def __init__(self, avg_size: int):
+        self.min_size = max(1, avg_size // 4)
+        self.max_size = avg_size * 4
+        self.scale = (1 << 32) // avg_size
+        self.buffer = bytearray()
+        self.scanned = 0
+    
+    def feed(self, data: bytes) -> list:
+        self.buffer.extend(data)
+        chunks = []
+        
+        end = self.buffer.rfind(b'\n', self.scanned) + 1
+        if end:
+            start = 0
+            pos = self.scanned
+            for line in self.buffer[self.scanned:end - 1].split(b'\n'):
+                length = len(line) + 1
+                pos += length
+                size = pos - start
+                if size >= self.max_size or (
+                    size >= self.min_size and zlib.crc32(line, CHUNK_HASH_SEED) < length * self.scale
+                ):
+                    chunks.append(bytes(self.buffer[start:pos]))
+                    start = pos
+            del self.buffer[:start]
+            self.scanned = end - start
+        
+        while len(self.buffer) >= self.max_size:
+            chunks.append(bytes(self.buffer[:self.max_size]))
+            del self.buffer[:self.max_size]
+            self.scanned = max(0, self.scanned - self.max_size)
+        
+        return chunks
+    
+    def finish(self) -> list:
+        chunks = [bytes(self.buffer)] if self.buffer else []
+        self.buffer = bytearray()
+        self.scanned = 0
+        return chunks
+
+
+class RepositoryWriter:
+    def __init__(self, repository: 'ChunkRepository', codec: Codec, level: int, threads: int):
+        self.repository = repository
+        self.codec = codec
+        self.level = level
+        self.threads = max(1, threads)
+        self.chunker = ContentDefinedChunker(repository.chunk_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.chunks = []
+        self.sha256_hash = hashlib.sha256()
+        self.header = b''
+        self.size = 0
+        self.new_chunks = 0
+        self.stored_size = 0
+        self.lock_file = repository.lock()
+    
+    def _collect(self, wait_all: bool = False):
+        while self.pending:
+            if not wait_all and len(self.pending) <= self.threads * 2 and not self.pending[0].done():
+                break
+            digest, size, stored = self.pending.popleft().result()
+            self.chunks.append([digest, size])
+            if stored:
+                self.new_chunks += 1
+                self.stored_size += stored
+    
+    def write(self, data: bytes):
+        if not data:
+            return
+        if len(self.header) < 5:
+            self.header += data[:5 - len(self.header)]
+        self.sha256_hash.update(data)
+        self.size += len(data)
+        
+        for chunk in self.chunker.feed(data):
+            self.pending.append(
+                self.executor.submit(self.repository.put_chunk, chunk, self.codec, self.level)
+            )
+        self._collect()
+    
+    def finish(self, database: str) -> bytes:
+        try:
+            for chunk in self.chunker.finish():
+                self.pending.append(
+                    self.executor.submit(self.repository.put_chunk, chunk, self.codec, self.level)
+                )
+            self._collect(wait_all=True)
+        finally:
+            self.close()
+        
+        index = {
+            'version': INDEX_VERSION,
+            'database': database,
+            'format': 'custom' if self.header.startswith(b'PGDMP') else 'plain',
+            'size': self.size,
+            'sha256': self.sha256_hash.hexdigest(),
+            'chunks': self.chunks,
+        }
+        return json.dumps(index, separators=(',', ':')).encode('utf-8')
+    
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+class RepositoryStream:
+    def __init__(self, repository: 'ChunkRepository', index: dict, tracker=None):
+        read_fd, write_fd = os.pipe()
+        self.tracker = tracker
+        self.stdout = os.fdopen(read_fd, 'rb')
+        self.writer = os.fdopen(write_fd, 'wb')
+        self.returncode = None
+        self.thread = threading.Thread(
+            target=self._feed, args=(repository, index), daemon=True
+        )
+        self.thread.start()
+    
+    def _feed(self, repository: 'ChunkRepository', index: dict):
+        try:
+            with self.writer:
+                for data in repository.iter_chunks(index):
+                    self.writer.write(data)
+                    if self.tracker:
+                        self.tracker.update(len(data))
+            self.returncode = 0
+        except BrokenPipeError:
+            self.returncode = 0
+        except Exception as e:
+            repository.logger.error(f"读取仓库数据块失败: {e}")
+            self.returncode = 1
+    
+    def wait(self, timeout: float = None) -> Optional[int]:
+        self.thread.join(timeout)
+        return self.returncode
+
+
+class ChunkRepository:
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.root = Path(self.config.REPOSITORY_DIR or Path(self.config.BACKUP_DIR) / 'repository')
+        self.chunk_dir = self.root / 'chunks'
+        self.chunk_size = max(4096, self.config.REPOSITORY_CHUNK_SIZE)
+    
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / digest
+    
+    def put_chunk(self, data: bytes, codec: Codec, level: int = None) -> tuple:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            try:
+                os.utime(path)
+                return digest, len(data), 0
+            except FileNotFoundError:
+                pass
+        
+        payload = codec.compress(data, level) if codec else data
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        with open(part_path, 'wb') as f:
+            f.write(payload)
+        os.replace(part_path, path)
+        return digest, len(data), len(payload)
+    
+    def read_chunk(self, digest: str) -> bytes:
+        with open(self.chunk_path(digest), 'rb') as f:
+            payload = f.read()
+        
+        codec = detect_codec_bytes(payload[:4])
+        if codec:
+            try:
+                data = codec.decompress(payload)
+                if hashlib.sha256(data).hexdigest() == digest:
+                    return data
+            except Exception:
+                pass
+        
+        if hashlib.sha256(payload).hexdigest() != digest:
+            raise ValueError(f"数据块校验失败: {digest}")
+        return payload
+    
+    def lock(self, exclusive: bool = False, blocking: bool = True):
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.root / LOCK_FILE, 'a')
+        try:
+            mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            fcntl.flock(lock_file, mode if blocking else mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    def open_writer(self, codec: Codec, level: int = None, threads: int = 1) -> RepositoryWriter:
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        return RepositoryWriter(self, codec, level, threads)
+    
+    def load_index(self, index_path: str) -> dict:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def iter_chunks(self, index: dict):
+        sha256_hash = hashlib.sha256()
+        for digest, _ in index['chunks']:
+            data = self.read_chunk(digest)
+            sha256_hash.update(data)
+            yield data
+        
+        if sha256_hash.hexdigest() != index['sha256']:
+            raise ValueError("备份数据流 checksum 不一致")
+    
+    def open_stream(self, index_path: str, tracker=None) -> RepositoryStream:
+        index = self.load_index(index_path)
+        if tracker and not tracker.total:
+            tracker.total = index['size']
+        return RepositoryStream(self, index, tracker)
+    
+    def export(self, index_path: str, output_file: str):
+        with open(output_file, 'wb') as f_out:
+            for data in self.iter_chunks(self.load_index(index_path)):
+                f_out.write(data)
+    
+    def verify_index(self, index_path: str) -> bool:
+        try:
+            index = self.load_index(index_path)
+            missing = [digest for digest, _ in index['chunks'] if not self.chunk_path(digest).exists()]
+            if missing:
+                self.logger.error(f"仓库缺少 {len(missing)} 个数据块，首个: {missing[0]}")
+                return False
+            
+            self.logger.success(
+                f"仓库索引完整: {len(index['chunks'])} 个数据块, {index['size']} bytes"
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"读取仓库索引失败: {index_path} - {e}")
+            return False
+    
+    def collect_garbage(self, index_paths: Iterable[Path]):
+        if not self.chunk_dir.exists():
+            return
+        
+        lock_file = self.lock(exclusive=True, blocking=False)
+        if not lock_file:
+            self.logger.info("仓库正在写入，跳过本次数据块回收")
+            return
+        
+        try:
+            self._collect_garbage(index_paths)
+        finally:
+            lock_file.close()
+    
+    def _collect_garbage(self, index_paths: Iterable[Path]):
+        referenced = set()
+        for index_path in index_paths:
+            try:
+                referenced.update(digest for digest, _ in self.load_index(str(index_path))['chunks'])
+            except Exception as e:
+                self.logger.error(f"读取仓库索引失败，跳过数据块回收: {index_path} - {e}")
+                return
+        
+        deleted_count = 0
+        deleted_size = 0
+        cutoff = time.time() - CHUNK_GRACE_SECONDS
+        for chunk_path in self.chunk_dir.glob('*/*'):
+            if chunk_path.name in referenced or chunk_path.name.endswith('.part'):
+                continue
+            try:
+                stat = chunk_path.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                chunk_path.unlink()
+                deleted_size += stat.st_size
+                deleted_count += 1
+            except Exception as e:
+                self.logger.warning(f"删除数据块失败: {chunk_path} - {e}")
+        
+        if deleted_count:
+            self.logger.success(
+                f"仓库回收: 删除 {deleted_count} 个未引用数据块，释放 {deleted_size} bytes"
+            )
+        else:
+            self.logger.info(f"仓库无未引用数据块 (引用 {len(referenced)} 个)")
\ No newline at end of file
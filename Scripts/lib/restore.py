@@ -1,7 +1,7 @@
 import os
-import gzip
+import shutil
 import subprocess
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
@@ -9,6 +9,22 @@ from .logger import get_logger
 from .config import Config
 from .connection import ConnectionManager
 from .checksum import ChecksumManager
+from .compression import detect_codec, strip_codec_extension
+from .copy_engine import CopyEngine
+from .repository import ChunkRepository
+from .catalog import BackupCatalog
+from .toc import TocManager
+from .stats import StatisticsManager
+from .process import StderrMonitor, run_monitored
+from .progress import FileOffsetProbe, ProgressTracker, get_progress_registry
+from .artifact import (
+    REPOSITORY_INDEX_SUFFIX, is_copy_artifact, is_directory_artifact, is_repository_index
+)
+
+
+STAGING_EXPANSION_RATIO = 4
+RESTORE_SECTIONS = ('pre-data', 'data', 'post-data')
+IGNORED_RESTORE_ERRORS = ('already exists', 'duplicate key', 'multiple primary keys')
 
 
 class RestoreManager:
@@ -16,7 +32,16 @@ class RestoreManager:
         self.config = config or Config()
         self.logger = get_logger()
         self.conn = ConnectionManager(self.config)
-        self.checksum = ChecksumManager()
+        self.checksum = ChecksumManager(self.config)
+        self.copy_engine = CopyEngine(self.config, self.conn, self.checksum)
+        self.repository = ChunkRepository(self.config)
+        self.toc = TocManager(self.config, self.conn, self.repository)
+        self.stats = StatisticsManager(self.config, self.conn)
+        self.progress = get_progress_registry(self.config)
+        self.scratch_dir = Path(self.config.RESTORE_SCRATCH_DIR or Path(self.config.BACKUP_DIR) / 'tmp')
+        self.strategy = None
+        self.phase_timings = {}
+        self.data_check = None
     
     def detect_format(self, backup_file: str) -> tuple:
         try:
@@ -24,10 +49,19 @@ class RestoreManager:
                 self.logger.error(f"文件不存在: {backup_file}")
                 return None, None
             
-            is_compressed = backup_file.endswith('.gz')
+            if is_directory_artifact(backup_file):
+                return 'directory', False
+            
+            if is_copy_artifact(backup_file):
+                return 'copy', False
+            
+            if is_repository_index(backup_file):
+                return self.repository.load_index(backup_file)['format'], True
             
-            if is_compressed:
-                with gzip.open(backup_file, 'rb') as f:
+            codec = detect_codec(backup_file)
+            
+            if codec:
+                with codec.open_reader(backup_file) as f:
                     header = f.read(5)
                     if header.startswith(b'PGDMP'):
                         return 'custom', True
@@ -55,7 +89,13 @@ class RestoreManager:
     
     def restore_streaming(self, backup_file: str, database: str, 
                           clean: bool = False, data_only: bool = False,
-                          schema_only: bool = False, verify_checksum: bool = True) -> bool:
+                          schema_only: bool = False, verify_checksum: bool = True,
+                          verify_stream: bool = None, jobs: int = None,
+                          fast: bool = None, tables: list = None, schemas: list = None,
+                          excludes: list = None) -> bool:
+        staged_file = None
+        list_file = None
+        self.phase_timings = {}
         try:
             format_type, is_compressed = self.detect_format(backup_file)
             
@@ -63,25 +103,76 @@ class RestoreManager:
                 return False
             
             self.logger.info(f"备份格式: {format_type}")
-            self.logger.info(f"是否压缩: {is_compressed}")
+            self.strategy = 'copy' if format_type == 'copy' else ('stream' if is_compressed else 'serial')
+            codec = detect_codec(backup_file) if is_compressed else None
+            self.logger.info(f"是否压缩: {codec.name if codec else is_compressed}")
+            
+            if verify_stream is None:
+                verify_stream = self.config.RESTORE_VERIFY_STREAM
+            verify_stream = verify_stream and verify_checksum and codec is not None
+            jobs = max(1, jobs or self.config.RESTORE_JOBS)
+            if fast is None:
+                fast = self.config.RESTORE_FAST
             
-            if is_compressed and verify_checksum:
+            staged = False
+            if format_type in ('custom', 'directory'):
+                staged, reason = self.plan_strategy(backup_file, is_compressed, verify_stream, jobs, fast)
+                self.logger.info(f"恢复策略: {self.strategy} - {reason}")
+                if fast and is_compressed and not staged:
+                    self.logger.warning("快速恢复需要可随机读取的归档，本次按单次流式恢复执行")
+            
+            if tables or schemas or excludes:
+                if format_type not in ('custom', 'directory'):
+                    self.logger.error("按表/模式选择恢复仅支持 custom/directory 格式")
+                    return False
+                list_file = str(self.scratch_dir / f"{Path(backup_file).name}.{os.getpid()}.list")
+                if not self.toc.write_restore_list(backup_file, list_file, tables, schemas, excludes):
+                    self.logger.error("没有匹配的恢复对象")
+                    return False
+            
+            if is_compressed and verify_checksum and not verify_stream and not (staged and codec):
                 if not self.checksum.verify_gz_streaming(backup_file):
                     self.logger.error("Checksum 验证失败，终止恢复")
                     return False
             
+            if is_repository_index(backup_file) and not self.repository.verify_index(backup_file):
+                self.logger.error("仓库数据块不完整，终止恢复")
+                return False
+            
+            if format_type in ('directory', 'copy') and verify_checksum:
+                if not self.checksum.verify_directory(backup_file):
+                    self.logger.error("Checksum 验证失败，终止恢复")
+                    return False
+            
+            if format_type == 'copy' and verify_checksum:
+                for source in self.copy_engine.get_chain_sources(backup_file):
+                    if not self.checksum.verify_directory(source):
+                        self.logger.error(f"增量基准备份 Checksum 验证失败: {source}")
+                        return False
+            
+            if format_type == 'copy':
+                self.logger.task("COPY 并行恢复")
+                return self.copy_engine.restore(
+                    backup_file, database, clean, data_only, schema_only
+                )
+            
             env = self.config.get_pg_env()
             
-            if format_type == 'custom':
-                if is_compressed:
-                    self.logger.task("流式恢复 (pg_restore)")
-                    self.logger.subtask(f"执行: gzip -d -c {Path(backup_file).name} | pg_restore -d {database}")
-                    
-                    decompress_proc = subprocess.Popen(
-                        ['gzip', '-d', '-c', backup_file],
-                        stdout=subprocess.PIPE
+            if format_type in ('custom', 'directory'):
+                if staged:
+                    staged_file = self.stage_archive(backup_file, codec, verify_checksum, jobs)
+                    if not staged_file:
+                        return False
+                
+                if is_compressed and not staged_file:
+                    self.logger.task("流式恢复 (pg_restore)" + (" - 边读边校验" if verify_stream else ""))
+                    self.logger.subtask(
+                        f"执行: {self.describe_source(backup_file, codec, verify_stream)} | pg_restore -d {database}"
                     )
                     
+                    tracker = self.create_tracker(backup_file)
+                    decompress_proc, tee = self.open_source(backup_file, codec, verify_stream, tracker)
+                    
                     restore_cmd = ['pg_restore']
                     restore_cmd.extend(['-h', self.config.PG_HOST])
                     restore_cmd.extend(['-p', self.config.PG_PORT])
@@ -94,49 +185,73 @@ class RestoreManager:
                         restore_cmd.append('--data-only')
                     elif schema_only:
                         restore_cmd.append('--schema-only')
+                    if verify_stream:
+                        restore_cmd.append('--single-transaction')
+                    if list_file:
+                        restore_cmd.extend(['-L', list_file])
                     
                     restore_cmd.append('--verbose')
                     
                     restore_proc = subprocess.Popen(
                         restore_cmd,
                         stdin=decompress_proc.stdout,
-                        stdout=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,
                         stderr=subprocess.PIPE,
                         env=env
                     )
                     
                     decompress_proc.stdout.close()
-                    stdout, stderr = restore_proc.communicate(timeout=self.config.RESTORE_TIMEOUT)
-                    decompress_proc.wait()
+                    monitor = StderrMonitor(
+                        restore_proc, '恢复', IGNORED_RESTORE_ERRORS, self.config.RESTORE_FAIL_FAST,
+                        self.config.STDERR_TAIL_LINES, tracker=tracker
+                    ).start()
+                    probe = self.watch_source(tracker, decompress_proc, backup_file, tee)
+                    if tee:
+                        tee.start([restore_proc, decompress_proc])
+                    try:
+                        monitor.wait(self.config.RESTORE_TIMEOUT)
+                    except subprocess.TimeoutExpired:
+                        decompress_proc.kill()
+                        raise
+                    finally:
+                        if probe:
+                            probe.stop()
+                        tracker.finish()
+                    
+                    if decompress_proc.wait() != 0 and is_repository_index(backup_file):
+                        self.logger.error("仓库数据块读取失败，恢复结果不完整")
+                        return False
+                    
+                    if tee and not tee.wait():
+                        self.logger.error(f"{tee.error or 'Checksum 验证失败'}，已中止恢复，事务已回滚")
+                        return False
                     
                     if restore_proc.returncode == 0:
-                        self.logger.success("流式恢复成功")
+                        self.logger.success("流式恢复成功" + (" (Checksum 验证通过)" if tee else ""))
                         return True
                     
-                    stderr_text = stderr.decode('utf-8', errors='ignore')
-                    
-                    has_fatal_error = False
-                    for line in stderr_text.split('\n'):
-                        if 'ERROR:' in line:
-                            ignore_patterns = [
-                                'already exists',
-                                'duplicate key',
-                                'multiple primary keys',
-                            ]
-                            should_ignore = any(p in line.lower() for p in ignore_patterns)
-                            if not should_ignore:
-                                has_fatal_error = True
-                                break
-                    
-                    if has_fatal_error:
-                        self.logger.error(f"恢复失败: {stderr_text}")
+                    if tee:
+                        self.logger.error(f"恢复失败，事务已回滚: {monitor.describe()}")
+                        return False
+                    
+                    if monitor.failed:
+                        self.logger.error(f"恢复失败: {monitor.describe()}")
                         return False
                     
                     self.logger.success("恢复完成（忽略已存在对象警告）")
                     return True
                 else:
-                    self.logger.task("文件恢复 (pg_restore)")
-                    self.logger.subtask(f"执行: pg_restore -d {database} {Path(backup_file).name}")
+                    restore_file = staged_file or backup_file
+                    if fast:
+                        return self.restore_sections(
+                            restore_file, database, clean, data_only, schema_only, jobs, list_file
+                        )
+                    
+                    self.logger.task("文件恢复 (pg_restore)" + (f" - {jobs} 并行" if jobs > 1 else ""))
+                    self.logger.subtask(
+                        f"执行: pg_restore -d {database}{f' -j {jobs}' if jobs > 1 else ''} "
+                        f"{Path(restore_file).name}"
+                    )
                     
                     cmd = ['pg_restore']
                     cmd.extend(['-h', self.config.PG_HOST])
@@ -150,33 +265,26 @@ class RestoreManager:
                         cmd.append('--data-only')
                     elif schema_only:
                         cmd.append('--schema-only')
+                    if jobs > 1:
+                        cmd.extend(['-j', str(jobs)])
+                    if list_file:
+                        cmd.extend(['-L', list_file])
                     
-                    cmd.extend(['--verbose', backup_file])
+                    cmd.extend(['--verbose', restore_file])
                     
-                    result = subprocess.run(
-                        cmd, env=env, capture_output=True, text=True,
-                        timeout=self.config.RESTORE_TIMEOUT
+                    monitor = run_monitored(
+                        cmd, '恢复', env=env, timeout=self.config.RESTORE_TIMEOUT,
+                        ignored=IGNORED_RESTORE_ERRORS, fail_fast=self.config.RESTORE_FAIL_FAST,
+                        max_lines=self.config.STDERR_TAIL_LINES, stage='restore',
+                        **self.watch_file_options(restore_file, jobs)
                     )
                     
-                    if result.returncode == 0:
+                    if monitor.returncode == 0:
                         self.logger.success("恢复成功")
                         return True
                     
-                    has_fatal_error = False
-                    for line in result.stderr.split('\n'):
-                        if 'ERROR:' in line:
-                            ignore_patterns = [
-                                'already exists',
-                                'duplicate key',
-                                'multiple primary keys',
-                            ]
-                            should_ignore = any(p in line.lower() for p in ignore_patterns)
-                            if not should_ignore:
-                                has_fatal_error = True
-                                break
-                    
-                    if has_fatal_error:
-                        self.logger.error(f"恢复失败: {result.stderr}")
+                    if monitor.failed:
+                        self.logger.error(f"恢复失败: {monitor.describe()}")
                         return False
                     
                     self.logger.success("恢复完成（忽略已存在对象警告）")
@@ -184,38 +292,65 @@ class RestoreManager:
             
             elif format_type == 'plain':
                 if is_compressed:
-                    self.logger.task("流式恢复 (psql)")
-                    self.logger.subtask(f"执行: gzip -d -c {Path(backup_file).name} | psql -d {database}")
-                    
-                    decompress_proc = subprocess.Popen(
-                        ['gzip', '-d', '-c', backup_file],
-                        stdout=subprocess.PIPE
+                    self.logger.task("流式恢复 (psql)" + (" - 边读边校验" if verify_stream else ""))
+                    self.logger.subtask(
+                        f"执行: {self.describe_source(backup_file, codec, verify_stream)} | psql -d {database}"
                     )
                     
+                    tracker = self.create_tracker(backup_file)
+                    decompress_proc, tee = self.open_source(backup_file, codec, verify_stream, tracker)
+                    
                     restore_cmd = ['psql']
                     restore_cmd.extend(['-h', self.config.PG_HOST])
                     restore_cmd.extend(['-p', self.config.PG_PORT])
                     restore_cmd.extend(['-U', self.config.PG_USER])
                     restore_cmd.extend(['-d', database])
+                    if verify_stream:
+                        restore_cmd.extend(['-f', '-', '--single-transaction', '-v', 'ON_ERROR_STOP=1'])
                     
                     restore_proc = subprocess.Popen(
                         restore_cmd,
                         stdin=decompress_proc.stdout,
-                        stdout=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,
                         stderr=subprocess.PIPE,
                         env=env
                     )
                     
                     decompress_proc.stdout.close()
-                    stdout, stderr = restore_proc.communicate(timeout=self.config.RESTORE_TIMEOUT)
-                    decompress_proc.wait()
+                    monitor = StderrMonitor(
+                        restore_proc, '恢复', IGNORED_RESTORE_ERRORS, False,
+                        self.config.STDERR_TAIL_LINES, tracker=tracker
+                    ).start()
+                    probe = self.watch_source(tracker, decompress_proc, backup_file, tee)
+                    if tee:
+                        tee.start([restore_proc, decompress_proc])
+                    try:
+                        monitor.wait(self.config.RESTORE_TIMEOUT)
+                    except subprocess.TimeoutExpired:
+                        decompress_proc.kill()
+                        raise
+                    finally:
+                        if probe:
+                            probe.stop()
+                        tracker.finish()
+                    
+                    if decompress_proc.wait() != 0 and is_repository_index(backup_file):
+                        self.logger.error("仓库数据块读取失败，恢复结果不完整")
+                        return False
+                    
+                    if tee and not tee.wait():
+                        self.logger.error(f"{tee.error or 'Checksum 验证失败'}，已中止恢复，事务已回滚")
+                        return False
                     
                     if restore_proc.returncode == 0:
-                        self.logger.success("流式恢复成功")
+                        self.logger.success("流式恢复成功" + (" (Checksum 验证通过)" if tee else ""))
                         return True
                     
-                    stderr_text = stderr.decode('utf-8', errors='ignore')
-                    self.logger.warning(f"恢复完成: {stderr_text}")
+                    if tee:
+                        self.logger.error(f"恢复失败，事务已回滚: {monitor.describe()}")
+                        return False
+                    
+                    self.logger.warning(f"恢复完成: {monitor.describe()}")
                     return True
                 else:
                     self.logger.task("文件恢复 (psql)")
@@ -228,16 +363,17 @@ class RestoreManager:
                     cmd.extend(['-d', database])
                     cmd.extend(['-f', backup_file])
                     
-                    result = subprocess.run(
-                        cmd, env=env, capture_output=True, text=True,
-                        timeout=self.config.RESTORE_TIMEOUT
+                    monitor = run_monitored(
+                        cmd, '恢复', env=env, timeout=self.config.RESTORE_TIMEOUT,
+                        ignored=IGNORED_RESTORE_ERRORS, max_lines=self.config.STDERR_TAIL_LINES,
+                        stage='restore', **self.watch_file_options(backup_file)
                     )
                     
-                    if result.returncode == 0:
+                    if monitor.returncode == 0:
                         self.logger.success("恢复成功")
                         return True
                     
-                    self.logger.warning(f"恢复完成: {result.stderr}")
+                    self.logger.warning(f"恢复完成: {monitor.describe()}")
                     return True
             
             return False
@@ -248,41 +384,261 @@ class RestoreManager:
         except Exception as e:
             self.logger.error(f"恢复异常: {e}")
             return False
+        finally:
+            for path in (staged_file, list_file):
+                if path and os.path.exists(path):
+                    os.remove(path)
     
-    def verify_restored_data(self, database: str) -> bool:
+    def plan_strategy(self, backup_file: str, is_compressed: bool, verify_stream: bool,
+                      jobs: int, fast: bool = False) -> tuple:
+        if not is_compressed:
+            self.strategy = 'parallel' if jobs > 1 else 'serial'
+            if jobs > 1:
+                return False, f"归档可随机读取，直接 pg_restore -j {jobs}"
+            return False, "RESTORE_JOBS=1，单进程恢复"
+        
+        self.strategy = 'stream'
+        if jobs <= 1 and not fast:
+            return False, "RESTORE_JOBS=1，管道流式恢复无需暂存"
+        if verify_stream:
+            return False, "边读边校验需要单事务恢复，不能与 -j 并用，使用管道流式恢复"
+        
+        if is_repository_index(backup_file):
+            estimate = self.repository.load_index(backup_file)['size']
+        else:
+            estimate = os.path.getsize(backup_file) * STAGING_EXPANSION_RATIO
+        
         try:
+            self.scratch_dir.mkdir(parents=True, exist_ok=True)
+            free = shutil.disk_usage(self.scratch_dir).free
+        except Exception as e:
+            return False, f"暂存目录不可用 ({e})，使用管道流式恢复"
+        
+        if free < estimate:
+            return False, (
+                f"暂存目录空间不足 (预计需要 {estimate} bytes，可用 {free} bytes)，使用管道流式恢复"
+            )
+        
+        self.strategy = 'staged'
+        return True, f"先解压到 {self.scratch_dir} 再 pg_restore -j {jobs}"
+    
+    def get_section_settings(self, section: str) -> dict:
+        if section == 'data':
+            return {
+                'synchronous_commit': 'off',
+                'maintenance_work_mem': self.config.RESTORE_MAINTENANCE_WORK_MEM,
+            }
+        if section == 'post-data':
+            return {
+                'maintenance_work_mem': self.config.RESTORE_MAINTENANCE_WORK_MEM,
+                'max_parallel_maintenance_workers': self.config.RESTORE_PARALLEL_MAINTENANCE_WORKERS,
+            }
+        return {}
+    
+    def restore_sections(self, restore_file: str, database: str, clean: bool = False,
+                         data_only: bool = False, schema_only: bool = False, jobs: int = 1,
+                         list_file: str = None) -> bool:
+        if data_only:
+            sections = ['data']
+        elif schema_only:
+            sections = ['pre-data', 'post-data']
+        else:
+            sections = list(RESTORE_SECTIONS)
+        
+        self.strategy = f"{self.strategy} + fast"
+        self.logger.task(f"快速恢复 (按 section 分阶段，{jobs} 并行)")
+        
+        if clean and not data_only:
+            self.logger.subtask("清理已有对象: pg_restore --clean --if-exists --schema-only (仅 DROP 部分)")
+            start_time = datetime.now()
+            if not self.conn.drop_archive_objects(database, restore_file, list_file):
+                return False
+            self.phase_timings['clean'] = (datetime.now() - start_time).total_seconds()
+        
+        for section in sections:
+            settings = self.get_section_settings(section)
+            section_jobs = jobs if section != 'pre-data' else 1
+            
+            cmd = ['pg_restore']
+            cmd.extend(['-h', self.config.PG_HOST])
+            cmd.extend(['-p', self.config.PG_PORT])
+            cmd.extend(['-U', self.config.PG_USER])
+            cmd.extend(['-d', database])
+            cmd.extend(['--section', section])
+            if section_jobs > 1:
+                cmd.extend(['-j', str(section_jobs)])
+            if list_file:
+                cmd.extend(['-L', list_file])
+            cmd.extend(['--verbose', restore_file])
+            
             env = self.config.get_pg_env()
+            if settings:
+                options = ' '.join(f'-c {key}={value}' for key, value in settings.items())
+                env['PGOPTIONS'] = f"{env.get('PGOPTIONS', '')} {options}".strip()
             
+            self.logger.subtask(
+                f"阶段 {section}: pg_restore --section {section}"
+                f"{f' -j {section_jobs}' if section_jobs > 1 else ''}"
+                f"{' (' + ', '.join(f'{k}={v}' for k, v in settings.items()) + ')' if settings else ''}"
+            )
+            
+            start_time = datetime.now()
+            monitor = run_monitored(
+                cmd, f'阶段 {section}', env=env, timeout=self.config.RESTORE_TIMEOUT,
+                ignored=IGNORED_RESTORE_ERRORS, fail_fast=self.config.RESTORE_FAIL_FAST,
+                max_lines=self.config.STDERR_TAIL_LINES, stage='restore',
+                **self.watch_file_options(restore_file, section_jobs)
+            )
+            elapsed = (datetime.now() - start_time).total_seconds()
+            self.phase_timings[section] = elapsed
+            
+            if monitor.returncode != 0 and monitor.failed:
+                self.logger.error(f"阶段 {section} 失败 ({elapsed:.1f}s): {monitor.describe()}")
+                return False
+            
+            self.logger.success(f"阶段 {section} 完成 ({elapsed:.1f}s)")
+        
+        self.logger.success("快速恢复完成")
+        return True
+    
+    def stage_archive(self, backup_file: str, codec, verify_checksum: bool, jobs: int) -> Optional[str]:
+        name = Path(backup_file).name
+        if is_repository_index(backup_file):
+            name = name[:-len(REPOSITORY_INDEX_SUFFIX)]
+        staged_file = str(self.scratch_dir / f"{strip_codec_extension(name)}.{os.getpid()}.staged")
+        
+        self.logger.task("解压到暂存目录")
+        start_time = datetime.now()
+        
+        tracker = self.create_tracker(backup_file, 'stage')
+        probe = None
+        try:
+            if is_repository_index(backup_file):
+                self.logger.subtask(f"执行: 导出仓库数据块 {Path(backup_file).name} > {staged_file}")
+                self.repository.export(backup_file, staged_file)
+            else:
+                decompress_cmd = codec.get_decompress_cmd(jobs)
+                self.logger.subtask(f"执行: {' '.join(decompress_cmd)} {Path(backup_file).name} > {staged_file}")
+                
+                with open(staged_file, 'wb') as f_out:
+                    if verify_checksum:
+                        proc = subprocess.Popen(decompress_cmd, stdin=subprocess.PIPE, stdout=f_out)
+                        tee = self.checksum.create_tee(backup_file, proc.stdin, tracker)
+                        tee.start([proc])
+                        proc.wait()
+                        if not tee.wait():
+                            self.logger.error(f"{tee.error or 'Checksum 验证失败'}，终止恢复")
+                            os.remove(staged_file)
+                            return None
+                        self.logger.success("Checksum 验证通过")
+                    else:
+                        proc = subprocess.Popen(decompress_cmd + [backup_file], stdout=f_out)
+                        probe = self.watch_source(tracker, proc, backup_file)
+                        proc.wait()
+                
+                if proc.returncode != 0:
+                    raise RuntimeError(f"{decompress_cmd[0]} 退出码 {proc.returncode}")
+        except Exception as e:
+            self.logger.error(f"解压到暂存目录失败: {e}")
+            if os.path.exists(staged_file):
+                os.remove(staged_file)
+            return None
+        finally:
+            if probe:
+                probe.stop()
+            tracker.finish()
+        
+        elapsed = (datetime.now() - start_time).total_seconds()
+        self.logger.success(
+            f"暂存完成: {self.checksum.format_throughput(os.path.getsize(staged_file), elapsed)}"
+        )
+        return staged_file
+    
+    def describe_source(self, backup_file: str, codec, verify_stream: bool = False) -> str:
+        if is_repository_index(backup_file):
+            return f"仓库数据块 {Path(backup_file).name}"
+        if verify_stream:
+            return f"sha256 tee {Path(backup_file).name} | {' '.join(codec.decompress_cmd)}"
+        return f"{' '.join(codec.decompress_cmd)} {Path(backup_file).name}"
+    
+    def create_tracker(self, backup_file: str, stage: str = 'restore') -> ProgressTracker:
+        total = None if is_repository_index(backup_file) else os.path.getsize(backup_file)
+        return ProgressTracker(stage, f"{'恢复' if stage == 'restore' else '暂存'} {Path(backup_file).name}", total)
+    
+    def watch_source(self, tracker: ProgressTracker, proc, backup_file: str, tee=None) -> Optional[FileOffsetProbe]:
+        if tee or is_repository_index(backup_file):
+            return None
+        return FileOffsetProbe(tracker, proc.pid, backup_file).start()
+    
+    def watch_file_options(self, restore_file: str, jobs: int = 1) -> dict:
+        if jobs > 1 or os.path.isdir(restore_file):
+            return {}
+        return {'watch_file': restore_file, 'total': os.path.getsize(restore_file)}
+    
+    def open_source(self, backup_file: str, codec, verify_stream: bool = False,
+                    tracker: ProgressTracker = None) -> tuple:
+        if is_repository_index(backup_file):
+            return self.repository.open_stream(backup_file, tracker), None
+        if verify_stream:
+            decompress_proc = subprocess.Popen(
+                codec.decompress_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+            return decompress_proc, self.checksum.create_tee(backup_file, decompress_proc.stdin, tracker)
+        return subprocess.Popen(codec.decompress_cmd + [backup_file], stdout=subprocess.PIPE), None
+    
+    def compare_statistics(self, database: str, backup_file: str, partial: bool = False) -> Optional[bool]:
+        manifest = self.stats.load_manifest(backup_file)
+        if not manifest:
+            self.logger.info("备份无统计清单，仅做数量检查")
+            return None
+        
+        self.logger.subtask(
+            f"对比统计清单: {len(manifest['tables'])} 张表"
+            f"{' (含内容哈希)' if manifest.get('hash') else ''}, 并发: {self.config.STATS_WORKERS}"
+        )
+        outcome = self.stats.compare(database, manifest, partial)
+        
+        for difference in outcome['differences']:
+            self.logger.error(f"数据不一致: {difference}")
+        if outcome['extra']:
+            self.logger.warning(f"清单外的表: {', '.join(outcome['extra'])}")
+        
+        self.data_check = (
+            f"{outcome['checked'] - len(outcome['differences'])}/{outcome['checked']} 张表一致, "
+            f"{len(outcome['differences'])} 处差异 ({outcome['elapsed']:.1f}s)"
+        )
+        if outcome['differences']:
+            self.logger.error(f"统计清单对比失败: {self.data_check}")
+            return False
+        
+        self.logger.success(f"统计清单对比通过: {self.data_check}")
+        return True
+    
+    def verify_restored_data(self, database: str, backup_file: str = None, partial: bool = False) -> bool:
+        try:
             self.logger.task("验证恢复数据")
             
-            cmd_tables = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', database, '-t', '-c',
+            table_count = self.conn.pool.fetch_value(
+                database,
                 "SELECT COUNT(*) FROM information_schema.tables "
-                "WHERE table_schema NOT IN ('pg_catalog', 'information_schema');"
-            ]
-            result = subprocess.run(cmd_tables, env=env, capture_output=True, text=True, timeout=30)
-            table_count = int(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip() else 0
+                "WHERE table_schema NOT IN ('pg_catalog', 'information_schema')"
+            ) or 0
             self.logger.subtask(f"用户表数量: {table_count}")
             
-            cmd_sequences = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', database, '-t', '-c',
+            seq_count = self.conn.pool.fetch_value(
+                database,
                 "SELECT COUNT(*) FROM information_schema.sequences "
-                "WHERE sequence_schema NOT IN ('pg_catalog', 'information_schema');"
-            ]
-            result = subprocess.run(cmd_sequences, env=env, capture_output=True, text=True, timeout=30)
-            seq_count = int(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip() else 0
+                "WHERE sequence_schema NOT IN ('pg_catalog', 'information_schema')"
+            ) or 0
             self.logger.subtask(f"用户序列数量: {seq_count}")
             
-            cmd_rows = [
-                'psql', '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
-                '-U', self.config.PG_USER, '-d', database, '-t', '-c',
-                "SELECT SUM(n_live_tup) FROM pg_stat_user_tables;"
-            ]
-            result = subprocess.run(cmd_rows, env=env, capture_output=True, text=True, timeout=60)
-            row_count = result.stdout.strip() if result.returncode == 0 else '未知'
-            self.logger.subtask(f"总记录数估算: {row_count}")
+            row_count = self.conn.pool.fetch_value(
+                database, "SELECT SUM(n_live_tup) FROM pg_stat_user_tables"
+            )
+            self.logger.subtask(f"总记录数估算: {row_count if row_count is not None else '未知'}")
+            
+            if backup_file and self.compare_statistics(database, backup_file, partial) is False:
+                return False
             
             if table_count > 0:
                 self.logger.success("数据验证成功")
@@ -298,7 +654,9 @@ class RestoreManager:
     def restore_backup(self, backup_file: str, target_database: str = None,
                        clean: bool = False, data_only: bool = False,
                        schema_only: bool = False, verify_checksum: bool = True,
-                       verify_data: bool = False) -> bool:
+                       verify_data: bool = False, verify_stream: bool = None,
+                       jobs: int = None, fast: bool = None, tables: list = None,
+                       schemas: list = None, excludes: list = None) -> bool:
         start_time = datetime.now()
         
         database = target_database or self.config.PG_DATABASE
@@ -308,73 +666,78 @@ class RestoreManager:
         self.logger.task(f"备份文件: {Path(backup_file).name}")
         self.logger.task(f"目标数据库: {database}")
         
-        if not self.conn.create_database(database):
-            self.logger.error("无法创建目标数据库")
-            return False
-        
-        if not self.conn.test_connection(database):
-            self.logger.error("无法连接目标数据库")
-            return False
-        
-        success = self.restore_streaming(
-            backup_file, database, clean, data_only, schema_only, verify_checksum
-        )
-        
-        if success and verify_data:
-            self.verify_restored_data(database)
-        
-        end_time = datetime.now()
-        duration = end_time - start_time
-        
-        self.logger.print_summary("恢复任务完成", {
-            '开始时间': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            '结束时间': end_time.strftime('%Y-%m-%d %H:%M:%S'),
-            '耗时': str(duration),
-            '流式恢复': '启用' if backup_file.endswith('.gz') else '禁用',
-            'Checksum验证': '通过' if verify_checksum else '跳过',
-            '恢复状态': '成功' if success else '失败',
-            '目标数据库': database,
-        })
-        
-        return success
+        try:
+            if not self.conn.create_database(database):
+                self.logger.error("无法创建目标数据库")
+                return False
+            
+            if not self.conn.test_connection(database):
+                self.logger.error("无法连接目标数据库")
+                return False
+            
+            success = self.restore_streaming(
+                backup_file, database, clean, data_only, schema_only, verify_checksum, verify_stream, jobs, fast,
+                tables, schemas, excludes
+            )
+            
+            if success and verify_data:
+                success = self.verify_restored_data(
+                    database, None if schema_only else backup_file, partial=bool(tables or schemas or excludes)
+                )
+            
+            end_time = datetime.now()
+            duration = end_time - start_time
+            
+            summary = {
+                '开始时间': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+                '结束时间': end_time.strftime('%Y-%m-%d %H:%M:%S'),
+                '耗时': str(duration),
+                '恢复策略': self.strategy or '-',
+            }
+            for section, elapsed in self.phase_timings.items():
+                summary[f'阶段 {section}'] = f"{elapsed:.1f}s"
+            summary.update({
+                'Checksum验证': '通过' if verify_checksum else '跳过',
+                '数据比对': self.data_check or ('未比对' if not verify_data else '仅数量检查'),
+                '恢复状态': '成功' if success else '失败',
+                '目标数据库': database,
+            })
+            self.logger.print_summary("恢复任务完成", summary)
+            
+            return success
+        finally:
+            self.conn.pool.close_all()
     
-    def list_backups(self, backup_dir: str = None) -> list:
-        backup_dir = backup_dir or self.config.BACKUP_DIR
+    def list_backups(self, backup_dir: str = None, database: str = None, since: str = None,
+                     until: str = None, fmt: str = None, page: int = 1, page_size: int = 20,
+                     verify: bool = False) -> list:
+        catalog = BackupCatalog(self.config, backup_dir)
         
-        self.logger.section(f"扫描备份目录")
-        self.logger.subtask(f"目录: {backup_dir}")
+        self.logger.section("查询备份索引库")
+        self.logger.subtask(f"目录: {catalog.backup_dir}")
         
-        if not Path(backup_dir).exists():
-            self.logger.error(f"目录不存在: {backup_dir}")
+        if not catalog.backup_dir.exists():
+            self.logger.error(f"目录不存在: {catalog.backup_dir}")
             return []
         
-        backup_files = []
-        for root, dirs, files in os.walk(backup_dir):
-            for file in files:
-                if file.endswith(('.dump', '.sql', '.dump.gz', '.sql.gz')):
-                    file_path = Path(root) / file
-                    file_size = file_path.stat().st_size
-                    file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    
-                    checksum_file = file_path.parent / f'{file}.sha256'
-                    has_checksum = checksum_file.exists()
-                    
-                    backup_files.append({
-                        'path': str(file_path),
-                        'name': file,
-                        'size': file_size,
-                        'date': file_time,
-                        'type': 'custom' if '.dump' in file else 'plain',
-                        'checksum': has_checksum
-                    })
+        catalog.ensure()
+        
+        if until:
+            until = (datetime.fromisoformat(until) + timedelta(days=1)).strftime('%Y-%m-%d')
         
-        backup_files.sort(key=lambda x: x['date'], reverse=True)
+        page = max(1, page)
+        page_size = max(1, page_size)
+        backup_files, total = catalog.list_artifacts(
+            database, since, until, fmt, page_size, (page - 1) * page_size
+        )
         
         if backup_files:
+            pages = (total + page_size - 1) // page_size
             self.logger.print_list(
-                f"找到 {len(backup_files)} 个备份文件",
-                backup_files[:10],
-                lambda i, b: f"    {i}. {b['name']} "
+                f"找到 {total} 个备份文件 (第 {page}/{pages} 页)",
+                backup_files,
+                lambda i, b: f"    {(page - 1) * page_size + i}. {b['name']} "
+                            f"[{b['database']}, {b['type']}] "
                             f"({b['size']} bytes, "
                             f"checksum: {'✓' if b['checksum'] else '✗'}, "
                             f"{b['date'].strftime('%Y-%m-%d %H:%M:%S')})"
@@ -382,7 +745,23 @@ class RestoreManager:
         else:
             self.logger.warning("未找到备份文件")
         
+        if verify and backup_files:
+            results = self.checksum.verify_many(b['path'] for b in backup_files)
+            for backup in backup_files:
+                backup['verified'] = results.get(backup['path'])
+        
         return backup_files
+    
+    def find_latest_backup(self, database: str) -> Optional[str]:
+        catalog = BackupCatalog(self.config)
+        catalog.ensure()
+        
+        backup_file = catalog.find_latest(database)
+        if backup_file:
+            self.logger.info(f"数据库 {database} 最新备份: {backup_file}")
+        else:
+            self.logger.error(f"索引库中没有数据库 {database} 的备份")
+        return backup_file
 
 
 def get_restore_manager(config: Config = None) -> RestoreManager:
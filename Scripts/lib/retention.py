@@ -0,0 +1,175 @@
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Tuple
+
+from .logger import get_logger
+from .config import Config
+from .catalog import BackupCatalog
+from .checksum import MERKLE_SUFFIX
+from .toc import TOC_SUFFIX
+from .stats import STATS_SUFFIX
+from .artifact import get_artifact_size, is_copy_artifact
+
+
+class RetentionManager:
+    def __init__(self, config: Config, catalog: BackupCatalog, copy_engine):
+        self.config = config
+        self.logger = get_logger()
+        self.catalog = catalog
+        self.copy_engine = copy_engine
+    
+    def is_gfs_enabled(self) -> bool:
+        return any((
+            self.config.RETENTION_DAILY, self.config.RETENTION_WEEKLY, self.config.RETENTION_MONTHLY
+        ))
+    
+    def describe_policy(self) -> str:
+        if self.is_gfs_enabled():
+            return (
+                f"GFS (每日 {self.config.RETENTION_DAILY} / 每周 {self.config.RETENTION_WEEKLY} / "
+                f"每月 {self.config.RETENTION_MONTHLY})"
+            )
+        return f"{self.config.BACKUP_RETENTION_DAYS} 天"
+    
+    def _select_periods(self, backup_sets: list, reasons: dict, label: str, count: int, period):
+        seen = set()
+        for backup_set in backup_sets:
+            if len(seen) >= count:
+                break
+            key = period(backup_set['date'])
+            if key not in seen:
+                seen.add(key)
+                reasons[backup_set['id']].append(label)
+    
+    def _protect_chain_bases(self, backup_sets: list, reasons: dict):
+        owners = {
+            os.path.normpath(path): backup_set for backup_set in backup_sets for path in backup_set['paths']
+        }
+        
+        for backup_set in backup_sets:
+            if backup_set['id'] not in reasons:
+                continue
+            for path in backup_set['paths']:
+                if not is_copy_artifact(path):
+                    continue
+                try:
+                    sources = self.copy_engine.get_chain_sources(path)
+                except Exception as e:
+                    self.logger.warning(f"读取增量清单失败: {path} - {e}")
+                    continue
+                for source in sources:
+                    owner = owners.get(os.path.normpath(source))
+                    if owner and '增量基准' not in reasons[owner['id']]:
+                        reasons[owner['id']].append('增量基准')
+    
+    def plan(self, now: datetime = None) -> Tuple[list, list]:
+        now = now or datetime.now()
+        backup_sets = self.catalog.list_backup_sets()
+        
+        by_database = defaultdict(list)
+        for backup_set in backup_sets:
+            by_database[backup_set['database']].append(backup_set)
+        
+        reasons = defaultdict(list)
+        cutoff = now - timedelta(days=self.config.BACKUP_RETENTION_DAYS)
+        
+        for database_sets in by_database.values():
+            reasons[database_sets[0]['id']].append('最新')
+            
+            if not self.is_gfs_enabled():
+                for backup_set in database_sets:
+                    if backup_set['date'] >= cutoff:
+                        reasons[backup_set['id']].append('保留期内')
+                continue
+            
+            self._select_periods(
+                database_sets, reasons, '每日', self.config.RETENTION_DAILY, lambda d: d.date()
+            )
+            self._select_periods(
+                database_sets, reasons, '每周', self.config.RETENTION_WEEKLY,
+                lambda d: d.isocalendar()[:2]
+            )
+            self._select_periods(
+                database_sets, reasons, '每月', self.config.RETENTION_MONTHLY,
+                lambda d: (d.year, d.month)
+            )
+        
+        self._protect_chain_bases(backup_sets, reasons)
+        
+        keep = [dict(backup_set, reasons=reasons[backup_set['id']])
+                for backup_set in backup_sets if backup_set['id'] in reasons]
+        delete = [backup_set for backup_set in backup_sets if backup_set['id'] not in reasons]
+        return keep, delete
+    
+    def remove_artifact(self, path: str) -> int:
+        size = get_artifact_size(path) if os.path.exists(path) else 0
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        
+        suffixes = ('.sha256', MERKLE_SUFFIX, TOC_SUFFIX, STATS_SUFFIX)
+        for sidecar in (f'{path.rstrip(os.sep)}{suffix}' for suffix in suffixes):
+            if os.path.exists(sidecar):
+                size += os.path.getsize(sidecar)
+                os.remove(sidecar)
+        return size
+    
+    def apply(self, dry_run: bool = False) -> dict:
+        keep, delete = self.plan()
+        planned_size = sum(backup_set['size'] for backup_set in delete)
+        
+        self.logger.info(
+            f"保留策略: {self.describe_policy()} | 保留 {len(keep)} 个备份集, "
+            f"删除 {len(delete)} 个备份集 ({planned_size} bytes)"
+        )
+        
+        for backup_set in delete:
+            self.logger.subtask(
+                f"{'将删除' if dry_run else '删除'}: {backup_set['database']} "
+                f"{backup_set['date'].strftime('%Y-%m-%d %H:%M:%S')} "
+                f"({len(backup_set['paths'])} 个文件, {backup_set['size']} bytes)"
+            )
+        
+        if dry_run:
+            for backup_set in keep:
+                self.logger.subtask(
+                    f"保留: {backup_set['database']} {backup_set['date'].strftime('%Y-%m-%d %H:%M:%S')} "
+                    f"({', '.join(backup_set['reasons'])})"
+                )
+            self.logger.success(
+                f"[dry-run] 将删除 {len(delete)} 个备份集，可释放 {planned_size} bytes"
+            )
+            return {'deleted': 0, 'planned': len(delete), 'freed': 0, 'planned_size': planned_size}
+        
+        deleted_paths = []
+        freed = 0
+        for backup_set in delete:
+            for path in backup_set['paths']:
+                try:
+                    freed += self.remove_artifact(path)
+                    deleted_paths.append(path)
+                except Exception as e:
+                    self.logger.warning(f"删除失败: {path} - {e}")
+        
+        self.catalog.remove_paths(deleted_paths)
+        
+        for date_dir in {Path(path).parent for path in deleted_paths}:
+            try:
+                if date_dir.exists() and not any(date_dir.iterdir()):
+                    date_dir.rmdir()
+                    self.logger.info(f"删除空目录: {date_dir.name}")
+            except Exception:
+                pass
+        
+        if delete:
+            self.logger.success(
+                f"清理完成: 删除 {len(delete)} 个备份集 ({len(deleted_paths)} 个文件)，释放 {freed} bytes"
+            )
+        else:
+            self.logger.info("无过期备份")
+        
+        return {'deleted': len(delete), 'planned': len(delete), 'freed': freed, 'planned_size': planned_size}
\ No newline at end of file
@@ -0,0 +1,223 @@
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from psycopg2 import sql
+
+from .logger import get_logger
+from .config import Config
+from .connection import ConnectionManager
+from .artifact import COPY_MANIFEST, is_copy_artifact
+
+
+STATS_SUFFIX = '.stats'
+STATS_VERSION = 1
+
+STATS_TABLE_QUERY = """
+    SELECT n.nspname, c.relname, pg_relation_size(c.oid), pg_total_relation_size(c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r'
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND n.nspname !~ '^pg_(toast|temp)'
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_depend d
+          WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid AND d.deptype = 'e'
+      )
+    ORDER BY pg_relation_size(c.oid) DESC
+"""
+
+STATS_SESSION_SETTINGS = (
+    "SET TimeZone = 'UTC'",
+    "SET DateStyle = 'ISO, YMD'",
+    "SET IntervalStyle = 'postgres'",
+    "SET extra_float_digits = 3",
+    "SET bytea_output = 'hex'",
+)
+
+
+class StatisticsManager:
+    def __init__(self, config: Config = None, conn: ConnectionManager = None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.conn = conn or ConnectionManager(self.config)
+    
+    def stats_file(self, path: str) -> str:
+        return f"{path.rstrip(os.sep)}{STATS_SUFFIX}"
+    
+    def export_snapshot(self, database: str) -> Tuple[object, str]:
+        coordinator = self.conn.pool.connect(database, autocommit=False)
+        try:
+            coordinator.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with coordinator.cursor() as cur:
+                cur.execute('SELECT pg_export_snapshot()')
+                snapshot = cur.fetchone()[0]
+        except Exception:
+            coordinator.close()
+            raise
+        return coordinator, snapshot
+    
+    def _open_connections(self, database: str, count: int, snapshot: str = None) -> list:
+        conns = []
+        try:
+            for _ in range(count):
+                worker = self.conn.pool.connect(database, autocommit=False)
+                conns.append(worker)
+                worker.set_session(isolation_level='REPEATABLE READ', readonly=True)
+                with worker.cursor() as cur:
+                    if snapshot:
+                        cur.execute('SET TRANSACTION SNAPSHOT %s', (snapshot,))
+                    for setting in STATS_SESSION_SETTINGS:
+                        cur.execute(setting)
+        except Exception:
+            for worker in conns:
+                worker.close()
+            raise
+        return conns
+    
+    def _table_stats(self, conn_queue: queue.Queue, schema: str, table: str,
+                     with_hash: bool) -> dict:
+        worker = conn_queue.get()
+        try:
+            with worker.cursor() as cur:
+                if with_hash:
+                    statement = sql.SQL(
+                        "SELECT count(*), COALESCE(sum(('x' || substr(md5(t::text), 1, 16))::bit(64)::bigint), 0) "
+                        "FROM {} t"
+                    )
+                else:
+                    statement = sql.SQL('SELECT count(*), NULL FROM {}')
+                cur.execute(statement.format(sql.Identifier(schema, table)))
+                rows, digest = cur.fetchone()
+        finally:
+            conn_queue.put(worker)
+        return {'schema': schema, 'name': table, 'rows': rows,
+                'hash': str(digest) if digest is not None else None}
+    
+    def _scan_tables(self, worker_conns: list, tables: list, with_hash: bool) -> dict:
+        conn_queue = queue.Queue()
+        for worker in worker_conns:
+            conn_queue.put(worker)
+        
+        with ThreadPoolExecutor(max_workers=len(worker_conns)) as executor:
+            futures = [
+                executor.submit(self._table_stats, conn_queue, schema, name, with_hash)
+                for schema, name in tables
+            ]
+            return {
+                (entry['schema'], entry['name']): entry
+                for entry in (future.result() for future in as_completed(futures))
+            }
+    
+    def _list_tables(self, worker) -> dict:
+        with worker.cursor() as cur:
+            cur.execute(STATS_TABLE_QUERY)
+            return {(schema, name): (size, total_size) for schema, name, size, total_size in cur.fetchall()}
+    
+    def collect(self, database: str, snapshot: str = None) -> dict:
+        start = time.monotonic()
+        with_hash = self.config.STATS_HASH
+        worker_conns = self._open_connections(database, max(1, self.config.STATS_WORKERS), snapshot)
+        
+        try:
+            sizes = self._list_tables(worker_conns[0])
+            scanned = self._scan_tables(worker_conns, list(sizes), with_hash)
+        finally:
+            for worker in worker_conns:
+                worker.close()
+        
+        tables = []
+        for key, entry in sorted(scanned.items()):
+            entry['size'], entry['total_size'] = sizes[key]
+            tables.append(entry)
+        
+        elapsed = time.monotonic() - start
+        self.logger.info(
+            f"统计清单: {len(tables)} 张表, {sum(t['rows'] for t in tables)} 行"
+            f"{' (含内容哈希)' if with_hash else ''} ({elapsed:.1f}s)"
+        )
+        return {
+            'version': STATS_VERSION,
+            'database': database,
+            'snapshot': snapshot,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'hash': with_hash,
+            'tables': tables,
+        }
+    
+    def from_copy_manifest(self, artifact_dir: str) -> dict:
+        with open(Path(artifact_dir) / COPY_MANIFEST, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {
+            'version': STATS_VERSION,
+            'database': manifest['database'],
+            'snapshot': manifest.get('snapshot'),
+            'created_at': manifest.get('created'),
+            'hash': False,
+            'tables': [
+                {'schema': entry['schema'], 'name': entry['name'], 'rows': entry['rows'],
+                 'hash': None, 'size': entry.get('raw_size'), 'total_size': None}
+                for entry in manifest['tables']
+            ],
+        }
+    
+    def write_manifest(self, path: str, manifest: dict) -> Optional[str]:
+        try:
+            stats_file = self.stats_file(path)
+            with open(stats_file, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            return stats_file
+        except Exception as e:
+            self.logger.warning(f"写入统计清单失败: {path} - {e}")
+            return None
+    
+    def load_manifest(self, backup_file: str) -> Optional[dict]:
+        stats_file = self.stats_file(backup_file)
+        if os.path.exists(stats_file):
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        if is_copy_artifact(backup_file):
+            return self.from_copy_manifest(backup_file)
+        return None
+    
+    def compare(self, database: str, manifest: dict, partial: bool = False) -> dict:
+        start = time.monotonic()
+        expected = {(entry['schema'], entry['name']): entry for entry in manifest['tables']}
+        
+        with_hash = manifest.get('hash', False)
+        worker_conns = self._open_connections(database, max(1, self.config.STATS_WORKERS))
+        try:
+            present = set(self._list_tables(worker_conns[0]))
+            actual = self._scan_tables(worker_conns, sorted(present & set(expected)), with_hash)
+        finally:
+            for worker in worker_conns:
+                worker.close()
+        
+        missing = [] if partial else sorted(set(expected) - present)
+        extra = sorted(present - set(expected))
+        
+        differences = []
+        for key in sorted(actual):
+            want, got = expected[key], actual[key]
+            label = f'{key[0]}.{key[1]}'
+            if want['rows'] != got['rows']:
+                differences.append(f"{label}: 行数 {got['rows']} != {want['rows']}")
+            elif with_hash and want['hash'] != got['hash']:
+                differences.append(f"{label}: 内容哈希不一致")
+        differences.extend(f"{schema}.{name}: 表缺失" for schema, name in missing)
+        
+        return {
+            'checked': len(actual),
+            'differences': differences,
+            'extra': [f'{schema}.{name}' for schema, name in extra],
+            'elapsed': time.monotonic() - start,
+        }
+
+
+def get_statistics_manager(config: Config = None, conn: ConnectionManager = None) -> StatisticsManager:
+    return StatisticsManager(config, conn)
\ No newline at end of file
@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import subprocess
+from datetime import datetime
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import List, Optional
+
+from .logger import get_logger
+from .config import Config
+from .compression import detect_codec
+from .artifact import get_artifact_format, is_repository_index
+
+
+TOC_SUFFIX = '.toc'
+TOC_VERSION = 2
+TOC_LINE_PATTERN = re.compile(r'^(?P<id>\d+); (?P<tableoid>\d+) (?P<oid>\d+) (?P<rest>.*)$')
+
+TOC_DESCS = sorted([
+    'ACCESS METHOD', 'ACL', 'AGGREGATE', 'CAST', 'COLLATION', 'COMMENT', 'CONSTRAINT', 'CONVERSION',
+    'DATABASE', 'DATABASE PROPERTIES', 'DEFAULT', 'DEFAULT ACL', 'DOMAIN', 'EVENT TRIGGER',
+    'EXTENSION', 'FK CONSTRAINT', 'FOREIGN DATA WRAPPER', 'FOREIGN SERVER', 'FOREIGN TABLE',
+    'FUNCTION', 'INDEX', 'INDEX ATTACH', 'LARGE OBJECT', 'MATERIALIZED VIEW',
+    'MATERIALIZED VIEW DATA', 'OPERATOR', 'OPERATOR CLASS', 'OPERATOR FAMILY', 'POLICY',
+    'PROCEDURE', 'PROCEDURAL LANGUAGE', 'PUBLICATION', 'PUBLICATION TABLE', 'PUBLICATION TABLES IN SCHEMA',
+    'ROW SECURITY', 'RULE', 'SCHEMA', 'SECURITY LABEL', 'SEQUENCE', 'SEQUENCE OWNED BY',
+    'SEQUENCE SET', 'SERVER', 'STATISTICS', 'SUBSCRIPTION', 'TABLE', 'TABLE ATTACH', 'TABLE DATA',
+    'TEXT SEARCH CONFIGURATION', 'TEXT SEARCH DICTIONARY', 'TEXT SEARCH PARSER',
+    'TEXT SEARCH TEMPLATE', 'TRANSFORM', 'TRIGGER', 'TYPE', 'USER MAPPING', 'VIEW',
+], key=len, reverse=True)
+
+RELATION_DESCS = (
+    'TABLE', 'TABLE DATA', 'VIEW', 'MATERIALIZED VIEW', 'MATERIALIZED VIEW DATA', 'SEQUENCE',
+    'FOREIGN TABLE', 'ROW SECURITY', 'TABLE ATTACH',
+)
+QUALIFIED_DESCS = ('DEFAULT', 'CONSTRAINT', 'FK CONSTRAINT', 'TRIGGER', 'RULE', 'POLICY')
+LABEL_DESCS = ('COMMENT', 'ACL', 'SECURITY LABEL')
+ROOT_DESCS = ('TABLE', 'VIEW', 'MATERIALIZED VIEW', 'SEQUENCE', 'FOREIGN TABLE')
+
+DEPENDS_QUERY = """
+    SELECT 'INDEX', n.nspname, c.relname, tn.nspname || '.' || t.relname
+    FROM pg_index x
+    JOIN pg_class c ON c.oid = x.indexrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_namespace tn ON tn.oid = t.relnamespace
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname !~ '^pg_toast'
+    UNION ALL
+    SELECT 'SEQUENCE', n.nspname, s.relname, tn.nspname || '.' || t.relname
+    FROM pg_depend d
+    JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+    JOIN pg_namespace n ON n.oid = s.relnamespace
+    JOIN pg_class t ON t.oid = d.refobjid
+    JOIN pg_namespace tn ON tn.oid = t.relnamespace
+    WHERE d.classid = 'pg_class'::regclass AND d.refclassid = 'pg_class'::regclass
+      AND d.deptype IN ('a', 'i')
+    UNION ALL
+    SELECT 'FK CONSTRAINT', n.nspname, t.relname || ' ' || con.conname, rn.nspname || '.' || r.relname
+    FROM pg_constraint con
+    JOIN pg_class t ON t.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_class r ON r.oid = con.confrelid
+    JOIN pg_namespace rn ON rn.oid = r.relnamespace
+    WHERE con.contype = 'f'
+"""
+
+
+def parse_toc_line(line: str) -> Optional[dict]:
+    match = TOC_LINE_PATTERN.match(line.rstrip('\n'))
+    if not match:
+        return None
+    
+    rest = match.group('rest')
+    for desc in TOC_DESCS:
+        if rest.startswith(f'{desc} '):
+            break
+    else:
+        return None
+    
+    fields = rest[len(desc) + 1:].split(' ')
+    if len(fields) < 2:
+        return None
+    
+    return {
+        'id': int(match.group('id')),
+        'desc': desc,
+        'schema': fields[0],
+        'tag': ' '.join(fields[1:-1]) if len(fields) > 2 else fields[1],
+        'owner': fields[-1] if len(fields) > 2 else '',
+        'line': line.rstrip('\n'),
+    }
+
+
+class TocIndex:
+    def __init__(self, lines: List[str], depends: dict = None):
+        self.depends = depends or {}
+        self.entries = []
+        for line in lines:
+            entry = parse_toc_line(line)
+            if entry:
+                entry['deps'] = []
+                self.entries.append(entry)
+            elif self.entries and line.startswith(';') and 'depends on:' in line:
+                self.entries[-1]['deps'].extend(int(dep) for dep in line.split('depends on:', 1)[1].split())
+        self.by_id = {entry['id']: entry for entry in self.entries}
+        self.relations = set()
+        
+        for entry in self.entries:
+            if entry['desc'] in ROOT_DESCS:
+                self.relations.add(f"{entry['schema']}.{entry['tag']}")
+    
+    def relation_of(self, entry: dict) -> Optional[str]:
+        desc, schema, tag = entry['desc'], entry['schema'], entry['tag']
+        
+        if desc in ('INDEX', 'INDEX ATTACH', 'SEQUENCE', 'SEQUENCE SET', 'SEQUENCE OWNED BY'):
+            key = 'INDEX' if desc.startswith('INDEX') else 'SEQUENCE'
+            owner = self.depends.get(f'{key} {schema} {tag}')
+            if owner:
+                return owner
+            return None if key == 'INDEX' else f'{schema}.{tag}'
+        if desc in RELATION_DESCS:
+            return f'{schema}.{tag}'
+        if desc in QUALIFIED_DESCS:
+            return f"{schema}.{tag.split(' ')[0]}"
+        if desc in LABEL_DESCS and schema != '-':
+            for kind in ('MATERIALIZED VIEW', 'FOREIGN TABLE', 'TABLE', 'VIEW', 'SEQUENCE', 'COLUMN', 'INDEX'):
+                if tag.startswith(f'{kind} '):
+                    name = tag[len(kind) + 1:]
+                    if kind in ('INDEX', 'SEQUENCE'):
+                        owner = self.depends.get(f'{kind} {schema} {name}')
+                        return owner or (f'{schema}.{name}' if kind == 'SEQUENCE' else None)
+                    return f"{schema}.{name.split('.')[0]}"
+            if tag.split(' ', 1)[0] in ('CONSTRAINT', 'TRIGGER', 'POLICY', 'RULE') and ' ON ' in tag:
+                return f"{schema}.{tag.rsplit(' ON ', 1)[1]}"
+        return None
+    
+    def match(self, relation: str, patterns: list) -> bool:
+        name = relation.split('.', 1)[1]
+        return any(fnmatch(relation, p) or fnmatch(name, p) for p in patterns)
+    
+    def select(self, tables: list = None, schemas: list = None, excludes: list = None) -> List[dict]:
+        tables, schemas, excludes = tables or [], schemas or [], excludes or []
+        
+        if tables or schemas:
+            selected = {
+                relation for relation in self.relations
+                if self.match(relation, tables) or any(fnmatch(relation.split('.', 1)[0], s) for s in schemas)
+            }
+        else:
+            selected = set(self.relations)
+        selected = {relation for relation in selected if not self.match(relation, excludes)}
+        
+        used_schemas = {relation.split('.', 1)[0] for relation in selected}
+        
+        def whole_schema(schema: str) -> bool:
+            return (not tables and not schemas) or any(fnmatch(schema, s) for s in schemas)
+        
+        chosen = []
+        for entry in self.entries:
+            relation = self.relation_of(entry)
+            if relation:
+                if relation not in selected:
+                    continue
+                if entry['desc'] == 'FK CONSTRAINT':
+                    referenced = self.depends.get(f"FK CONSTRAINT {entry['schema']} {entry['tag']}")
+                    if referenced and referenced not in selected:
+                        continue
+                chosen.append(entry)
+            elif entry['desc'] == 'SCHEMA':
+                if entry['tag'] in used_schemas or whole_schema(entry['tag']):
+                    chosen.append(entry)
+            elif entry['schema'] == '-':
+                if not tables and not schemas:
+                    chosen.append(entry)
+            elif whole_schema(entry['schema']):
+                chosen.append(entry)
+        
+        ids = {entry['id'] for entry in chosen}
+        pending = [dep for entry in chosen for dep in entry['deps']]
+        while pending:
+            entry = self.by_id.get(pending.pop())
+            if not entry or entry['id'] in ids:
+                continue
+            relation = self.relation_of(entry)
+            if relation and self.match(relation, excludes):
+                continue
+            ids.add(entry['id'])
+            pending.extend(entry['deps'])
+        
+        return [entry for entry in self.entries if entry['id'] in ids]
+
+
+class TocManager:
+    def __init__(self, config: Config = None, conn=None, repository=None):
+        self.config = config or Config()
+        self.logger = get_logger()
+        self.conn = conn
+        self.repository = repository
+    
+    def supports(self, path: str) -> bool:
+        return get_artifact_format(path) in ('custom', 'directory')
+    
+    def read_listing(self, path: str) -> List[str]:
+        env = self.config.get_pg_env()
+        codec = None if os.path.isdir(path) or is_repository_index(path) else detect_codec(path)
+        
+        if not is_repository_index(path) and not codec:
+            result = subprocess.run(
+                ['pg_restore', '-l', '-v', path], env=env, capture_output=True, text=True,
+                timeout=self.config.RESTORE_TIMEOUT
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip())
+            return result.stdout.splitlines()
+        
+        if is_repository_index(path):
+            source = self.repository.open_stream(path)
+        else:
+            source = subprocess.Popen(
+                codec.decompress_cmd + [path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        
+        proc = subprocess.Popen(
+            ['pg_restore', '-l', '-v'], stdin=source.stdout, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, env=env
+        )
+        source.stdout.close()
+        stdout, stderr = proc.communicate(timeout=self.config.RESTORE_TIMEOUT)
+        source.wait()
+        
+        if proc.returncode != 0:
+            raise RuntimeError(stderr.decode('utf-8', errors='ignore').strip())
+        return stdout.decode('utf-8', errors='ignore').splitlines()
+    
+    def read_depends(self, database: str) -> dict:
+        if not self.conn:
+            return {}
+        try:
+            rows = self.conn.pool.execute(database, DEPENDS_QUERY)
+            return {f'{kind} {schema} {name}': owner for kind, schema, name, owner in rows or []}
+        except Exception as e:
+            self.logger.warning(f"读取对象依赖失败，按名称关联: {e}")
+            return {}
+    
+    def write_toc(self, path: str, database: str = None, depends: dict = None) -> Optional[str]:
+        if not self.supports(path):
+            return None
+        
+        try:
+            lines = self.read_listing(path)
+            toc = {
+                'version': TOC_VERSION,
+                'database': database,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'entries': lines,
+                'depends': depends if depends is not None else (self.read_depends(database) if database else {}),
+            }
+            toc_file = f"{path.rstrip(os.sep)}{TOC_SUFFIX}"
+            with open(toc_file, 'w', encoding='utf-8') as f:
+                json.dump(toc, f, ensure_ascii=False)
+            
+            self.logger.info(f"TOC 缓存: {Path(toc_file).name} ({len(lines)} 行)")
+            return toc_file
+        except Exception as e:
+            self.logger.warning(f"生成 TOC 缓存失败: {path} - {e}")
+            return None
+    
+    def load(self, path: str) -> TocIndex:
+        toc_file = f"{path.rstrip(os.sep)}{TOC_SUFFIX}"
+        toc = {}
+        if os.path.exists(toc_file):
+            with open(toc_file, 'r', encoding='utf-8') as f:
+                toc = json.load(f)
+        
+        if toc.get('version') != TOC_VERSION:
+            self.logger.info("TOC 缓存不存在或版本过旧，读取归档生成")
+            if not self.write_toc(path, toc.get('database'), toc.get('depends')):
+                return TocIndex(self.read_listing(path), toc.get('depends'))
+            with open(toc_file, 'r', encoding='utf-8') as f:
+                toc = json.load(f)
+        
+        return TocIndex(toc['entries'], toc.get('depends'))
+    
+    def write_restore_list(self, path: str, list_file: str, tables: list = None,
+                           schemas: list = None, excludes: list = None) -> int:
+        index = self.load(path)
+        entries = index.select(tables, schemas, excludes)
+        
+        relations = {index.relation_of(entry) for entry in entries} - {None}
+        self.logger.info(
+            f"选择对象: {len(relations)} 个表/视图/序列, {len(entries)}/{len(index.entries)} 个 TOC 条目"
+        )
+        for relation in sorted(relations)[:20]:
+            self.logger.subtask(relation)
+        if len(relations) > 20:
+            self.logger.subtask(f"... 共 {len(relations)} 个")
+        
+        Path(list_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(entry['line'] for entry in entries) + '\n')
+        return len(entries)
+
+
+def get_toc_manager(config: Config = None, conn=None, repository=None) -> TocManager:
+    return TocManager(config, conn, repository)
\ No newline at end of file
@@ -0,0 +1,378 @@
+import itertools
+import os
+import re
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .logger import get_logger
+from .config import Config
+from .compression import detect_codec
+from .toc import TOC_SUFFIX, parse_toc_line
+from .process import run_monitored
+from .artifact import get_artifact_format, is_copy_artifact, is_repository_index
+
+
+VERIFY_LEVELS = ('quick', 'sample', 'full')
+SAMPLE_READ_SIZE = 1024 * 1024
+PLAIN_DUMP_FOOTER = b'-- PostgreSQL database dump complete'
+POST_DATA_TYPES = {
+    b'INDEX', b'INDEX ATTACH', b'CONSTRAINT', b'FK CONSTRAINT', b'TRIGGER', b'EVENT TRIGGER',
+    b'RULE', b'POLICY', b'STATISTICS', b'PUBLICATION TABLE', b'MATERIALIZED VIEW DATA',
+}
+TOC_HEADER_PATTERN = re.compile(rb'^-- (?:Data for )?Name: .*; Type: (?P<type>[A-Z ]+);')
+POST_DATA_STATEMENT_PATTERN = re.compile(
+    rb'^(?:CREATE (?:UNIQUE )?INDEX |CREATE (?:CONSTRAINT )?TRIGGER |\s+ADD CONSTRAINT .* (?:PRIMARY KEY|UNIQUE|FOREIGN KEY|EXCLUDE))'
+)
+
+
+class CopySampler:
+    def __init__(self, sink, max_rows: int):
+        self.sink = sink
+        self.max_rows = max_rows
+        self.buffer = b''
+        self.state = 'sql'
+        self.rows = 0
+        self.tables = 0
+        self.sampled_rows = 0
+        self.skipped_bytes = 0
+        self.held = b''
+    
+    def is_post_data(self, line: bytes) -> bool:
+        header = TOC_HEADER_PATTERN.match(line)
+        if header:
+            return header.group('type') in POST_DATA_TYPES
+        return bool(POST_DATA_STATEMENT_PATTERN.match(line))
+    
+    def feed(self, data: bytes):
+        self.buffer += data
+        
+        while self.buffer:
+            if self.state == 'post-data':
+                self.skipped_bytes += len(self.buffer)
+                self.buffer = b''
+                return
+            
+            if self.state == 'skip':
+                if self.buffer.startswith(b'\\.\n'):
+                    self.state = 'sql'
+                    self.sink.write(b'\\.\n')
+                    self.buffer = self.buffer[3:]
+                    continue
+                end = self.buffer.find(b'\n\\.\n')
+                if end < 0:
+                    keep = self.buffer.rfind(b'\n') + 1
+                    self.skipped_bytes += keep
+                    self.buffer = self.buffer[keep:]
+                    return
+                self.skipped_bytes += end + 1
+                self.buffer = self.buffer[end + 1:]
+                continue
+            
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                return
+            line = self.buffer[:end + 1]
+            self.buffer = self.buffer[end + 1:]
+            
+            if self.state == 'copy':
+                if line == b'\\.\n':
+                    self.state = 'sql'
+                elif self.rows >= self.max_rows:
+                    self.state = 'skip'
+                    self.skipped_bytes += len(line)
+                    continue
+                else:
+                    self.rows += 1
+                    self.sampled_rows += 1
+            elif line.startswith(b'COPY ') and line.rstrip().endswith(b'FROM stdin;'):
+                self.state = 'copy'
+                self.rows = 0
+                self.tables += 1
+            elif self.is_post_data(line):
+                self.state = 'post-data'
+                self.skipped_bytes += len(self.held) + len(line)
+                self.held = b''
+                continue
+            elif line.startswith(b'ALTER TABLE ') and not line.rstrip().endswith(b';'):
+                self.sink.write(self.held)
+                self.held = line
+                continue
+            
+            if self.held:
+                self.sink.write(self.held)
+                self.held = b''
+            self.sink.write(line)
+    
+    def finish(self):
+        if self.state == 'sql':
+            self.sink.write(self.held + self.buffer)
+        self.held = b''
+        self.buffer = b''
+
+
+class BackupVerifier:
+    def __init__(self, config: Config, conn, checksum, repository, copy_engine, toc):
+        self.config = config
+        self.logger = get_logger()
+        self.conn = conn
+        self.checksum = checksum
+        self.repository = repository
+        self.copy_engine = copy_engine
+        self.toc = toc
+        self.sequence = itertools.count(1)
+    
+    def resolve_level(self, level: str = None) -> str:
+        level = (level or self.config.VERIFY_LEVEL or 'full').lower()
+        if level not in VERIFY_LEVELS:
+            self.logger.warning(f"未知验证级别: {level}，使用 full")
+            return 'full'
+        return level
+    
+    def open_source(self, backup_file: str):
+        if is_repository_index(backup_file):
+            return self.repository.open_stream(backup_file)
+        codec = detect_codec(backup_file)
+        if codec:
+            return subprocess.Popen(
+                codec.decompress_cmd + [backup_file], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        return subprocess.Popen(['cat', backup_file], stdout=subprocess.PIPE)
+    
+    def pg_command(self, tool: str, database: str) -> list:
+        return [
+            tool, '-h', self.config.PG_HOST, '-p', self.config.PG_PORT,
+            '-U', self.config.PG_USER, '-d', database
+        ]
+    
+    def has_fatal_error(self, stderr: str) -> bool:
+        return any(
+            'ERROR:' in line and 'already exists' not in line.lower() for line in stderr.split('\n')
+        )
+    
+    @contextmanager
+    def verify_database(self):
+        verify_db = f"_verify_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(self.sequence)}"
+        if not self.conn.create_database(verify_db):
+            raise RuntimeError("创建验证数据库失败")
+        try:
+            yield verify_db
+        finally:
+            self.conn.drop_database(verify_db)
+            self.logger.info(f"清理验证数据库: {verify_db}")
+    
+    def report_tables(self, verify_db: str):
+        try:
+            table_count = self.conn.pool.fetch_value(
+                verify_db,
+                "SELECT COUNT(*) FROM information_schema.tables "
+                "WHERE table_schema NOT IN ('pg_catalog', 'information_schema')"
+            )
+        except Exception:
+            table_count = '未知'
+        self.logger.info(f"验证数据库表数量: {table_count}")
+    
+    def verify(self, backup_file: str, level: str = None, verify_checksum: bool = True) -> bool:
+        level = self.resolve_level(level)
+        start = time.monotonic()
+        
+        self.logger.task(f"验证备份文件 ({level})")
+        self.logger.subtask(f"文件: {backup_file}")
+        
+        try:
+            if level == 'quick':
+                success = self.verify_quick(backup_file, verify_checksum)
+            elif level == 'sample':
+                success = (self.verify_quick(backup_file, verify_checksum)
+                           and self.verify_sample(backup_file))
+            else:
+                success = self.verify_full(backup_file)
+        except Exception as e:
+            self.logger.error(f"验证异常: {e}")
+            success = False
+        
+        elapsed = time.monotonic() - start
+        if success:
+            self.logger.success(f"备份验证成功 ({level}, {elapsed:.1f}s)")
+        else:
+            self.logger.error(f"备份验证失败 ({level}, {elapsed:.1f}s)")
+        return success
+    
+    def verify_quick(self, backup_file: str, verify_checksum: bool = True) -> bool:
+        if verify_checksum and not self.checksum.verify(backup_file):
+            return False
+        
+        if is_copy_artifact(backup_file):
+            manifest = self.copy_engine.load_manifest(backup_file)
+            missing = [s for s in self.copy_engine.get_chain_sources(backup_file) if not os.path.isdir(s)]
+            if missing:
+                self.logger.error(f"增量链不完整，缺少: {', '.join(missing)}")
+                return False
+            self.logger.subtask(f"COPY 清单: {len(manifest['tables'])} 张表")
+            return True
+        
+        if is_repository_index(backup_file) and not self.repository.verify_index(backup_file):
+            return False
+        
+        if get_artifact_format(backup_file) in ('custom', 'directory'):
+            entries = [entry for entry in map(parse_toc_line, self.toc.read_listing(backup_file)) if entry]
+            if not entries:
+                self.logger.error("归档 TOC 为空或无法读取")
+                return False
+            
+            toc_file = f"{backup_file.rstrip(os.sep)}{TOC_SUFFIX}"
+            if os.path.exists(toc_file):
+                cached = len(self.toc.load(backup_file).entries)
+                if cached != len(entries):
+                    self.logger.error(f"TOC 条目数与缓存不一致: {len(entries)} != {cached}")
+                    return False
+            
+            self.logger.subtask(f"归档结构完整: {len(entries)} 个 TOC 条目")
+            return True
+        
+        source = self.open_source(backup_file)
+        tail = b''
+        size = 0
+        for data in iter(lambda: source.stdout.read(SAMPLE_READ_SIZE), b''):
+            size += len(data)
+            tail = (tail + data)[-4096:]
+        source.stdout.close()
+        source.wait()
+        
+        if PLAIN_DUMP_FOOTER not in tail:
+            self.logger.error("SQL 备份缺少结束标记，文件可能不完整")
+            return False
+        
+        self.logger.subtask(f"SQL 结构完整: {size} bytes")
+        return True
+    
+    def verify_sample(self, backup_file: str) -> bool:
+        max_rows = max(0, self.config.VERIFY_SAMPLE_ROWS)
+        
+        with self.verify_database() as verify_db:
+            if is_copy_artifact(backup_file):
+                self.logger.subtask("恢复表结构 (COPY 归档)")
+                if not self.copy_engine.restore(backup_file, verify_db, schema_only=True):
+                    return False
+                self.report_tables(verify_db)
+                return True
+            
+            env = self.config.get_pg_env()
+            source = None
+            producer_log = tempfile.TemporaryFile()
+            consumer_log = tempfile.TemporaryFile()
+            if get_artifact_format(backup_file) in ('custom', 'directory'):
+                dump_cmd = ['pg_restore', '-f', '-', '--section=pre-data', '--section=data',
+                            '--no-owner', '--no-acl']
+                if is_repository_index(backup_file) or detect_codec(backup_file):
+                    source = self.open_source(backup_file)
+                    producer = subprocess.Popen(
+                        dump_cmd, stdin=source.stdout, stdout=subprocess.PIPE,
+                        stderr=producer_log, env=env
+                    )
+                    source.stdout.close()
+                else:
+                    producer = subprocess.Popen(
+                        dump_cmd + [backup_file], stdout=subprocess.PIPE, stderr=producer_log, env=env
+                    )
+            else:
+                producer = self.open_source(backup_file)
+            
+            self.logger.subtask(f"恢复表结构及每表前 {max_rows} 行数据")
+            
+            consumer = subprocess.Popen(
+                self.pg_command('psql', verify_db) + ['-q'],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=consumer_log, env=env
+            )
+            sampler = CopySampler(consumer.stdin, max_rows)
+            try:
+                for data in iter(lambda: producer.stdout.read(SAMPLE_READ_SIZE), b''):
+                    sampler.feed(data)
+                sampler.finish()
+            except BrokenPipeError:
+                pass
+            finally:
+                producer.stdout.close()
+                try:
+                    consumer.stdin.close()
+                except BrokenPipeError:
+                    pass
+            
+            try:
+                consumer.wait(timeout=self.config.RESTORE_TIMEOUT)
+            finally:
+                if consumer.poll() is None:
+                    consumer.kill()
+                    consumer.wait()
+            producer.wait()
+            if source:
+                source.wait()
+            
+            producer_log.seek(0)
+            consumer_log.seek(0)
+            producer_error = producer_log.read().decode('utf-8', errors='ignore')
+            stderr = consumer_log.read().decode('utf-8', errors='ignore')
+            producer_log.close()
+            consumer_log.close()
+            
+            if self.has_fatal_error(stderr):
+                self.logger.error(f"抽样恢复失败: {stderr.strip()}")
+                return False
+            
+            if producer.returncode != 0:
+                self.logger.error(f"读取归档失败: {producer_error.strip()}")
+                return False
+            
+            self.logger.subtask(
+                f"抽样: {sampler.tables} 张表, {sampler.sampled_rows} 行, 跳过 {sampler.skipped_bytes} bytes"
+                f"{' (含 post-data 索引与约束)' if sampler.state == 'post-data' else ''}"
+            )
+            self.report_tables(verify_db)
+            return True
+    
+    def verify_full(self, backup_file: str) -> bool:
+        with self.verify_database() as verify_db:
+            if is_copy_artifact(backup_file):
+                if not self.copy_engine.restore(backup_file, verify_db):
+                    return False
+                self.report_tables(verify_db)
+                return True
+            
+            env = self.config.get_pg_env()
+            is_archive = get_artifact_format(backup_file) in ('custom', 'directory')
+            streamed = is_repository_index(backup_file) or detect_codec(backup_file) is not None
+            
+            if is_archive:
+                cmd = self.pg_command('pg_restore', verify_db) + ['--verbose', '--no-owner', '--no-acl']
+            else:
+                cmd = self.pg_command('psql', verify_db) + ['-v', 'ON_ERROR_STOP=1']
+            
+            options = dict(
+                env=env, timeout=self.config.RESTORE_TIMEOUT, ignored=('already exists',),
+                fail_fast=is_archive, max_lines=self.config.STDERR_TAIL_LINES, stage='verify'
+            )
+            if streamed:
+                source = self.open_source(backup_file)
+                try:
+                    monitor = run_monitored(cmd, '恢复验证', stdin=source.stdout, **options)
+                finally:
+                    source.stdout.close()
+                if source.wait() != 0 and is_repository_index(backup_file):
+                    self.logger.error("仓库数据块读取失败")
+                    return False
+            else:
+                cmd = cmd + ([backup_file] if is_archive else ['-f', backup_file])
+                monitor = run_monitored(cmd, '恢复验证', **options)
+            
+            if monitor.returncode != 0 and monitor.failed:
+                self.logger.error(f"恢复验证失败: {monitor.describe()}")
+                return False
+            
+            self.report_tables(verify_db)
+            return True
+
+
+def get_backup_verifier(config: Config, conn, checksum, repository, copy_engine, toc) -> BackupVerifier:
+    return BackupVerifier(config, conn, checksum, repository, copy_engine, toc)
\ No newline at end of file
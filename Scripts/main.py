@@ -3,9 +3,12 @@
 PostgreSQL 备份恢复工具主入口
 
 用法:
-    python main.py backup [--verify] [--parallel] [--once]
-    python main.py restore <backup_file> [-d database] [--verify-data]
-    python main.py list [--dir <backup_dir>]
+    python main.py backup [--verify] [--verify-level quick|sample|full] [--parallel] [--once]
+    python main.py restore <backup_file> [-d database] [--verify-data] [--verify-stream] [-j jobs] [--fast]
+                                     [--table t] [--schema s] [--exclude t]
+    python main.py list [--dir <backup_dir>] [--db <database>] [--since <date>] [--until <date>] [--verify]
+    python main.py reindex [--dir <backup_dir>]
+    python main.py cleanup [--dry-run]
     python main.py --help
 """
 
@@ -13,11 +16,30 @@ import os
 import sys
 import argparse
 import signal
+from datetime import date
 
 from lib.logger import get_logger, Logger
 from lib.config import get_config, Config
 from lib.backup import get_backup_manager, BackupManager
 from lib.restore import get_restore_manager, RestoreManager
+from lib.catalog import get_backup_catalog
+
+
+def date_arg(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效日期: {value} (应为 YYYY-MM-DD)")
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效整数: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+    return number
 
 
 def setup_logger(config: Config) -> Logger:
@@ -34,7 +56,10 @@ def cmd_backup(args):
     
     if args.once:
         logger.header("单次备份模式")
-        success = manager.run_backup(verify=args.verify, parallel=args.parallel)
+        success = manager.run_backup(
+            verify=args.verify or bool(args.verify_level), parallel=args.parallel,
+            verify_level=args.verify_level
+        )
         sys.exit(0 if success else 1)
     else:
         manager.run_scheduler()
@@ -44,12 +69,17 @@ def cmd_restore(args):
     config = get_config()
     logger = setup_logger(config)
     
+    manager = get_restore_manager(config)
+    
+    if not args.backup_file and args.latest:
+        args.backup_file = manager.find_latest_backup(args.latest)
+        if not args.backup_file:
+            sys.exit(1)
+    
     if not args.backup_file:
         logger.error("请指定备份文件路径")
         sys.exit(1)
     
-    manager = get_restore_manager(config)
-    
     success = manager.restore_backup(
         args.backup_file,
         target_database=args.database,
@@ -57,7 +87,13 @@ def cmd_restore(args):
         data_only=args.data_only,
         schema_only=args.schema_only,
         verify_checksum=not args.no_verify_checksum,
-        verify_data=args.verify_data
+        verify_data=args.verify_data,
+        verify_stream=args.verify_stream or None,
+        jobs=args.jobs,
+        fast=args.fast or None,
+        tables=args.table,
+        schemas=args.schema,
+        excludes=args.exclude
     )
     
     sys.exit(0 if success else 1)
@@ -70,7 +106,32 @@ def cmd_list(args):
     manager = get_restore_manager(config)
     
     backup_dir = args.dir or config.BACKUP_DIR
-    manager.list_backups(backup_dir)
+    manager.list_backups(
+        backup_dir,
+        database=args.db,
+        since=args.since,
+        until=args.until,
+        fmt=args.format,
+        page=args.page,
+        page_size=args.page_size,
+        verify=args.verify
+    )
+
+
+def cmd_reindex(args):
+    config = get_config()
+    logger = setup_logger(config)
+    
+    catalog = get_backup_catalog(config, args.dir)
+    catalog.reindex()
+
+
+def cmd_cleanup(args):
+    config = get_config()
+    logger = setup_logger(config)
+    
+    manager = get_backup_manager(config)
+    manager.cleanup_old_files(dry_run=args.dry_run or None)
 
 
 def main():
@@ -89,14 +150,29 @@ def main():
   执行备份并验证:
     python main.py backup --once --verify
   
+  执行备份并快速验证 (checksum + 结构检查，不恢复):
+    python main.py backup --once --verify --verify-level quick
+  
   恢复备份到指定数据库:
     python main.py restore /backups/data/20260427/postgres_20260427.dump.gz -d mydb
   
   恢复并验证数据:
     python main.py restore /backups/data/20260427/postgres_20260427.dump.gz --verify-data
   
+  恢复某数据库最新的备份:
+    python main.py restore --latest postgres -d postgres_restore
+  
   列出备份文件:
     python main.py list
+  
+  按数据库和日期筛选并翻页:
+    python main.py list --db postgres --since 2026-04-01 --until 2026-04-30 --page 2
+  
+  从磁盘重建备份索引库:
+    python main.py reindex
+  
+  预览保留策略将删除的备份及可释放空间:
+    python main.py cleanup --dry-run
         """
     )
     
@@ -105,6 +181,9 @@ def main():
     backup_parser = subparsers.add_parser('backup', help='执行备份任务')
     backup_parser.add_argument('--once', action='store_true', help='仅执行一次备份')
     backup_parser.add_argument('--verify', action='store_true', help='备份后验证')
+    backup_parser.add_argument(
+        '--verify-level', choices=['quick', 'sample', 'full'], help='验证级别（覆盖 VERIFY_LEVEL）'
+    )
     backup_parser.add_argument('--parallel', action='store_true', help='启用并发备份')
     
     restore_parser = subparsers.add_parser('restore', help='恢复备份')
@@ -115,9 +194,37 @@ def main():
     restore_parser.add_argument('--schema-only', action='store_true', help='仅恢复架构')
     restore_parser.add_argument('--no-verify-checksum', action='store_true', help='跳过checksum验证')
     restore_parser.add_argument('--verify-data', action='store_true', help='恢复后验证数据')
+    restore_parser.add_argument(
+        '--verify-stream', action='store_true', help='边读边校验 checksum，单事务恢复，不一致时回滚'
+    )
+    restore_parser.add_argument('-j', '--jobs', type=int, help='pg_restore 并发数（覆盖 RESTORE_JOBS）')
+    restore_parser.add_argument(
+        '--fast', action='store_true', help='快速恢复：按 pre-data/data/post-data 分阶段并调优会话参数'
+    )
+    restore_parser.add_argument(
+        '--table', action='append', metavar='TABLE', help='仅恢复匹配的表（可重复，支持 schema.table 与通配符）'
+    )
+    restore_parser.add_argument('--schema', action='append', metavar='SCHEMA', help='仅恢复匹配的模式（可重复）')
+    restore_parser.add_argument('--exclude', action='append', metavar='TABLE', help='排除匹配的表（可重复）')
+    restore_parser.add_argument('--latest', metavar='DATABASE', help='从索引库选择该数据库最新的备份')
     
     list_parser = subparsers.add_parser('list', help='列出备份文件')
     list_parser.add_argument('--dir', help='备份目录路径')
+    list_parser.add_argument('--db', help='按数据库筛选')
+    list_parser.add_argument('--since', type=date_arg, help='起始日期 (YYYY-MM-DD)')
+    list_parser.add_argument('--until', type=date_arg, help='结束日期 (YYYY-MM-DD，包含当天)')
+    list_parser.add_argument(
+        '--format', choices=['custom', 'plain', 'directory', 'copy'], help='按备份格式筛选'
+    )
+    list_parser.add_argument('--page', type=positive_int, default=1, help='页码')
+    list_parser.add_argument('--page-size', type=positive_int, default=20, help='每页数量')
+    list_parser.add_argument('--verify', action='store_true', help='并行验证所列备份的 checksum')
+    
+    reindex_parser = subparsers.add_parser('reindex', help='从磁盘重建备份索引库')
+    reindex_parser.add_argument('--dir', help='备份目录路径')
+    
+    cleanup_parser = subparsers.add_parser('cleanup', help='按保留策略清理过期备份')
+    cleanup_parser.add_argument('--dry-run', action='store_true', help='仅显示删除计划与可释放空间')
     
     args = parser.parse_args()
     
@@ -127,6 +234,10 @@ def main():
         cmd_restore(args)
     elif args.command == 'list':
         cmd_list(args)
+    elif args.command == 'reindex':
+        cmd_reindex(args)
+    elif args.command == 'cleanup':
+        cmd_cleanup(args)
     else:
         parser.print_help()
         sys.exit(0)
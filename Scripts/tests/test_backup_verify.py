@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.backup import BackupManager
+from lib.config import Config
+
+
+class VerifyResultTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.BACKUP_DIR = self.work_dir
+        self.config.CHECKSUM_CHUNK_SIZE = 0
+        self.manager = BackupManager(self.config)
+    
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+    
+    def write_backup(self, name: str) -> str:
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+        self.manager.checksum.calculate(path)
+        return path
+    
+    def test_checksum_failure_counts_as_failed_file(self):
+        dump_file = self.write_backup('db_20260101_000000.dump')
+        sql_file = self.write_backup('db_20260101_000000.sql')
+        with open(dump_file, 'r+b') as f:
+            f.seek(100)
+            f.write(b'\x00' * 16)
+        
+        with mock.patch.object(self.manager, 'verify_backup', return_value=True) as verify_backup:
+            outcome = self.manager.verify_result({'database': 'db', 'files': [dump_file, sql_file]}, 'full')
+        
+        self.assertEqual(outcome['total'], 2)
+        self.assertEqual(outcome['passed'], 1)
+        verify_backup.assert_not_called()
+    
+    def test_intact_files_pass(self):
+        dump_file = self.write_backup('db_20260101_000000.dump')
+        
+        with mock.patch.object(self.manager, 'verify_backup', return_value=True) as verify_backup:
+            outcome = self.manager.verify_result({'database': 'db', 'files': [dump_file]}, 'full')
+        
+        self.assertEqual((outcome['passed'], outcome['total']), (1, 1))
+        verify_backup.assert_called_once_with(dump_file, level='full', verify_checksum=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,83 @@
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.compression import ParallelGzipCompressor, get_codec
+from lib.config import Config
+
+
+def sample_data(size: int) -> bytes:
+    rng = random.Random(42)
+    words = [os.urandom(4).hex() for _ in range(200)]
+    lines = []
+    total = 0
+    while total < size:
+        line = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 12))) + '\n'
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines).encode()
+
+
+def compress_uneven(compressor, data: bytes) -> bytes:
+    rng = random.Random(7)
+    output = []
+    pos = 0
+    while pos < len(data):
+        step = rng.choice((1, 17, 4093, 65536, 300001))
+        output.append(compressor.compress(data[pos:pos + step]))
+        pos += step
+    output.append(compressor.flush())
+    return b''.join(output)
+
+
+class ParallelGzipTest(unittest.TestCase):
+    def setUp(self):
+        self.data = sample_data(3 * 1024 * 1024 + 123)
+    
+    def test_round_trip_with_threads(self):
+        compressor = ParallelGzipCompressor(level=6, threads=4, block_size=256 * 1024)
+        compressed = compress_uneven(compressor, self.data)
+        
+        self.assertEqual(gzip.decompress(compressed), self.data)
+    
+    @unittest.skipUnless(shutil.which('gzip'), '缺少 gzip')
+    def test_round_trip_with_gzip_cli(self):
+        compressor = ParallelGzipCompressor(level=9, threads=3, block_size=100 * 1024)
+        compressed = compress_uneven(compressor, self.data)
+        
+        result = subprocess.run(['gzip', '-d', '-c'], input=compressed, capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, self.data)
+    
+    def test_empty_input(self):
+        compressor = ParallelGzipCompressor(threads=2)
+        
+        self.assertEqual(gzip.decompress(compressor.compress(b'') + compressor.flush()), b'')
+    
+    def test_explicit_level_zero(self):
+        codec = get_codec('gzip')
+        compressor = codec.create_compressor(level=0, threads=2)
+        compressed = compress_uneven(compressor, self.data)
+        
+        self.assertEqual(codec.get_level(0), 0)
+        self.assertEqual(compressor.level, 0)
+        self.assertGreater(len(compressed), len(self.data))
+        self.assertEqual(gzip.decompress(compressed), self.data)
+    
+    def test_level_zero_from_env(self):
+        with mock.patch.dict(os.environ, {'COMPRESSION_CODEC': 'gzip', 'COMPRESSION_LEVEL': '0'}):
+            config = Config()
+        
+        self.assertEqual(config.get_compression(), ('gzip', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
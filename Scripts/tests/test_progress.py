@@ -0,0 +1,71 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.config import Config
+from lib.progress import RATE_SMOOTHING, ProgressRegistry, ProgressTracker
+
+
+class ProgressTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = 100.0
+        patcher = mock.patch('lib.progress.time.monotonic', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        config = Config()
+        config.PROGRESS_INTERVAL = 3600
+        config.METRICS_FILE = ''
+        self.registry = ProgressRegistry(config)
+    
+    def test_rate_sampled_once_per_interval(self):
+        tracker = ProgressTracker('backup', 'test', total=1000, registry=self.registry)
+        
+        tracker.update(100)
+        self.assertIsNone(tracker.rate)
+        self.assertIsNone(tracker.eta())
+        
+        self.clock += 2
+        tracker.update(100)
+        self.assertEqual(tracker.rate, 100)
+        self.assertEqual(tracker.eta(), 8)
+    
+    def test_rate_smoothing(self):
+        tracker = ProgressTracker('backup', 'test', total=10000, registry=self.registry)
+        
+        self.clock += 1
+        tracker.update(100)
+        self.clock += 1
+        tracker.update(400)
+        
+        expected = RATE_SMOOTHING * 400 + (1 - RATE_SMOOTHING) * 100
+        self.assertAlmostEqual(tracker.rate, expected)
+        self.assertAlmostEqual(tracker.eta(), (10000 - 500) / expected)
+    
+    def test_eta_unknown_without_total_or_when_done(self):
+        unbounded = ProgressTracker('backup', 'test', registry=self.registry)
+        bounded = ProgressTracker('backup', 'test', total=100, registry=self.registry)
+        
+        self.clock += 1
+        unbounded.update(100)
+        bounded.update(150)
+        
+        self.assertEqual(unbounded.rate, 100)
+        self.assertIsNone(unbounded.eta())
+        self.assertIsNone(bounded.eta())
+    
+    def test_finish_updates_registry(self):
+        with ProgressTracker('restore', 'test', registry=self.registry) as tracker:
+            tracker.update(512)
+            self.clock += 4
+        
+        stage = self.registry.snapshot()['restore']
+        self.assertEqual((stage['bytes'], stage['finished'], stage['active']), (512, 1, 0))
+        self.assertEqual(stage['seconds'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.repository import ContentDefinedChunker
+
+
+AVG_SIZE = 4096
+
+
+def sample_lines(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [f"{i}\t{rng.getrandbits(64):x}\t{'x' * rng.randint(0, 120)}\n".encode() for i in range(count)]
+
+
+def chunk(data: bytes, step: int) -> list:
+    chunker = ContentDefinedChunker(AVG_SIZE)
+    chunks = []
+    for pos in range(0, len(data), step):
+        chunks.extend(chunker.feed(data[pos:pos + step]))
+    return chunks + chunker.finish()
+
+
+class ContentDefinedChunkerTest(unittest.TestCase):
+    def setUp(self):
+        self.lines = sample_lines(20000, 1)
+        self.data = b''.join(self.lines)
+    
+    def test_chunks_cover_input(self):
+        chunks = chunk(self.data, 65536)
+        
+        self.assertEqual(b''.join(chunks), self.data)
+        longest = max(map(len, self.lines))
+        self.assertTrue(all(len(c) < AVG_SIZE * 4 + longest for c in chunks))
+        self.assertTrue(all(len(c) >= AVG_SIZE // 4 for c in chunks[:-1]))
+        self.assertTrue(all(c.endswith(b'\n') for c in chunks[:-1]))
+    
+    def test_boundaries_independent_of_feed_size(self):
+        expected = chunk(self.data, len(self.data))
+        
+        for step in (1000, 4093, 65536):
+            self.assertEqual(chunk(self.data, step), expected)
+    
+    def test_insert_only_changes_nearby_chunks(self):
+        original = chunk(self.data, 65536)
+        edited = self.lines[:100] + sample_lines(3, 2) + self.lines[100:]
+        changed = chunk(b''.join(edited), 65536)
+        
+        shared = set(original) & set(changed)
+        self.assertGreaterEqual(len(shared), len(original) - 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.checksum import HASH_BUFFER_SIZE
+from lib.config import Config
+from lib.restore import RestoreManager
+
+
+TEST_DATABASE = os.environ.get('PG_TEST_DATABASE')
+TEST_TABLE = 'stream_rollback_probe'
+
+
+@unittest.skipUnless(TEST_DATABASE and shutil.which('psql'), 'PG_TEST_DATABASE 未设置或缺少 psql')
+class PlainVerifyStreamRollbackTest(unittest.TestCase):
+    def setUp(self):
+        self.config = Config()
+        self.work_dir = tempfile.mkdtemp()
+        self.config.BACKUP_DIR = self.work_dir
+        self.drop_table()
+    
+    def tearDown(self):
+        self.drop_table()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+    
+    def connect(self):
+        conn = psycopg2.connect(
+            host=self.config.PG_HOST, port=self.config.PG_PORT, user=self.config.PG_USER,
+            password=self.config.PG_PASSWORD, dbname=TEST_DATABASE
+        )
+        conn.autocommit = True
+        return conn
+    
+    def drop_table(self):
+        with self.connect() as conn, conn.cursor() as cur:
+            cur.execute(f'DROP TABLE IF EXISTS {TEST_TABLE}')
+    
+    def write_backup(self) -> str:
+        backup_file = os.path.join(self.work_dir, f'{TEST_DATABASE}_probe.sql.gz')
+        with gzip.open(backup_file, 'wb', compresslevel=1) as f:
+            f.write(f'CREATE TABLE {TEST_TABLE} (id int, payload text);\n'.encode())
+            row = 0
+            while f.fileobj.tell() < HASH_BUFFER_SIZE * 3:
+                for _ in range(1000):
+                    row += 1
+                    f.write(f"INSERT INTO {TEST_TABLE} VALUES ({row}, '{os.urandom(48).hex()}');\n".encode())
+        
+        with open(f'{backup_file}.sha256', 'w') as f:
+            f.write(f"{'0' * 64}  {Path(backup_file).name}\n")
+        return backup_file
+    
+    def test_checksum_abort_leaves_no_rows(self):
+        backup_file = self.write_backup()
+        restore = RestoreManager(self.config)
+        
+        self.assertFalse(restore.restore_streaming(backup_file, TEST_DATABASE, verify_stream=True))
+        
+        with self.connect() as conn, conn.cursor() as cur:
+            cur.execute('SELECT to_regclass(%s)', (TEST_TABLE,))
+            self.assertIsNone(cur.fetchone()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.artifact import COPY_MANIFEST
+from lib.config import Config
+from lib.retention import RetentionManager
+
+
+class RetentionPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.RETENTION_DAILY = 2
+        self.config.RETENTION_WEEKLY = 2
+        self.config.RETENTION_MONTHLY = 1
+        self.now = datetime(2026, 1, 20, 23, 0)
+        self.sets = [self.make_set(day) for day in range(20, 0, -1)]
+        self.chains = {}
+        
+        catalog = mock.Mock()
+        catalog.list_backup_sets.return_value = self.sets
+        copy_engine = mock.Mock()
+        copy_engine.get_chain_sources.side_effect = lambda path: self.chains.get(path, [])
+        self.manager = RetentionManager(self.config, catalog, copy_engine)
+    
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+    
+    def make_set(self, day: int) -> dict:
+        path = os.path.join(self.work_dir, f'app_202601{day:02d}_120000.copy')
+        os.makedirs(path)
+        with open(os.path.join(path, COPY_MANIFEST), 'w') as f:
+            json.dump({}, f)
+        return {
+            'id': day, 'database': 'app', 'date': datetime(2026, 1, day, 12), 'paths': [path], 'size': 1,
+        }
+    
+    def plan(self) -> dict:
+        keep, delete = self.manager.plan(now=self.now)
+        self.assertEqual(len(keep) + len(delete), len(self.sets))
+        return {backup_set['id']: backup_set['reasons'] for backup_set in keep}
+    
+    def test_gfs_selection(self):
+        kept = self.plan()
+        
+        self.assertEqual(sorted(kept), [18, 19, 20])
+        self.assertEqual(kept[20], ['最新', '每日', '每周', '每月'])
+        self.assertEqual(kept[19], ['每日'])
+        self.assertEqual(kept[18], ['每周'])
+    
+    def test_chain_bases_of_kept_sets_are_protected(self):
+        self.chains[self.sets[2]['paths'][0]] = [self.sets[8]['paths'][0], self.sets[15]['paths'][0]]
+        self.chains[self.sets[10]['paths'][0]] = [self.sets[19]['paths'][0]]
+        
+        kept = self.plan()
+        
+        self.assertEqual(sorted(kept), [5, 12, 18, 19, 20])
+        self.assertEqual(kept[12], ['增量基准'])
+        self.assertEqual(kept[5], ['增量基准'])
+    
+    def test_age_policy_without_gfs(self):
+        self.config.RETENTION_DAILY = self.config.RETENTION_WEEKLY = self.config.RETENTION_MONTHLY = 0
+        self.config.BACKUP_RETENTION_DAYS = 3
+        
+        kept = self.plan()
+        
+        self.assertEqual(sorted(kept), [18, 19, 20])
+        self.assertEqual(kept[20], ['最新', '保留期内'])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.toc import TocIndex
+
+
+LISTING = """;
+; Archive created at 2026-01-01 00:00:00
+;
+10; 2615 100 SCHEMA - app postgres
+11; 1247 101 TYPE app mood postgres
+;\tdepends on: 10
+12; 1247 102 DOMAIN app posint postgres
+;\tdepends on: 10
+13; 1255 103 FUNCTION app next_id() postgres
+;\tdepends on: 10
+14; 1255 104 FUNCTION app unrelated() postgres
+;\tdepends on: 10
+20; 1259 200 TABLE app orders postgres
+;\tdepends on: 10 11 12
+21; 1259 201 SEQUENCE app orders_id_seq postgres
+;\tdepends on: 10
+22; 2604 202 DEFAULT app orders id postgres
+;\tdepends on: 20 13
+23; 1259 203 TABLE app customers postgres
+;\tdepends on: 10
+24; 1259 204 TABLE app audit postgres
+;\tdepends on: 10
+30; 0 200 TABLE DATA app orders postgres
+;\tdepends on: 20
+31; 0 203 TABLE DATA app customers postgres
+;\tdepends on: 23
+32; 0 204 TABLE DATA app audit postgres
+;\tdepends on: 24
+40; 1259 300 INDEX app orders_customer_idx postgres
+;\tdepends on: 20
+41; 2606 301 CONSTRAINT app orders orders_pkey postgres
+;\tdepends on: 20
+42; 2606 302 CONSTRAINT app customers customers_pkey postgres
+;\tdepends on: 23
+43; 2606 303 FK CONSTRAINT app orders orders_customer_fkey postgres
+;\tdepends on: 20 42
+""".splitlines()
+
+DEPENDS = {
+    'INDEX app orders_customer_idx': 'app.orders',
+    'SEQUENCE app orders_id_seq': 'app.orders',
+    'FK CONSTRAINT app orders orders_customer_fkey': 'app.customers',
+}
+
+
+class TocIndexSelectTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TocIndex(LISTING, DEPENDS)
+    
+    def select(self, *args, **kwargs) -> list:
+        return [entry['id'] for entry in self.index.select(*args, **kwargs)]
+    
+    def test_parses_entries_and_dependencies(self):
+        self.assertEqual(len(self.index.entries), 17)
+        self.assertEqual(self.index.by_id[22]['deps'], [20, 13])
+        self.assertEqual(self.index.relations, {'app.orders', 'app.orders_id_seq', 'app.customers', 'app.audit'})
+    
+    def test_no_filter_keeps_everything(self):
+        self.assertEqual(self.select(), [entry['id'] for entry in self.index.entries])
+    
+    def test_table_keeps_reachable_objects(self):
+        self.assertEqual(self.select(['orders']), [10, 11, 12, 13, 20, 21, 22, 30, 40, 41])
+    
+    def test_fk_kept_only_when_referenced_table_selected(self):
+        selected = self.select(['orders', 'customers'])
+        
+        self.assertIn(43, selected)
+        self.assertIn(42, selected)
+        self.assertNotIn(24, selected)
+        self.assertNotIn(14, selected)
+    
+    def test_schema_keeps_all_objects(self):
+        self.assertEqual(self.select(schemas=['app'], excludes=['audit']), [
+            10, 11, 12, 13, 14, 20, 21, 22, 23, 30, 31, 40, 41, 42, 43,
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file